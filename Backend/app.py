@@ -1,34 +1,164 @@
 # Medicare Backend API - Flask Application
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from pymongo import ASCENDING, DESCENDING, MongoClient
-from pymongo.errors import DuplicateKeyError
-import bcrypt
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
 import jwt
 from datetime import datetime, timedelta
 from config import Config
 from bson import ObjectId
 from bson.errors import InvalidId
 import json
-import requests
 import random
 import secrets
 import string
-import smtplib
-import ssl
+import threading
 from email.mime.text import MIMEText
 from email.utils import formataddr
 
 from routes.admin import admin_bp
 from routes.admin_dashboard import dashboard_bp as admin_dashboard_bp
 from routes.admin_orders import admin_orders_bp
+from routes.admin_profiles import admin_profiles_bp
 from routes.admin_uploads import admin_uploads_bp
-from utils.auth import token_required
-from utils.helpers import serialize_doc
+from routes.metrics import metrics_bp
+from utils import dashboard_metrics, instrumentation, metrics, profiling
+from utils.auth import invalidate_user_cache, token_required
+from utils.cache import (
+    PRODUCT_LIST_TAG,
+    invalidate_products,
+    product_cache,
+    product_tag,
+)
+from utils.category_catalog import category_catalog
+from utils.customer_stats import record_order_created, record_status_change
+from utils.indexes import reconcile_indexes, start_background_reconcile
+from utils.instrumentation import command_tracker, db_budget
+from utils.json_provider import MongoJSONProvider
+from utils.mailer import MailDispatcher, MailQueueFull
+from utils.maintenance import STARTUP_JOBS, start_maintenance
+from utils.metrics import ComponentSampler, pool_metrics
+from utils.order_numbers import OrderNumberAllocator
+from utils.order_status import status_fields
+from utils.passwords import PasswordHasherBusy, password_hasher
+from utils.recaptcha import RecaptchaVerifier
+from utils.revenue_rollup import record_status_change as record_revenue_status_change
+from utils.pagination import InvalidCursorError, build_cursor_response, fetch_keyset_page
+from utils.projection import (
+    ORDER_FIELDS,
+    ORDER_PUBLIC_PROJECTION,
+    PRODUCT_FIELDS,
+    PRODUCT_LIST_PROJECTION,
+    USER_PUBLIC_PROJECTION,
+    InvalidFieldsError,
+    build_projection,
+    parse_fields,
+    projection_key,
+    select_fields,
+)
+from utils.search import (
+    build_customer_search_keys,
+    build_order_search_keys,
+    build_text_query,
+    build_user_search_keys,
+    order_search_fields,
+    refresh_customer_order_keys,
+)
 
 SHIPPING_FLAT_RATE = 5.0
 TAX_RATE = 0.08
 
+# Internal search keys are never part of the public product payload.
+PRODUCT_PUBLIC_PROJECTION = {'search': 0, 'search_keys': 0}
+# Product fields needed to validate and price an order line.
+ORDER_PRODUCT_PROJECTION = {'name': 1, 'price': 1, 'stock': 1, 'images': 1, 'image': 1}
+
+
+def _get_active_product(object_id):
+    """Return the active product document through the catalogue cache.
+
+    The cached document is shared between requests and must not be mutated.
+    """
+
+    def load_product():
+        return db.products.find_one(
+            {'_id': object_id, 'is_active': True}, PRODUCT_PUBLIC_PROJECTION
+        )
+
+    return product_cache.get_or_load(
+        ('product', str(object_id)), load_product, tags=[product_tag(object_id)]
+    )
+
+
+def _cart_add_pipeline(product_id, quantity, price):
+    """Update pipeline adding ``quantity`` of a product to a cart.
+
+    Increments the matching line or appends a new one, then recomputes the
+    total, all inside a single server-side update.
+    """
+
+    items = {'$ifNull': ['$items', []]}
+    new_quantity = {'$add': ['$$item.quantity', quantity]}
+    return [
+        {'$set': {
+            'items': {'$cond': [
+                {'$in': [product_id, {'$ifNull': ['$items.productId', []]}]},
+                {'$map': {
+                    'input': items,
+                    'as': 'item',
+                    'in': {'$cond': [
+                        {'$eq': ['$$item.productId', product_id]},
+                        {'$mergeObjects': ['$$item', {
+                            'quantity': new_quantity,
+                            'subtotal': {'$multiply': [new_quantity, '$$item.price']}
+                        }]},
+                        '$$item'
+                    ]}
+                }},
+                {'$concatArrays': [items, [{'$literal': {
+                    'productId': product_id,
+                    'quantity': quantity,
+                    'price': price,
+                    'subtotal': price * quantity
+                }}]]}
+            ]},
+            'updatedAt': '$$NOW'
+        }},
+        {'$set': {'total': {'$sum': '$items.subtotal'}}}
+    ]
+
+
+def _upsert_cart(user_id, update):
+    """Apply ``update`` to the user's cart, creating the cart when missing.
+
+    Two first writes for the same user can both try to insert; the loser
+    hits the unique ``userId`` index and is retried once, which then matches
+    the cart the winner created.
+    """
+
+    def write():
+        return db.carts.find_one_and_update(
+            {'userId': user_id},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    try:
+        return write()
+    except DuplicateKeyError:
+        return write()
+
+
+def _product_page_tags(payload):
+    """Tag a cached product list page with every product it contains."""
+
+    tags = [PRODUCT_LIST_TAG]
+    tags.extend(product_tag(product['_id']) for product in payload.get('products', []))
+    return tags
+
 
 def order_to_dict(order):
     """Serialize an order document into an API friendly structure."""
@@ -36,11 +166,10 @@ def order_to_dict(order):
     if not order:
         return None
 
-    serialized = serialize_doc(order)
-
-    shipping = serialized.get('shipping') or {}
-    payment = serialized.get('payment') or {}
-    items = serialized.get('items') or []
+    # Dates and ObjectIds are left as-is; the app's JSON provider encodes them.
+    shipping = order.get('shipping') or {}
+    payment = order.get('payment') or {}
+    items = order.get('items') or []
 
     def _normalise_status(value):
         if not value:
@@ -113,23 +242,24 @@ def order_to_dict(order):
         return {'method': method, 'status': status}
 
     return {
-        'id': serialized.get('_id'),
-        'order_id': serialized.get('orderId') or serialized.get('order_id'),
-        'created_at': serialized.get('createdAt'),
-        'updated_at': serialized.get('updatedAt'),
-        'status': _normalise_status(serialized.get('status')),
+        'id': str(order['_id']) if order.get('_id') is not None else None,
+        'order_id': order.get('orderId') or order.get('order_id'),
+        'created_at': order.get('createdAt'),
+        'updated_at': order.get('updatedAt'),
+        'status': _normalise_status(order.get('status')),
         'items': [_normalise_item(item) for item in items],
         'shipping': _normalise_shipping(shipping),
         'payment': _normalise_payment(payment),
-        'subtotal': _to_number(serialized.get('subtotal')),
+        'subtotal': _to_number(order.get('subtotal')),
         'shipping_fee': _to_number(
-            serialized.get('shippingFee') or serialized.get('shipping_fee')
+            order.get('shippingFee') or order.get('shipping_fee')
         ),
-        'total': _to_number(serialized.get('total')),
+        'total': _to_number(order.get('total')),
     }
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = MongoJSONProvider(app)
 app.config.from_object(Config)
 
 # Enable CORS with better configuration
@@ -139,52 +269,84 @@ CORS(app,
      allow_headers=['Content-Type', 'Authorization'],
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 
+# Fork the bcrypt pool before the MongoDB client (or anything else) starts
+# a thread; see PasswordHasher.start.
+password_hasher.start()
+
 # Connect to MongoDB
-client = MongoClient(Config.MONGODB_URI)
+client = MongoClient(
+    Config.MONGODB_URI,
+    event_listeners=[pool_metrics, command_tracker] if Config.DB_INSTRUMENTATION else [pool_metrics],
+)
 db = client[Config.DATABASE_NAME]
+if Config.DB_INSTRUMENTATION:
+    instrumentation.init_app(
+        app,
+        n_plus_one_threshold=Config.DB_N_PLUS_ONE_THRESHOLD,
+        log_requests=Config.DB_LOG_REQUESTS,
+        strict_budgets=Config.DB_BUDGET_STRICT,
+    )
 
-# Ensure critical indexes exist for data integrity and uniqueness
+# Text and unique indexes are built before serving; the rest off the
+# request path. See utils/indexes.py.
+try:
+    reconcile_indexes(db, required=True)
+except Exception as exc:  # pragma: no cover - log but continue startup
+    print(f"Warning: failed to build required indexes: {exc}")
+try:
+    start_background_reconcile(db, required=False)
+except Exception as exc:  # pragma: no cover - log but continue startup
+    print(f"Warning: failed to start index reconciliation: {exc}")
+# Backfills, migrations and first-time builds run on one maintenance thread,
+# and in one process at a time across workers; see utils/maintenance.py.
 try:
-    db.users.create_index("email", unique=True)
+    start_maintenance(db, STARTUP_JOBS)
 except Exception as exc:  # pragma: no cover - log but continue startup
-    print(f"Warning: failed to ensure unique index on users.email: {exc}")
+    print(f"Warning: failed to start maintenance jobs: {exc}")
 try:
-    db.email_verification.create_index("expiresAt", expireAfterSeconds=0)
-    db.email_verification.create_index("email", unique=True)
+    category_catalog.get(db)
 except Exception as exc:  # pragma: no cover - log but continue startup
-    print(f"Warning: failed to ensure TTL/unique indexes on email_verification: {exc}")
+    print(f"Warning: failed to build categories response: {exc}")
 app.mongo_db = db
 
+# Fix the bcrypt work factor now rather than on the first login; every
+# worker shares the one calibrated cost (or BCRYPT_ROUNDS).
+try:
+    password_hasher.resolve_rounds(db)
+except Exception as exc:  # pragma: no cover - log but continue startup
+    print(f"Warning: failed to load the shared bcrypt work factor: {exc}")
+
+order_numbers = OrderNumberAllocator(db.counters, block_size=Config.ORDER_NUMBER_BLOCK_SIZE)
+
 app.register_blueprint(admin_bp)
 app.register_blueprint(admin_dashboard_bp)
 app.register_blueprint(admin_orders_bp)
 app.register_blueprint(admin_uploads_bp)
+app.register_blueprint(admin_profiles_bp)
+app.register_blueprint(metrics_bp)
+
+if Config.PROFILING_ENABLED:
+    profiling.init_app(
+        app,
+        max_entries=Config.PROFILE_MAX_ENTRIES,
+        max_bytes=Config.PROFILE_COLLECTION_BYTES,
+        max_profile_bytes=Config.PROFILE_MAX_BYTES,
+    )
 
 # Helper function to verify reCAPTCHA
-def verify_recaptcha(recaptcha_token: str | None) -> bool:
-    """Validate the reCAPTCHA token when the feature is enabled."""
+recaptcha_verifier = RecaptchaVerifier.from_config(Config)
+
+
+def verify_recaptcha(recaptcha_token: str | None, action: str, email: str | None = None) -> bool:
+    """Validate the reCAPTCHA token for ``action`` when the feature is enabled."""
 
     if not Config.ENABLE_RECAPTCHA:
         # Allow seamless operation when reCAPTCHA is disabled via configuration.
         return True
 
-    if not recaptcha_token:
-        return False
-
-    try:
-        response = requests.post(
-            'https://www.google.com/recaptcha/api/siteverify',
-            data={
-                'secret': Config.RECAPTCHA_SECRET_KEY,
-                'response': recaptcha_token
-            },
-            timeout=5
-        )
-        result = response.json()
-        return result.get('success', False)
-    except Exception as e:
-        print(f'reCAPTCHA verification error: {str(e)}')
-        return False
+    return recaptcha_verifier.verify(
+        recaptcha_token, action=action, identity=email, remote_ip=request.remote_addr
+    )
 
 
 def generate_otp(length: int = 8) -> str:
@@ -194,8 +356,37 @@ def generate_otp(length: int = 8) -> str:
     return ''.join(random.choices(characters, k=length))
 
 
+def _record_dead_letter(mail) -> None:
+    """Persist a message the mail workers gave up on for later inspection."""
+
+    db.mail_dead_letters.insert_one({
+        'recipient': mail.recipient,
+        'subject': mail.message['Subject'],
+        'attempts': mail.attempts,
+        'error': mail.last_error,
+        'createdAt': datetime.utcnow()
+    })
+
+
+mail_dispatcher = MailDispatcher.from_config(Config, dead_letter=_record_dead_letter)
+
+metrics.init_app(
+    app,
+    ComponentSampler(
+        Config.METRICS_SAMPLE_INTERVAL,
+        mail=mail_dispatcher,
+        hasher=password_hasher,
+        recaptcha=recaptcha_verifier,
+        cache=product_cache,
+    ),
+)
+
+
 def send_otp_email(recipient_email: str, otp: str) -> None:
-    """Send the OTP to the user via Gmail SMTP."""
+    """Queue the OTP email; delivery happens on the mail worker threads.
+
+    Raises ``MailQueueFull`` when the outbound queue is saturated.
+    """
 
     subject = "Medicare Email Verification OTP"
     body = (
@@ -208,11 +399,205 @@ def send_otp_email(recipient_email: str, otp: str) -> None:
     message['From'] = formataddr(("Medicare Support", Config.SMTP_FROM_EMAIL))
     message['To'] = recipient_email
 
-    context = ssl.create_default_context()
-    with smtplib.SMTP(Config.SMTP_HOST, Config.SMTP_PORT) as server:
-        server.starttls(context=context)
-        server.login(Config.SMTP_USERNAME, Config.SMTP_PASSWORD)
-        server.sendmail(Config.SMTP_FROM_EMAIL, [recipient_email], message.as_string())
+    mail_dispatcher.send(recipient_email, message)
+
+
+# Products may never be decremented below zero. With this validator on the
+# collection a reservation that would oversell fails with a write error at
+# its own position in an ordered bulk write, so the write result alone says
+# which lines were applied.
+STOCK_VALIDATOR = {'stock': {'$not': {'$lt': 0}}}
+DOCUMENT_VALIDATION_FAILURE = 121
+_stock_validator_ready = None
+
+
+def _stock_validator_installed():
+    """Install ``STOCK_VALIDATOR`` on products once per process.
+
+    Returns ``False`` when the server refuses it or products already carry a
+    different validator; reservations then run line by line.
+    """
+
+    global _stock_validator_ready
+    if _stock_validator_ready is not None:
+        return _stock_validator_ready
+    try:
+        info = next(iter(db.list_collections(filter={'name': 'products'})), None)
+        validator = (info or {}).get('options', {}).get('validator')
+        if validator is None:
+            if info is None:
+                db.create_collection('products', validator=STOCK_VALIDATOR, validationLevel='moderate')
+            else:
+                db.command({'collMod': 'products', 'validator': STOCK_VALIDATOR, 'validationLevel': 'moderate'})
+            validator = STOCK_VALIDATOR
+        _stock_validator_ready = validator == STOCK_VALIDATOR
+    except ConnectionFailure:
+        return False
+    except Exception as exc:
+        print(f"Warning: stock validator unavailable, reserving stock line by line: {exc}")
+        _stock_validator_ready = False
+    return _stock_validator_ready
+
+
+def _reserve_in_bulk(requirements, session=None):
+    """Apply every decrement in one ordered bulk write; see ``STOCK_VALIDATOR``.
+
+    Returns the lines that were sent before the bulk stopped and the first
+    unsatisfied requirement (or ``None``). Sent lines whose product was
+    deleted matched nothing, so releasing them is harmless.
+    """
+
+    operations = [
+        UpdateOne({'_id': requirement['product_id']}, {'$inc': {'stock': -requirement['quantity']}})
+        for requirement in requirements
+    ]
+    failed_index = None
+    try:
+        result = db.products.bulk_write(operations, ordered=True, session=session)
+        matched = result.matched_count
+    except BulkWriteError as exc:
+        error = exc.details['writeErrors'][0]
+        if error.get('code') != DOCUMENT_VALIDATION_FAILURE:
+            if session is None:
+                _release_stock(requirements[:error['index']])
+            raise
+        failed_index = error['index']
+        matched = exc.details.get('nMatched', 0)
+
+    sent = requirements if failed_index is None else requirements[:failed_index]
+    if matched < len(sent):
+        # A product was deleted after validation; the first one is reported.
+        existing = {
+            product['_id']
+            for product in db.products.find(
+                {'_id': {'$in': [r['product_id'] for r in sent]}}, {'_id': 1}, session=session
+            )
+        }
+        return sent, next(r for r in sent if r['product_id'] not in existing)
+    return sent, None if failed_index is None else requirements[failed_index]
+
+
+def _reserve_line_by_line(requirements, session=None):
+    """Reserve each line with its own guarded update, stopping at the first miss."""
+
+    for index, requirement in enumerate(requirements):
+        result = db.products.update_one(
+            {'_id': requirement['product_id'], 'stock': {'$gte': requirement['quantity']}},
+            {'$inc': {'stock': -requirement['quantity']}},
+            session=session
+        )
+        if result.matched_count == 0:
+            return requirements[:index], requirement
+    return requirements, None
+
+
+def _reserve_stock(requirements, session=None):
+    """Decrement stock for every requirement.
+
+    Uses a single ordered bulk write when the products stock validator is in
+    place, otherwise one guarded update per line. When a line cannot be
+    satisfied (not enough stock, or the product was deleted after
+    validation) the lines already applied are released in one batch outside
+    a transaction; inside one the caller aborts instead. Returns the first
+    unsatisfied requirement, or ``None`` when everything was reserved.
+    """
+
+    if not requirements:
+        return None
+    if _stock_validator_installed():
+        applied, failed = _reserve_in_bulk(requirements, session)
+    else:
+        applied, failed = _reserve_line_by_line(requirements, session)
+    if failed is not None and session is None:
+        _release_stock(applied)
+    return failed
+
+
+def _release_stock(requirements):
+    """Return previously reserved stock in a single unordered bulk write."""
+
+    if not requirements:
+        return
+    db.products.bulk_write(
+        [
+            UpdateOne(
+                {'_id': requirement['product_id']},
+                {'$inc': {'stock': requirement['quantity']}}
+            )
+            for requirement in requirements
+        ],
+        ordered=False
+    )
+
+class _OutOfStock(Exception):
+    """Raised inside an order transaction to abort it for one requirement."""
+
+    def __init__(self, requirement):
+        super().__init__(requirement.get('name'))
+        self.requirement = requirement
+
+
+# Attempt/commit counters for transactional placement; attempts above commits
+# are transactions that were retried or aborted.
+ORDER_TRANSACTION_STATS = {'attempts': 0, 'commits': 0, 'out_of_stock': 0}
+_order_transaction_stats_lock = threading.Lock()
+
+
+def _count_order_transaction(name):
+    with _order_transaction_stats_lock:
+        ORDER_TRANSACTION_STATS[name] += 1
+
+
+def _place_order_in_transaction(order, requirements):
+    """Reserve stock and insert the order inside one multi-document transaction.
+
+    ``with_transaction`` retries the whole callback on TransientTransactionError
+    (e.g. write conflicts between concurrent checkouts of the same product) and
+    retries the commit on UnknownTransactionCommitResult, so either every
+    decrement and the order insert become visible together or none do.
+    """
+
+    def _callback(session):
+        _count_order_transaction('attempts')
+        failed = _reserve_stock(requirements, session=session)
+        if failed is not None:
+            raise _OutOfStock(failed)
+        db.orders.insert_one(order, session=session)
+
+    try:
+        with client.start_session() as session:
+            session.with_transaction(
+                _callback,
+                read_concern=ReadConcern('snapshot'),
+                write_concern=WriteConcern('majority'),
+            )
+    except _OutOfStock as exc:
+        _count_order_transaction('out_of_stock')
+        return exc.requirement
+    _count_order_transaction('commits')
+    return None
+
+
+def _place_order(order, requirements):
+    """Reserve stock for ``requirements`` and insert ``order``.
+
+    Returns the requirement that could not be satisfied, or ``None`` once the
+    order is stored. Uses a transaction when ``ORDER_TRANSACTIONS`` is enabled
+    (requires a replica set); otherwise reserves with a compensating bulk write.
+    """
+
+    if Config.ORDER_TRANSACTIONS:
+        return _place_order_in_transaction(order, requirements)
+
+    failed = _reserve_stock(requirements)
+    if failed is not None:
+        return failed
+    try:
+        db.orders.insert_one(order)
+    except Exception:
+        _release_stock(requirements)
+        raise
+    return None
 
 # ============ ROUTES ============
 
@@ -242,7 +627,9 @@ def register():
             return jsonify({'error': f"Missing fields: {', '.join(missing_fields)}"}), 400
 
         # Verify reCAPTCHA when enabled
-        if Config.ENABLE_RECAPTCHA and not verify_recaptcha(data.get('recaptcha_token')):
+        if Config.ENABLE_RECAPTCHA and not verify_recaptcha(
+            data.get('recaptcha_token'), 'register', data.get('email')
+        ):
             return jsonify({'error': 'reCAPTCHA verification failed'}), 400
 
         existing_user = db.users.find_one({'email': data['email']})
@@ -250,9 +637,7 @@ def register():
             return jsonify({'error': 'User already exists and is verified'}), 400
 
         # Prepare OTP verification record
-        hashed_password = bcrypt.hashpw(
-            data['password'].encode('utf-8'), bcrypt.gensalt()
-        ).decode('utf-8')
+        hashed_password = password_hasher.hash(data['password'])
 
         otp_code = generate_otp()
         verification_record = {
@@ -285,6 +670,10 @@ def register():
 
         return jsonify({'message': 'OTP sent'}), 200
 
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server is busy, please try again shortly'}), 503
+    except MailQueueFull:
+        return jsonify({'error': 'Email service is busy, please request a new OTP shortly'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -294,11 +683,13 @@ def login():
         data = request.json
 
         # Verify reCAPTCHA when enabled
-        if Config.ENABLE_RECAPTCHA and not verify_recaptcha(data.get('recaptcha_token')):
+        if Config.ENABLE_RECAPTCHA and not verify_recaptcha(
+            data.get('recaptcha_token'), 'login', data.get('email')
+        ):
             return jsonify({'error': 'reCAPTCHA verification failed'}), 400
         
         # Find user
-        user = db.users.find_one({'email': data['email']})
+        user = db.users.find_one({'email': data['email']}, {'search_keys': 0})
         if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
 
@@ -306,8 +697,22 @@ def login():
             return jsonify({'error': 'Account is banned'}), 403
         
         # Check password
-        if not bcrypt.checkpw(data['password'].encode('utf-8'), user['password'].encode('utf-8')):
+        if not password_hasher.verify(data['password'], user['password']):
             return jsonify({'error': 'Invalid credentials'}), 401
+
+        # Upgrade hashes stored with a weaker work factor while the plain
+        # password is at hand; the filter skips it if the hash changed meanwhile.
+        # Best effort: a busy pool or failed write must not fail the login.
+        if password_hasher.needs_rehash(user['password']):
+            try:
+                db.users.update_one(
+                    {'_id': user['_id'], 'password': user['password']},
+                    {'$set': {'password': password_hasher.hash(data['password'])}}
+                )
+            except PasswordHasherBusy:
+                pass  # upgraded on a later login
+            except Exception as exc:
+                print(f"Warning: failed to upgrade password hash for {user['_id']}: {exc}")
         
         # Generate JWT token
         role = user.get('role', 'customer')
@@ -327,9 +732,11 @@ def login():
             'role': role,
             'name': user.get('name', ''),
             'email': user['email'],
-            'user': serialize_doc(user)
+            'user': user
         })
         
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server is busy, please try again shortly'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -355,22 +762,24 @@ def verify_otp():
             return jsonify({'error': 'OTP has expired'}), 400
 
         # Avoid duplicate account creation
-        existing_user = db.users.find_one({'email': email})
+        existing_user = db.users.find_one({'email': email}, USER_PUBLIC_PROJECTION)
         if existing_user:
             db.email_verification.delete_one({'_id': verification['_id']})
-            existing_user.pop('password', None)
-            return jsonify({'message': 'User already verified', 'user': serialize_doc(existing_user)})
+            return jsonify({'message': 'User already verified', 'user': existing_user})
 
         user_data = verification.get('user_data', {})
         user_data['isVerified'] = True
         user_data['updatedAt'] = datetime.utcnow()
+        user_data['search_keys'] = build_user_search_keys(user_data)
 
         result = db.users.insert_one(user_data)
         db.email_verification.delete_one({'_id': verification['_id']})
+        dashboard_metrics.bump(db, total_users=1)
 
         user_data['_id'] = str(result.inserted_id)
         user_data.pop('password', None)
-        return jsonify({'message': 'verified', 'user': serialize_doc(user_data)}), 200
+        user_data.pop('search_keys', None)
+        return jsonify({'message': 'verified', 'user': user_data}), 200
     except DuplicateKeyError:
         return jsonify({'error': 'User already exists'}), 400
     except Exception as e:
@@ -406,12 +815,15 @@ def resend_otp():
 
         send_otp_email(email, otp_code)
         return jsonify({'message': 'OTP resent'}), 200
+    except MailQueueFull:
+        return jsonify({'error': 'Email service is busy, please try again shortly'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ============ PRODUCTS ============
 
 @app.route('/api/products', methods=['GET'])
+@db_budget(2)
 def get_products():
     try:
         try:
@@ -432,8 +844,9 @@ def get_products():
         query = {'is_active': True}
         if category:
             query['category'] = category
-        if search:
-            query['name'] = {'$regex': search, '$options': 'i'}
+        text_query = build_text_query(search) if search else None
+        if text_query:
+            query['$text'] = {'$search': text_query}
 
         sort_field = 'createdAt'
         sort_direction = DESCENDING
@@ -457,23 +870,67 @@ def get_products():
             sort_field = 'createdAt'
             sort_direction = DESCENDING
 
-        total = db.products.count_documents(query)
-        skip = (page - 1) * limit
-        products_cursor = (
-            db.products.find(query)
-            .sort(sort_field, sort_direction)
-            .skip(skip)
-            .limit(limit)
+        # Opt-in keyset pagination: any ``cursor`` parameter (empty for the
+        # first page) switches to range scans and skips the total count.
+        cursor_mode = 'cursor' in request.args
+        cursor = request.args.get('cursor') or None
+        rank_by_relevance = bool(text_query) and 'sort' not in request.args
+        position = ('cursor', cursor or '') if cursor_mode else ('page', page)
+        try:
+            projection = build_projection(
+                request.args.get('fields'),
+                PRODUCT_FIELDS,
+                PRODUCT_LIST_PROJECTION,
+                required=(sort_field,) if cursor_mode else (),
+            )
+        except InvalidFieldsError as exc:
+            return jsonify({'error': str(exc)}), 400
+        cache_key = (
+            'products', category, text_query, sort_field, sort_direction,
+            rank_by_relevance, limit, position, projection_key(projection)
         )
-        products = [serialize_doc(product) for product in products_cursor]
 
-        return jsonify({
-            'products': products,
-            'total': total,
-            'page': page,
-            'limit': limit,
-            'count': len(products)
-        })
+        def load_page():
+            if cursor_mode:
+                documents, next_cursor = fetch_keyset_page(
+                    db.products,
+                    query,
+                    sort_field,
+                    sort_direction,
+                    limit,
+                    cursor,
+                    projection,
+                )
+                return build_cursor_response(documents, next_cursor, limit)
+
+            total = db.products.count_documents(query)
+            skip = (page - 1) * limit
+            # Searches without an explicit sort are ordered by relevance.
+            if rank_by_relevance:
+                sort_spec = [('score', {'$meta': 'textScore'}), ('_id', DESCENDING)]
+            else:
+                sort_spec = [(sort_field, sort_direction)]
+            products_cursor = (
+                db.products.find(query, projection)
+                .sort(sort_spec)
+                .skip(skip)
+                .limit(limit)
+            )
+            products = list(products_cursor)
+            return {
+                'products': products,
+                'total': total,
+                'page': page,
+                'limit': limit,
+                'count': len(products)
+            }
+
+        try:
+            payload = product_cache.get_or_load(cache_key, load_page, tags=_product_page_tags)
+        except InvalidCursorError as exc:
+            return jsonify({'error': str(exc)}), 400
+
+        return jsonify(payload)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -481,10 +938,14 @@ def get_products():
 @app.route('/api/products/<product_id>', methods=['GET'])
 def get_product(product_id):
     try:
-        product = db.products.find_one({'_id': ObjectId(product_id), 'is_active': True})
+        try:
+            fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+        except InvalidFieldsError as exc:
+            return jsonify({'error': str(exc)}), 400
+        product = _get_active_product(ObjectId(product_id))
         if not product:
             return jsonify({'error': 'Product not found'}), 404
-        return jsonify(serialize_doc(product))
+        return jsonify(select_fields(product, fields))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -493,16 +954,18 @@ def get_product(product_id):
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     try:
-        categories = list(db.categories.find())
-        return jsonify({
-            'categories': [serialize_doc(cat) for cat in categories]
-        })
+        body, etag = category_catalog.get(db)
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={Config.CATEGORY_HTTP_MAX_AGE}'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ============ CART ============
 
 @app.route('/api/cart', methods=['GET'])
+@db_budget(2)
 @token_required
 def get_cart(current_user):
     try:
@@ -516,7 +979,7 @@ def get_cart(current_user):
                 'total': 0
             })
         
-        return jsonify(serialize_doc(cart))
+        return jsonify(cart)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -537,7 +1000,7 @@ def add_to_cart(current_user):
             return jsonify({'error': 'Invalid product ID'}), 400
 
         # Get product
-        product = db.products.find_one({'_id': product_object_id, 'is_active': True})
+        product = _get_active_product(product_object_id)
         if not product:
             return jsonify({'error': 'Product not found'}), 404
 
@@ -553,59 +1016,142 @@ def add_to_cart(current_user):
         if available_stock < quantity:
             return jsonify({'message': f"Out of stock for {product.get('name', 'product')}"}), 400
 
-        # Get or create cart
-        cart = db.carts.find_one({'userId': user_id})
+        # Merge the line server-side in one atomic upsert so concurrent tabs
+        # cannot overwrite each other's increments.
+        cart = _upsert_cart(
+            user_id, _cart_add_pipeline(str(product_object_id), quantity, product['price'])
+        )
 
-        if not cart:
-            cart = {
-                'userId': user_id,
-                'items': [],
-                'total': 0,
-                'updatedAt': datetime.utcnow()
+        return jsonify({'message': 'Item added to cart', 'cart': cart})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cart', methods=['PUT'])
+@token_required
+def replace_cart(current_user):
+    try:
+        user_id = str(current_user['_id'])
+
+        data = request.get_json(force=True, silent=True)
+        raw_items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(raw_items, list):
+            return jsonify({'error': 'Cart items must be a list'}), 400
+
+        requested = {}
+        for raw_item in raw_items:
+            if not isinstance(raw_item, dict):
+                return jsonify({'error': 'Each item must be an object'}), 400
+            product_identifier = (
+                raw_item.get('productId')
+                or raw_item.get('product_id')
+                or raw_item.get('id')
+            )
+            try:
+                product_object_id = ObjectId(product_identifier)
+            except (InvalidId, TypeError):
+                return jsonify({'error': 'Invalid product ID'}), 400
+            try:
+                quantity = int(raw_item.get('quantity', 1))
+            except (TypeError, ValueError):
+                quantity = 0
+            if quantity < 1:
+                return jsonify({'error': 'Quantity must be at least 1'}), 400
+            # Duplicate lines for one product collapse into a single line.
+            requested[product_object_id] = requested.get(product_object_id, 0) + quantity
+
+        products_by_id = {}
+        if requested:
+            products_by_id = {
+                product['_id']: product
+                for product in db.products.find(
+                    {'_id': {'$in': list(requested)}, 'is_active': True},
+                    {'name': 1, 'price': 1, 'stock': 1}
+                )
             }
-            db.carts.insert_one(cart)
-
-        # Add or update item
-        item_existing = False
-        for item in cart['items']:
-            if item['productId'] == str(product_object_id):
-                item['quantity'] += quantity
-                item['subtotal'] = item['quantity'] * item['price']
-                item_existing = True
-                break
-
-        if not item_existing:
-            cart['items'].append({
-                'productId': str(product['_id']),
+
+        items = []
+        adjusted = []
+        removed = []
+        for product_object_id, quantity in requested.items():
+            product = products_by_id.get(product_object_id)
+            available_stock = int(product.get('stock') or 0) if product else 0
+            if available_stock < 1:
+                removed.append(str(product_object_id))
+                continue
+            if quantity > available_stock:
+                adjusted.append({'productId': str(product_object_id), 'quantity': available_stock})
+                quantity = available_stock
+            price = product['price']
+            items.append({
+                'productId': str(product_object_id),
                 'quantity': quantity,
-                'price': product['price'],
-                'subtotal': product['price'] * quantity
+                'price': price,
+                'subtotal': price * quantity
             })
-        
-        # Calculate total
-        cart['total'] = sum(item['subtotal'] for item in cart['items'])
-        cart['updatedAt'] = datetime.utcnow()
-        
-        # Update cart
-        db.carts.update_one({'_id': cart['_id']}, {'$set': cart})
-        
-        return jsonify({'message': 'Item added to cart', 'cart': serialize_doc(cart)})
-        
+
+        cart = _upsert_cart(user_id, {'$set': {
+            'items': items,
+            'total': sum(item['subtotal'] for item in items),
+            'updatedAt': datetime.utcnow()
+        }})
+
+        return jsonify({
+            'message': 'Cart updated',
+            'cart': cart,
+            'adjusted': adjusted,
+            'removed': removed
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cart/<product_id>', methods=['DELETE'])
+@token_required
+def remove_from_cart(current_user, product_id):
+    try:
+        user_id = str(current_user['_id'])
+
+        remaining = {'$filter': {
+            'input': {'$ifNull': ['$items', []]},
+            'as': 'item',
+            'cond': {'$ne': ['$$item.productId', product_id]}
+        }}
+        cart = db.carts.find_one_and_update(
+            {'userId': user_id},
+            [
+                {'$set': {'items': remaining, 'updatedAt': '$$NOW'}},
+                {'$set': {'total': {'$sum': '$items.subtotal'}}}
+            ],
+            return_document=ReturnDocument.AFTER
+        )
+        if not cart:
+            cart = {'userId': user_id, 'items': [], 'total': 0}
+
+        return jsonify({'message': 'Item removed from cart', 'cart': cart})
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ============ ORDERS ============
 
 @app.route('/api/orders', methods=['GET'])
+@db_budget(3)
 @token_required
 def get_orders(current_user):
     try:
         user_id = str(current_user['_id'])
-        
-        orders = list(db.orders.find({'userId': user_id}).sort('createdAt', -1))
+
+        try:
+            projection = build_projection(
+                request.args.get('fields'), ORDER_FIELDS, ORDER_PUBLIC_PROJECTION
+            )
+        except InvalidFieldsError as exc:
+            return jsonify({'error': str(exc)}), 400
+        orders = list(db.orders.find({'userId': user_id}, projection).sort('createdAt', -1))
         
         return jsonify({
-            'orders': [serialize_doc(order) for order in orders]
+            'orders': orders
         })
         
     except Exception as e:
@@ -618,19 +1164,13 @@ def create_order(current_user):
         data = request.json
         user_id = str(current_user['_id'])
 
-        # Generate order ID
-        order_id = f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
         payload = request.get_json(force=True, silent=True) or {}
         raw_items = payload.get('items') or []
 
         if not isinstance(raw_items, list) or not raw_items:
             return jsonify({'error': 'Order items are required'}), 400
 
-        validated_items = []
-        stock_requirements = []
-        subtotal = 0.0
-
+        requested_lines = []
         for raw_item in raw_items:
             product_identifier = (
                 raw_item.get('productId')
@@ -653,7 +1193,23 @@ def create_order(current_user):
             if quantity < 1:
                 return jsonify({'error': 'Quantity must be at least 1'}), 400
 
-            product = db.products.find_one({'_id': product_object_id})
+            requested_lines.append((product_object_id, quantity))
+
+        # One round trip for every product referenced by the order.
+        products_by_id = {
+            product['_id']: product
+            for product in db.products.find(
+                {'_id': {'$in': list({line[0] for line in requested_lines})}},
+                ORDER_PRODUCT_PROJECTION,
+            )
+        }
+
+        validated_items = []
+        stock_requirements = {}
+        subtotal = 0.0
+
+        for product_object_id, quantity in requested_lines:
+            product = products_by_id.get(product_object_id)
             if not product:
                 return jsonify({'error': 'Product not found'}), 404
 
@@ -661,8 +1217,16 @@ def create_order(current_user):
             if price < 0:
                 return jsonify({'error': f"Invalid price configured for {product.get('name', 'product')}"}), 400
 
+            # Repeated lines for the same product draw on the same stock.
+            requirement = stock_requirements.setdefault(product_object_id, {
+                'product_id': product_object_id,
+                'quantity': 0,
+                'name': product.get('name')
+            })
+            requirement['quantity'] += quantity
+
             available_stock = int(product.get('stock') or 0)
-            if available_stock < quantity:
+            if available_stock < requirement['quantity']:
                 return jsonify({'message': f"Out of stock for {product.get('name', 'product')}"}), 400
 
             line_total = round(price * quantity, 2)
@@ -681,11 +1245,6 @@ def create_order(current_user):
                 'quantity': quantity,
                 'subtotal': line_total
             })
-            stock_requirements.append({
-                'product_id': product_object_id,
-                'quantity': quantity,
-                'name': product.get('name')
-            })
 
         subtotal = round(subtotal, 2)
         shipping_fee = SHIPPING_FLAT_RATE if subtotal > 0 else 0.0
@@ -700,7 +1259,7 @@ def create_order(current_user):
             payment_info = {}
 
         order = {
-            'orderId': order_id,
+            'orderId': order_numbers.next(),
             'userId': user_id,
             'items': validated_items,
             'shipping': shipping_info,
@@ -713,44 +1272,34 @@ def create_order(current_user):
             'createdAt': datetime.utcnow(),
             'updatedAt': datetime.utcnow()
         }
+        # Search keys are stored with the order but not echoed back.
+        stored_order = {
+            **order,
+            **status_fields(order['status']),
+            **order_search_fields(
+                build_order_search_keys(order), build_customer_search_keys(current_user)
+            ),
+        }
 
-        decremented = []
         try:
-            for requirement in stock_requirements:
-                result = db.products.update_one(
-                    {
-                        '_id': requirement['product_id'],
-                        'stock': {'$gte': requirement['quantity']}
-                    },
-                    {'$inc': {'stock': -requirement['quantity']}}
-                )
-                if result.modified_count == 0:
-                    # Rollback any prior stock updates before returning an error
-                    for change in decremented:
-                        db.products.update_one(
-                            {'_id': change['product_id']},
-                            {'$inc': {'stock': change['quantity']}}
-                        )
-                    return jsonify({'message': f"Out of stock for {requirement['name'] or 'product'}"}), 400
-                decremented.append(requirement)
-
-            result = db.orders.insert_one(order)
-            order['_id'] = str(result.inserted_id)
-
-            return jsonify({'message': 'Order created successfully', 'order': serialize_doc(order)}), 201
-        except Exception:
-            for change in decremented:
-                db.products.update_one(
-                    {'_id': change['product_id']},
-                    {'$inc': {'stock': change['quantity']}}
-                )
-            raise
+            failed = _place_order(stored_order, list(stock_requirements.values()))
+            if failed is not None:
+                return jsonify({'message': f"Out of stock for {failed['name'] or 'product'}"}), 400
+
+            record_order_created(db, stored_order)
+            dashboard_metrics.record_order_created(db, stored_order)
+            order['_id'] = stored_order['_id']
+            return jsonify({'message': 'Order created successfully', 'order': order}), 201
+        finally:
+            # Cached product documents now show outdated stock levels.
+            invalidate_products(*stock_requirements)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/orders/<order_id>', methods=['GET'])
+@db_budget(2)
 @token_required
 def get_order_detail(current_user, order_id):
     try:
@@ -778,6 +1327,7 @@ def get_order_detail(current_user, order_id):
 
 
 @app.route('/api/orders/<order_id>/status', methods=['PATCH'])
+@db_budget(4)
 @token_required
 def update_order_status_user(current_user, order_id):
     try:
@@ -809,11 +1359,20 @@ def update_order_status_user(current_user, order_id):
             return jsonify({'error': 'Only pending orders can be cancelled'}), 400
 
         update_doc = {
-            '$set': {'status': 'cancelled', 'updatedAt': datetime.utcnow()},
+            '$set': {**status_fields('cancelled'), 'updatedAt': datetime.utcnow()},
         }
 
-        db.orders.update_one({'_id': order['_id']}, update_doc)
-        updated = db.orders.find_one({'_id': order['_id']})
+        # Only cancel if nobody changed the status since it was read.
+        updated = db.orders.find_one_and_update(
+            {'_id': order['_id'], 'status': order.get('status')},
+            update_doc,
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is None:
+            return jsonify({'error': 'Order status changed, please reload'}), 409
+        record_status_change(db, order, 'cancelled')
+        dashboard_metrics.record_order_status_change(db, order, 'cancelled')
+        record_revenue_status_change(db, order, 'cancelled')
 
         return jsonify(order_to_dict(updated))
 
@@ -826,8 +1385,10 @@ def update_order_status_user(current_user, order_id):
 @token_required
 def get_user_profile(current_user):
     try:
-        user = serialize_doc(current_user)
-        user.pop('password', None)  # Remove password from response
+        # ``current_user`` only carries the cached auth fields; load the profile.
+        user = db.users.find_one({'_id': current_user['_id']}, USER_PUBLIC_PROJECTION)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         return jsonify({'user': user})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -854,21 +1415,25 @@ def update_user_profile(current_user):
             update_fields['email'] = new_email
 
         if not update_fields:
+            unchanged_user = db.users.find_one({'_id': user_id}, USER_PUBLIC_PROJECTION)
             return jsonify({
                 'message': 'No changes made',
-                'user': serialize_doc(current_user)
+                'user': unchanged_user
             })
 
         update_fields['updatedAt'] = datetime.utcnow()
+        stored = db.users.find_one({'_id': user_id}, {'name': 1, 'email': 1, 'phone': 1}) or {}
+        update_fields['search_keys'] = build_user_search_keys({**stored, **update_fields})
 
         try:
             db.users.update_one({'_id': user_id}, {'$set': update_fields})
         except DuplicateKeyError:
             return jsonify({'message': 'Email already exists'}), 400
+        invalidate_user_cache(user_id)
+        if 'name' in update_fields or 'email' in update_fields:
+            refresh_customer_order_keys(db, user_id, {**stored, **update_fields})
 
-        updated_user = db.users.find_one({'_id': user_id})
-        updated_user = serialize_doc(updated_user)
-        updated_user.pop('password', None)
+        updated_user = db.users.find_one({'_id': user_id}, USER_PUBLIC_PROJECTION)
 
         return jsonify({
             'message': 'Profile updated successfully',
@@ -0,0 +1,118 @@
+# Admin search latency benchmark for Medicare
+#
+# Seeds a large user collection and compares the old admin search (three
+# unanchored case-insensitive regexes plus a count with the same filter)
+# with the search_keys index: prefix lookups and the trigram fallback used
+# for typos.
+#
+#   python bench_admin_search.py --users 1000000 --repeat 20
+#
+# Runs against its own database (medicare_bench by default, the name must end
+# with _bench) and drops it afterwards.
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_NAME', 'medicare_bench')
+
+from pymongo import MongoClient  # noqa: E402
+
+from config import Config  # noqa: E402
+from utils.indexes import reconcile_indexes  # noqa: E402
+from utils.search import (  # noqa: E402
+    build_search_keys_filter,
+    build_user_search_keys,
+    fuzzy_search_page,
+)
+
+FIRST_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Hà', 'Hùng', 'Lan', 'Minh', 'Nam', 'Phương', 'Quân', 'Thảo']
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Đặng', 'Bùi']
+QUERIES = ['nguyen', 'tran lan', 'minh.pham', '0912 34', 'phuong4', 'hoagn']
+
+
+def seed(db, count, batch_size=10000):
+    rng = random.Random(42)
+    batch = []
+    for index in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        user = {
+            'name': f'{last} {first}',
+            'email': f'{first.lower()}.{last.lower()}{index}@example.com',
+            'phone': f'+84 9{rng.randrange(10**8):08d}',
+            'role': 'customer',
+            'createdAt': datetime.utcnow(),
+        }
+        user['search_keys'] = build_user_search_keys(user)
+        batch.append(user)
+        if len(batch) >= batch_size:
+            db.users.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.users.insert_many(batch, ordered=False)
+
+
+def legacy_search(db, q, limit):
+    query = {'$or': [
+        {'name': {'$regex': q, '$options': 'i'}},
+        {'email': {'$regex': q, '$options': 'i'}},
+        {'phone': {'$regex': q, '$options': 'i'}},
+    ]}
+    total = db.users.count_documents(query)
+    list(db.users.find(query).sort('createdAt', -1).limit(limit))
+    return total
+
+
+def indexed_search(db, q, limit):
+    query = build_search_keys_filter(q) or {}
+    total = db.users.count_documents(query)
+    if total == 0:
+        _, total = fuzzy_search_page(db.users, {}, q, 0, limit)
+        return total
+    list(db.users.find(query).sort('createdAt', -1).limit(limit))
+    return total
+
+
+def measure(label, search, db, repeat, limit):
+    for q in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            total = search(db, q, limit)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(
+            f'{label:<8} {q!r:<14} matches {total:>8}  '
+            f'p50 {statistics.median(timings):8.1f} ms  p95 {p95:8.1f} ms'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Admin search latency benchmark')
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if not Config.DATABASE_NAME.endswith('_bench'):
+        raise SystemExit('Refusing to run: DATABASE_NAME must end with _bench')
+
+    client = MongoClient(Config.MONGODB_URI)
+    db = client[Config.DATABASE_NAME]
+    try:
+        started = time.perf_counter()
+        seed(db, args.users)
+        reconcile_indexes(db, collections={'users'})
+        print(f'seeded {args.users:,} users in {time.perf_counter() - started:.1f}s')
+
+        measure('regex', legacy_search, db, args.repeat, args.limit)
+        measure('indexed', indexed_search, db, args.repeat, args.limit)
+    finally:
+        client.drop_database(Config.DATABASE_NAME)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Cart concurrency check for Medicare
+#
+# Many threads add the same product to one user's cart through POST /api/cart
+# at the same time, as several open browser tabs would. With atomic cart
+# updates the final quantity must equal the number of successful adds.
+#
+#   python bench_cart_concurrency.py --threads 32 --adds 50
+#
+# Runs against its own database (medicare_bench by default, the name must end
+# with _bench) and drops it afterwards.
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DATABASE_NAME', 'medicare_bench')
+
+import jwt  # noqa: E402
+
+import app as medicare  # noqa: E402  (the database name must be set first)
+from config import Config  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cart concurrency check')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--adds', type=int, default=50, help='adds per thread')
+    args = parser.parse_args()
+
+    if not Config.DATABASE_NAME.endswith('_bench'):
+        raise SystemExit('Refusing to run: DATABASE_NAME must end with _bench')
+
+    db = medicare.db
+    try:
+        user_id = db.users.insert_one({
+            'email': 'cart-bench@example.com',
+            'name': 'Cart Bench',
+            'role': 'customer',
+            'is_banned': False,
+        }).inserted_id
+        product_id = db.products.insert_one({
+            'name': 'Cart bench product',
+            'price': 1.5,
+            'stock': 1_000_000,
+            'is_active': True,
+            'createdAt': datetime.utcnow(),
+        }).inserted_id
+        token = jwt.encode(
+            {'user_id': str(user_id), 'exp': datetime.utcnow() + timedelta(hours=1)},
+            Config.JWT_SECRET_KEY,
+            algorithm=Config.JWT_ALGORITHM,
+        )
+        headers = {'Authorization': f'Bearer {token}'}
+        succeeded = [0]
+        lock = threading.Lock()
+
+        def worker():
+            client = medicare.app.test_client()
+            ok = 0
+            for _ in range(args.adds):
+                response = client.post(
+                    '/api/cart', json={'productId': str(product_id), 'quantity': 1}, headers=headers
+                )
+                if response.status_code == 200:
+                    ok += 1
+            with lock:
+                succeeded[0] += ok
+
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        carts = list(db.carts.find({'userId': str(user_id)}))
+        quantity = sum(item['quantity'] for cart in carts for item in cart['items'])
+        lines = sum(len(cart['items']) for cart in carts)
+        print(f'adds/sec:        {succeeded[0] / elapsed:,.1f}')
+        print(f'successful adds: {succeeded[0]}')
+        print(f'cart documents:  {len(carts)}  lines: {lines}')
+        print(f'final quantity:  {quantity}')
+        print(f'lost increments: {succeeded[0] - quantity}')
+        if len(carts) != 1 or lines != 1 or quantity != succeeded[0]:
+            raise SystemExit('FAILED: cart updates were lost or duplicated')
+    finally:
+        medicare.client.drop_database(Config.DATABASE_NAME)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# Order placement benchmark for Medicare
+#
+# Places orders through POST /api/orders (Flask test client, so routing,
+# validation, reservation and the order insert all run) with a growing
+# number of lines per order, and reports MongoDB round trips per request
+# (from the X-DB-Commands header) and latency percentiles for each size:
+#
+#   python bench_create_order.py --lines 1,5,10,30,50 --orders 200
+#
+# Round trips should stay flat as the line count grows (reservations are
+# one bulk write once the products stock validator is installed, which the
+# first order does). The benchmark uses its own database (medicare_bench by
+# default, the name must end with _bench) and drops it afterwards.
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_NAME', 'medicare_bench')
+os.environ.setdefault('DB_INSTRUMENTATION', 'True')
+
+import jwt  # noqa: E402
+
+import app as medicare  # noqa: E402  (the database name must be set first)
+from config import Config  # noqa: E402
+
+
+def seed(products, stock):
+    medicare.db.products.delete_many({})
+    medicare.db.orders.delete_many({})
+    medicare.db.users.delete_many({'email': 'bench@medicare.test'})
+    product_ids = medicare.db.products.insert_many([
+        {
+            'name': f'Bench product {index}',
+            'price': 10.0,
+            'stock': stock,
+            'is_active': True,
+            'category': 'pain-relief',
+            'createdAt': datetime.utcnow(),
+        }
+        for index in range(products)
+    ]).inserted_ids
+    user_id = medicare.db.users.insert_one({
+        'name': 'Bench User',
+        'email': 'bench@medicare.test',
+        'role': 'customer',
+        'createdAt': datetime.utcnow(),
+    }).inserted_id
+    token = jwt.encode({'user_id': str(user_id)}, Config.JWT_SECRET_KEY, algorithm=Config.JWT_ALGORITHM)
+    return product_ids, {'Authorization': f'Bearer {token}'}
+
+
+def percentile(values, fraction):
+    return values[max(int(len(values) * fraction) - 1, 0)]
+
+
+def run(client, headers, product_ids, lines, orders):
+    payload = {
+        'items': [{'productId': str(product_id), 'quantity': 1} for product_id in product_ids[:lines]],
+        'shipping': {'name': 'Bench User', 'city': 'Hanoi'},
+        'payment': {'method': 'cod'},
+    }
+    latencies = []
+    round_trips = []
+    failures = 0
+    for _ in range(orders):
+        started = time.perf_counter()
+        response = client.post('/api/orders', json=payload, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 201:
+            failures += 1
+        round_trips.append(int(response.headers.get('X-DB-Commands', 0)))
+
+    latencies.sort()
+    print(
+        f'{lines:>6}  {statistics.median(round_trips):>11.0f}  {max(round_trips):>6}  '
+        f'{statistics.median(latencies) * 1000:>8.2f}  {percentile(latencies, 0.99) * 1000:>8.2f}  '
+        f'{failures:>6}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Order placement round trips by line count')
+    parser.add_argument('--lines', default='1,5,10,30,50', help='comma separated line counts')
+    parser.add_argument('--orders', type=int, default=200, help='orders per line count')
+    args = parser.parse_args()
+
+    if not Config.DATABASE_NAME.endswith('_bench'):
+        raise SystemExit('Refusing to run: DATABASE_NAME must end with _bench')
+    if not Config.DB_INSTRUMENTATION:
+        raise SystemExit('Refusing to run: DB_INSTRUMENTATION must be enabled to count round trips')
+
+    line_counts = [int(value) for value in args.lines.split(',')]
+    try:
+        product_ids, headers = seed(max(line_counts), stock=args.orders * len(line_counts) + 1)
+        client = medicare.app.test_client()
+        client.post('/api/orders', json={'items': [{'productId': str(product_ids[0]), 'quantity': 1}]},
+                    headers=headers)  # warm the auth cache and order number block
+
+        print(f'{"lines":>6}  {"round trips":>11}  {"max":>6}  {"p50 ms":>8}  {"p99 ms":>8}  {"failed":>6}')
+        for lines in line_counts:
+            run(client, headers, product_ids, lines, args.orders)
+    finally:
+        medicare.client.drop_database(Config.DATABASE_NAME)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# JSON encoding microbenchmark for Medicare
+#
+# Compares the old response path (serialize_doc copies every document, then
+# Flask encodes the copy) with the Mongo-aware JSON provider that encodes raw
+# documents in a single pass. Reports CPU time and peak allocations for a
+# 100-product list page and a page of orders with 100 lines each.
+#
+#   python bench_json_encoding.py --iterations 200
+#
+# No database is needed.
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils.helpers import serialize_doc
+from utils.json_provider import MongoJSONProvider
+
+
+def make_products(count):
+    now = datetime.utcnow()
+    return [
+        {
+            '_id': ObjectId(),
+            'name': f'Product {index}',
+            'category': 'vitamins',
+            'price': 9.99 + index,
+            'stock': 100,
+            'is_active': True,
+            'images': [f'https://cdn.example.com/{index}/{image}.jpg' for image in range(3)],
+            'specifications': [{'label': 'Dosage', 'value': '500mg'}, {'label': 'Pack', 'value': '30'}],
+            'description': 'Lorem ipsum dolor sit amet. ' * 8,
+            'createdAt': now - timedelta(days=index),
+            'updatedAt': now,
+        }
+        for index in range(count)
+    ]
+
+
+def make_orders(count, lines):
+    now = datetime.utcnow()
+    return [
+        {
+            '_id': ObjectId(),
+            'orderId': f'ORD{index:012d}',
+            'userId': str(ObjectId()),
+            'items': [
+                {'productId': str(ObjectId()), 'name': f'Item {line}', 'price': 4.5, 'quantity': 2, 'subtotal': 9.0}
+                for line in range(lines)
+            ],
+            'shipping': {'fullName': 'Jane Doe', 'address': '1 Main St', 'city': 'Hanoi'},
+            'payment': {'method': 'cod', 'status': 'pending'},
+            'status': 'Pending',
+            'total': 9.0 * lines,
+            'createdAt': now,
+            'updatedAt': now,
+        }
+        for index in range(count)
+    ]
+
+
+def measure(label, encode, iterations):
+    encode()  # warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        encode()
+    cpu_ms = (time.process_time() - started) * 1000 / iterations
+
+    tracemalloc.start()
+    encode()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<34} {cpu_ms:8.3f} ms/response  peak {peak / 1024:8.1f} KiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON encoding microbenchmark')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=10)
+    parser.add_argument('--lines', type=int, default=100, help='items per order')
+    args = parser.parse_args()
+
+    legacy = DefaultJSONProvider(Flask('legacy'))
+    single_pass = MongoJSONProvider(Flask('single_pass'))
+    pages = {
+        'products': {'products': make_products(args.products)},
+        'orders': {'orders': make_orders(args.orders, args.lines)},
+    }
+
+    for name, page in pages.items():
+        key = next(iter(page))
+        measure(
+            f'{name}: serialize_doc + encode',
+            lambda: legacy.dumps({key: [serialize_doc(doc) for doc in page[key]]}),
+            args.iterations,
+        )
+        measure(f'{name}: provider, single pass', lambda: single_pass.dumps(page), args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# Order placement contention benchmark for Medicare
+#
+# N worker threads place orders against M hot products through the same
+# placement code used by POST /api/orders, once with the legacy reserve/release
+# path and once inside MongoDB transactions. Transactions need a replica set;
+# a local single-node one is enough:
+#
+#   mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+#   mongosh --eval 'rs.initiate()'
+#   MONGODB_URI='mongodb://localhost:27017/?replicaSet=rs0' \
+#       python bench_order_contention.py --workers 32 --products 4 --orders 200
+#
+# The benchmark uses its own database (medicare_bench by default, the name
+# must end with _bench) and drops it afterwards.
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_NAME', 'medicare_bench')
+
+import app as medicare  # noqa: E402  (the database name must be set first)
+from config import Config  # noqa: E402
+
+
+def seed_products(count, stock):
+    medicare.db.products.delete_many({})
+    medicare.db.orders.delete_many({})
+    result = medicare.db.products.insert_many([
+        {
+            'name': f'Hot product {index}',
+            'price': 10.0,
+            'stock': stock,
+            'is_active': True,
+            'createdAt': datetime.utcnow(),
+        }
+        for index in range(count)
+    ])
+    return result.inserted_ids
+
+
+def place_random_order(product_ids, lines):
+    chosen = random.sample(product_ids, min(lines, len(product_ids)))
+    requirements = [
+        {'product_id': product_id, 'quantity': 1, 'name': str(product_id)}
+        for product_id in chosen
+    ]
+    order = {
+        'userId': 'bench',
+        'items': [{'productId': str(r['product_id']), 'quantity': 1} for r in requirements],
+        'status': 'Pending',
+        'createdAt': datetime.utcnow(),
+    }
+    return medicare._place_order(order, requirements) is None
+
+
+def run(mode, args):
+    Config.ORDER_TRANSACTIONS = mode == 'transaction'
+    for key in medicare.ORDER_TRANSACTION_STATS:
+        medicare.ORDER_TRANSACTION_STATS[key] = 0
+
+    product_ids = seed_products(args.products, args.stock)
+    latencies = []
+    outcomes = {'placed': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def worker():
+        local_latencies = []
+        local = {'placed': 0, 'rejected': 0, 'errors': 0}
+        for _ in range(args.orders):
+            started = time.perf_counter()
+            try:
+                if place_random_order(product_ids, args.lines):
+                    local['placed'] += 1
+                else:
+                    local['rejected'] += 1
+            except Exception:
+                local['errors'] += 1
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            for key, value in local.items():
+                outcomes[key] += value
+
+    threads = [threading.Thread(target=worker) for _ in range(args.workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    remaining = sum(p['stock'] for p in medicare.db.products.find({}, {'stock': 1}))
+    sold = sum(
+        item['quantity']
+        for order in medicare.db.orders.find({}, {'items': 1})
+        for item in order['items']
+    )
+    consistent = remaining + sold == args.products * args.stock
+
+    latencies.sort()
+    stats = medicare.ORDER_TRANSACTION_STATS
+    retried = stats['attempts'] - stats['commits'] - stats['out_of_stock']
+    print(f'--- {mode} ---')
+    print(f"orders/sec:    {outcomes['placed'] / elapsed:,.1f}")
+    print(f"placed:        {outcomes['placed']}  rejected: {outcomes['rejected']}  errors: {outcomes['errors']}")
+    if mode == 'transaction':
+        print(f"txn attempts:  {stats['attempts']}  abort rate: {retried / max(stats['attempts'], 1):.2%}")
+    print(f'p50 latency:   {statistics.median(latencies) * 1000:.2f} ms')
+    print(f'p99 latency:   {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms')
+    print(f'max latency:   {latencies[-1] * 1000:.2f} ms')
+    print(f'stock consistent: {consistent}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Order placement contention benchmark')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--products', type=int, default=4)
+    parser.add_argument('--orders', type=int, default=100, help='orders per worker')
+    parser.add_argument('--lines', type=int, default=2, help='hot products per order')
+    parser.add_argument('--stock', type=int, default=1000)
+    parser.add_argument('--modes', default='legacy,transaction')
+    args = parser.parse_args()
+
+    if not Config.DATABASE_NAME.endswith('_bench'):
+        raise SystemExit('Refusing to run: DATABASE_NAME must end with _bench')
+
+    try:
+        for mode in args.modes.split(','):
+            run(mode.strip(), args)
+    finally:
+        medicare.client.drop_database(Config.DATABASE_NAME)
+
+
+if __name__ == '__main__':
+    main()
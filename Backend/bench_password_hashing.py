@@ -0,0 +1,74 @@
+# Password hashing throughput benchmark for Medicare
+#
+# Measures how many logins (bcrypt checks) per second the hashing pool
+# sustains at several work factors, and normalises the result per core. Use
+# it to choose BCRYPT_ROUNDS / BCRYPT_TARGET_MS and BCRYPT_WORKERS:
+#
+#   python bench_password_hashing.py --rounds 10,11,12,13 --workers 4
+#
+# No database is needed.
+import argparse
+import os
+import threading
+import time
+
+import bcrypt
+
+from utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def measure(rounds, workers, clients, duration):
+    hasher = PasswordHasher(workers=workers, max_pending=clients, rounds=rounds)
+    stored = bcrypt.hashpw(b'correct horse', bcrypt.gensalt(rounds)).decode('utf-8')
+    hasher.verify('warm up', stored)  # start the pool outside the timed window
+
+    completed = [0]
+    rejected = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        done = busy = 0
+        while time.perf_counter() < deadline:
+            try:
+                hasher.verify('correct horse', stored)
+                done += 1
+            except PasswordHasherBusy:
+                busy += 1
+        with lock:
+            completed[0] += done
+            rejected[0] += busy
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    logins_per_sec = completed[0] / elapsed
+    cores = max(workers, 1)
+    print(
+        f'cost {rounds:>2}: {logins_per_sec:8.1f} logins/s  '
+        f'{logins_per_sec / cores:7.1f} per core  '
+        f'{1000 * cores / max(logins_per_sec, 1e-9):7.1f} ms per hash  '
+        f'(busy rejections: {rejected[0]})'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Password hashing throughput benchmark')
+    parser.add_argument('--rounds', default='10,11,12,13')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--clients', type=int, default=32, help='concurrent login threads')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per cost factor')
+    args = parser.parse_args()
+
+    print(f'workers: {args.workers}  clients: {args.clients}')
+    for rounds in args.rounds.split(','):
+        measure(int(rounds), args.workers, args.clients, args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,25 @@ class Config:
         'RECAPTCHA_SECRET_KEY', '6LfGbvwrAAAAADdlE7GTi5LekEyGKzde4J6_L2-z'
     )
 
+    RECAPTCHA_VERIFY_URL = os.getenv(
+        'RECAPTCHA_VERIFY_URL', 'https://www.google.com/recaptcha/api/siteverify'
+    )
+    RECAPTCHA_CONNECT_TIMEOUT = float(os.getenv('RECAPTCHA_CONNECT_TIMEOUT', 0.5))
+    RECAPTCHA_READ_TIMEOUT = float(os.getenv('RECAPTCHA_READ_TIMEOUT', 1.5))
+    # Accept submissions while the verifier is unreachable (fail-open) or
+    # reject them (fail-closed, the default)
+    RECAPTCHA_FAIL_OPEN = os.getenv('RECAPTCHA_FAIL_OPEN', 'False').lower() in {
+        'true',
+        '1',
+        'yes',
+    }
+    RECAPTCHA_BREAKER_THRESHOLD = int(os.getenv('RECAPTCHA_BREAKER_THRESHOLD', 5))
+    RECAPTCHA_BREAKER_RESET = float(os.getenv('RECAPTCHA_BREAKER_RESET', 30))
+    RECAPTCHA_TOKEN_CACHE_TTL = float(os.getenv('RECAPTCHA_TOKEN_CACHE_TTL', 120))
+    # Resubmissions of the same form (same action, email and client) a
+    # verified token still covers within the cache TTL
+    RECAPTCHA_TOKEN_MAX_REUSE = int(os.getenv('RECAPTCHA_TOKEN_MAX_REUSE', 1))
+
     if not JWT_SECRET_KEY:
         raise RuntimeError('Missing JWT secret in environment variables')
     if ENABLE_RECAPTCHA and not RECAPTCHA_SECRET_KEY:
@@ -46,12 +65,77 @@ class Config:
         'http://127.0.0.1:5173'       # Vite (React)
     ]
 
+    # Place orders inside a multi-document transaction (needs a replica set)
+    ORDER_TRANSACTIONS = os.getenv('ORDER_TRANSACTIONS', 'False').lower() in {
+        'true',
+        '1',
+        'yes',
+    }
+
+    # Order numbers reserved per counters round trip
+    ORDER_NUMBER_BLOCK_SIZE = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', 100))
+
+    # In-process product catalogue cache
+    PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', 2048))
+    PRODUCT_CACHE_TTL = float(os.getenv('PRODUCT_CACHE_TTL', 30))
+    PRODUCT_CACHE_STALE_TTL = float(os.getenv('PRODUCT_CACHE_STALE_TTL', 30))
+    # Seconds a "not found" lookup is cached; 0 never caches misses
+    PRODUCT_CACHE_MISS_TTL = float(os.getenv('PRODUCT_CACHE_MISS_TTL', 0))
+
+    # Categories response: server-side rebuild interval and client max-age
+    CATEGORY_CACHE_MAX_AGE = float(os.getenv('CATEGORY_CACHE_MAX_AGE', 300))
+    CATEGORY_HTTP_MAX_AGE = int(os.getenv('CATEGORY_HTTP_MAX_AGE', 60))
+
+    # Authenticated-user cache used by token_required; the TTL bounds how long
+    # a ban or role change made by another worker process can take to apply
+    AUTH_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_CACHE_MAX_ENTRIES', 10000))
+    AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', 30))
+
+    # Per-request MongoDB command stats (X-DB-* headers, N+1 warnings,
+    # route budgets); DB_BUDGET_STRICT raises instead of warning on overruns
+    DB_INSTRUMENTATION = os.getenv('DB_INSTRUMENTATION', 'True').lower() in {'true', '1', 'yes'}
+    DB_LOG_REQUESTS = os.getenv('DB_LOG_REQUESTS', 'False').lower() in {'true', '1', 'yes'}
+    DB_N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', 3))
+    DB_BUDGET_STRICT = os.getenv('DB_BUDGET_STRICT', 'False').lower() in {'true', '1', 'yes'}
+
+    # Prometheus /metrics: optional static bearer token for scrapers (admins
+    # can always use their JWT) and how often component stats are sampled
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_SAMPLE_INTERVAL = float(os.getenv('METRICS_SAMPLE_INTERVAL', 5))
+
+    # Admin-triggered request profiling (X-Profile: 1); stored profiles live
+    # in a capped collection bounded by count and total size
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True').lower() in {'true', '1', 'yes'}
+    PROFILE_MAX_ENTRIES = int(os.getenv('PROFILE_MAX_ENTRIES', 50))
+    PROFILE_COLLECTION_BYTES = int(os.getenv('PROFILE_COLLECTION_BYTES', 16 * 1024 * 1024))
+    PROFILE_MAX_BYTES = int(os.getenv('PROFILE_MAX_BYTES', 512 * 1024))
+
+    # Password hashing: explicit bcrypt cost (recommended in production), or
+    # calibrated once so one hash takes about BCRYPT_TARGET_MS and stored in
+    # app_settings for every worker (never below BCRYPT_MIN_ROUNDS, which
+    # defaults to bcrypt's own default cost of 12)
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS')) if os.getenv('BCRYPT_ROUNDS') else None
+    BCRYPT_TARGET_MS = float(os.getenv('BCRYPT_TARGET_MS', 250))
+    BCRYPT_MIN_ROUNDS = int(os.getenv('BCRYPT_MIN_ROUNDS', 12))
+    BCRYPT_MAX_ROUNDS = int(os.getenv('BCRYPT_MAX_ROUNDS', 15))
+    # Hashing processes per worker (0 = inline, the default on Windows)
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 0 if os.name == 'nt' else (os.cpu_count() or 1)))
+    BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', 64))
+
     # Email (SMTP - Gmail) configuration
     SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
     SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
     SMTP_USERNAME = os.getenv('SMTP_USERNAME')
     SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
     SMTP_FROM_EMAIL = os.getenv('SMTP_FROM_EMAIL', SMTP_USERNAME)
+    # Disable STARTTLS to test against a local stand-in such as aiosmtpd
+    SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'True').lower() in {'true', '1', 'yes'}
+
+    # Outbound mail queue
+    MAIL_WORKERS = int(os.getenv('MAIL_WORKERS', 2))
+    MAIL_QUEUE_SIZE = int(os.getenv('MAIL_QUEUE_SIZE', 1000))
+    MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 20))
+    MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', 5))
 
     if not SMTP_USERNAME or not SMTP_PASSWORD:
         raise RuntimeError('Missing SMTP credentials in environment variables')
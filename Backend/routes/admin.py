@@ -6,24 +6,58 @@ import random
 import string
 from typing import Any
 
-import bcrypt
 from bson import ObjectId
 from bson.errors import InvalidId
 from flask import Blueprint, current_app, jsonify, request
 
 from constants.categories import ALLOWED_CATEGORY_SLUGS
-from utils.auth import admin_required, token_required
+from utils import dashboard_metrics
+from utils.auth import admin_required, invalidate_user_cache, token_required
+from utils.cache import invalidate_products, product_cache
+from utils.category_catalog import category_catalog
+from utils.customer_stats import get_customer_stats, top_customers
 from utils.helpers import (
     build_paginated_response,
     safe_float,
     safe_int,
-    serialize_doc,
     slugify,
 )
+from utils.pagination import InvalidCursorError, build_cursor_response, fetch_keyset_page
+from utils.passwords import PasswordHasherBusy, password_hasher
+from utils.projection import (
+    PRODUCT_FIELDS,
+    USER_FIELDS,
+    USER_PUBLIC_PROJECTION,
+    InvalidFieldsError,
+    build_projection,
+    includes_field,
+)
+from utils.search import (
+    build_product_admin_search_keys,
+    build_product_search_fields,
+    build_search_keys_filter,
+    build_user_search_keys,
+    fuzzy_search_page,
+    refresh_customer_order_keys,
+)
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/api/admin")
 
 VALID_ROLES = {"admin", "customer"}
+SEARCHABLE_PRODUCT_FIELDS = {"name", "category", "description", "specifications"}
+# Fields whose change can move a product in or out of a list page, or reorder it.
+LISTING_PRODUCT_FIELDS = SEARCHABLE_PRODUCT_FIELDS | {"is_active", "price"}
+# The admin product table shows neither descriptions nor specifications.
+ADMIN_PRODUCT_LIST_PROJECTION = {
+    "search": 0,
+    "search_keys": 0,
+    "description": 0,
+    "specifications": 0,
+}
+ADMIN_SEARCH_PRODUCT_FIELDS = {"name", "slug"}
+USER_SEARCH_FIELDS = {"name", "email", "phone"}
+INTERNAL_PRODUCT_FIELDS = {"search", "search_keys"}
+PRODUCT_DEFAULTS = {"images": [], "specifications": [], "discount": 0, "is_active": True}
 
 
 def _get_db():
@@ -136,12 +170,14 @@ def _validate_product_payload(data: dict[str, Any], for_update: bool = False) ->
     return errors, payload
 
 
-def _serialize_product(product: dict[str, Any]) -> dict[str, Any]:
-    serialised = serialize_doc(product)
-    serialised.setdefault("images", [])
-    serialised.setdefault("specifications", [])
-    serialised.setdefault("discount", 0)
-    serialised.setdefault("is_active", True)
+def _serialize_product(
+    product: dict[str, Any], projection: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    # Shallow copy only; ObjectIds and dates are encoded by the JSON provider.
+    serialised = {key: value for key, value in product.items() if key not in INTERNAL_PRODUCT_FIELDS}
+    for field, default in PRODUCT_DEFAULTS.items():
+        if includes_field(projection, field):
+            serialised.setdefault(field, default)
     return serialised
 
 
@@ -156,22 +192,54 @@ def list_products(current_user):  # pylint: disable=unused-argument
     category = (request.args.get("category") or "").strip()
 
     query: dict[str, Any] = {}
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"slug": {"$regex": search, "$options": "i"}},
-        ]
     if category:
         query["category"] = category
+    filters = dict(query)
+    if search:
+        query.update(build_search_keys_filter(search) or {})
+
+    try:
+        projection = build_projection(
+            request.args.get("fields"),
+            PRODUCT_FIELDS,
+            ADMIN_PRODUCT_LIST_PROJECTION,
+            required=("updatedAt",),
+        )
+    except InvalidFieldsError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    if "cursor" in request.args:
+        try:
+            documents, next_cursor = fetch_keyset_page(
+                db.products,
+                query,
+                "updatedAt",
+                -1,
+                limit,
+                request.args.get("cursor") or None,
+                projection,
+            )
+        except InvalidCursorError as exc:
+            return jsonify({"error": str(exc)}), 400
+        products = [_serialize_product(product, projection) for product in documents]
+        return jsonify(build_cursor_response(products, next_cursor, limit))
 
     total = db.products.count_documents(query)
+    if search and total == 0:
+        # Nothing starts with the typed words; fall back to trigram matching.
+        documents, total = fuzzy_search_page(
+            db.products, filters, search, (page - 1) * limit, limit, projection
+        )
+        products = [_serialize_product(product, projection) for product in documents]
+        return jsonify(build_paginated_response(products, total, page, limit))
+
     cursor = (
-        db.products.find(query)
+        db.products.find(query, projection)
         .sort("updatedAt", -1)
         .skip((page - 1) * limit)
         .limit(limit)
     )
-    products = [_serialize_product(product) for product in cursor]
+    products = [_serialize_product(product, projection) for product in cursor]
 
     return jsonify(build_paginated_response(products, total, page, limit))
 
@@ -225,9 +293,14 @@ def create_product(current_user):  # pylint: disable=unused-argument
         "createdAt": now,
         "updatedAt": now,
     }
+    product_doc["search"] = build_product_search_fields(product_doc)
+    product_doc["search_keys"] = build_product_admin_search_keys(product_doc)
 
     result = db.products.insert_one(product_doc)
     product_doc["_id"] = result.inserted_id
+    dashboard_metrics.record_product_change(db, None, product_doc)
+    invalidate_products(result.inserted_id, listings=True)
+    category_catalog.mark_dirty()
 
     return (
         jsonify({"message": "Product created", "product": _serialize_product(product_doc)}),
@@ -270,10 +343,18 @@ def update_product(current_user, product_id):  # pylint: disable=unused-argument
         update_fields["images"] = payload.get("images", [])
     if "specifications" in payload:
         update_fields["specifications"] = payload.get("specifications", [])
+    if SEARCHABLE_PRODUCT_FIELDS.intersection(update_fields):
+        update_fields["search"] = build_product_search_fields({**existing, **update_fields})
+    if ADMIN_SEARCH_PRODUCT_FIELDS.intersection(update_fields):
+        update_fields["search_keys"] = build_product_admin_search_keys({**existing, **update_fields})
     update_fields["updatedAt"] = datetime.utcnow()
 
     db.products.update_one({"_id": object_id}, {"$set": update_fields})
+    invalidate_products(object_id, listings=bool(LISTING_PRODUCT_FIELDS.intersection(update_fields)))
+    if "category" in update_fields or "is_active" in update_fields:
+        category_catalog.mark_dirty()
     updated = db.products.find_one({"_id": object_id})
+    dashboard_metrics.record_product_change(db, existing, updated)
     return jsonify({"message": "Product updated", "product": _serialize_product(updated)})
 
 
@@ -286,12 +367,23 @@ def delete_product(current_user, product_id):  # pylint: disable=unused-argument
     if not object_id:
         return jsonify({"error": "Product not found"}), 404
 
-    result = db.products.delete_one({"_id": object_id})
-    if result.deleted_count == 0:
+    deleted = db.products.find_one_and_delete({"_id": object_id}, {"is_active": 1, "stock": 1})
+    if not deleted:
         return jsonify({"error": "Product not found"}), 404
+    dashboard_metrics.record_product_change(db, deleted, None)
+    invalidate_products(object_id, listings=True)
+    category_catalog.mark_dirty()
     return "", 204
 
 
+@admin_bp.route("/cache/stats", methods=["GET"])
+@token_required
+@admin_required
+def get_cache_stats(current_user):  # pylint: disable=unused-argument
+    """Expose product cache counters for tuning TTLs and capacity."""
+    return jsonify({"products": product_cache.stats()})
+
+
 @admin_bp.route("/users", methods=["GET"])
 @token_required
 @admin_required
@@ -304,12 +396,6 @@ def list_users(current_user):  # pylint: disable=unused-argument
     banned_filter = request.args.get("banned")
 
     query: dict[str, Any] = {}
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}},
-            {"phone": {"$regex": search, "$options": "i"}},
-        ]
     if role_filter:
         query["role"] = role_filter
     if banned_filter is not None:
@@ -317,20 +403,50 @@ def list_users(current_user):  # pylint: disable=unused-argument
             query["is_banned"] = True
         elif banned_filter.lower() in {"false", "0"}:
             query["is_banned"] = False
+    filters = dict(query)
+    if search:
+        query.update(build_search_keys_filter(search) or {})
+
+    try:
+        projection = build_projection(
+            request.args.get("fields"),
+            USER_FIELDS,
+            USER_PUBLIC_PROJECTION,
+            required=("createdAt",),
+        )
+    except InvalidFieldsError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    if "cursor" in request.args:
+        try:
+            documents, next_cursor = fetch_keyset_page(
+                db.users,
+                query,
+                "createdAt",
+                -1,
+                limit,
+                request.args.get("cursor") or None,
+                projection,
+            )
+        except InvalidCursorError as exc:
+            return jsonify({"error": str(exc)}), 400
+        return jsonify(build_cursor_response(documents, next_cursor, limit))
 
     total = db.users.count_documents(query)
-    cursor = (
-        db.users.find(query)
+    if search and total == 0:
+        # Nothing starts with the typed words; fall back to trigram matching.
+        users, total = fuzzy_search_page(
+            db.users, filters, search, (page - 1) * limit, limit, projection
+        )
+        return jsonify(build_paginated_response(users, total, page, limit))
+
+    users = list(
+        db.users.find(query, projection)
         .sort("createdAt", -1)
         .skip((page - 1) * limit)
         .limit(limit)
     )
 
-    users = []
-    for user in cursor:
-        user.pop("password", None)
-        users.append(serialize_doc(user))
-
     return jsonify(build_paginated_response(users, total, page, limit))
 
 
@@ -343,24 +459,25 @@ def get_user(current_user, user_id):
     if not object_id:
         return jsonify({"error": "User not found"}), 404
 
-    user = db.users.find_one({"_id": object_id})
+    user = db.users.find_one({"_id": object_id}, USER_PUBLIC_PROJECTION)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    orders_cursor = db.orders.find({"userId": str(user["_id"])})
-    orders = list(orders_cursor)
-    total_spent = sum(order.get("total", 0) or 0 for order in orders)
+    return jsonify({"user": user, "stats": get_customer_stats(db, user["_id"])})
 
-    user.pop("password", None)
-    return jsonify(
-        {
-            "user": serialize_doc(user),
-            "stats": {
-                "orders_count": len(orders),
-                "total_spent": total_spent,
-            },
-        }
-    )
+
+@admin_bp.route("/customers/top", methods=["GET"])
+@token_required
+@admin_required
+def list_top_customers(current_user):  # pylint: disable=unused-argument
+    db = _get_db()
+    limit = min(max(safe_int(request.args.get("limit"), 10) or 10, 1), 100)
+    by = (request.args.get("by") or "total_spent").strip()
+    try:
+        customers = top_customers(db, limit=limit, by=by)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"items": customers, "by": by, "limit": limit})
 
 
 @admin_bp.route("/users/<user_id>", methods=["PATCH"])
@@ -389,14 +506,23 @@ def update_user(current_user, user_id):
     if not update_fields:
         return jsonify({"error": "No valid fields to update"}), 400
 
+    stored: dict[str, Any] = {}
+    if USER_SEARCH_FIELDS.intersection(update_fields):
+        stored = db.users.find_one({"_id": object_id}, {"name": 1, "email": 1, "phone": 1})
+        if not stored:
+            return jsonify({"error": "User not found"}), 404
+        update_fields["search_keys"] = build_user_search_keys({**stored, **update_fields})
+
     update_fields["updatedAt"] = datetime.utcnow()
     result = db.users.update_one({"_id": object_id}, {"$set": update_fields})
     if result.matched_count == 0:
         return jsonify({"error": "User not found"}), 404
+    invalidate_user_cache(object_id)
+    if "name" in update_fields or "email" in update_fields:
+        refresh_customer_order_keys(db, object_id, {**stored, **update_fields})
 
-    updated = db.users.find_one({"_id": object_id})
-    updated.pop("password", None)
-    return jsonify({"message": "User updated", "user": serialize_doc(updated)})
+    updated = db.users.find_one({"_id": object_id}, USER_PUBLIC_PROJECTION)
+    return jsonify({"message": "User updated", "user": updated})
 
 
 @admin_bp.route("/users/<user_id>/ban", methods=["PATCH"])
@@ -422,10 +548,10 @@ def toggle_user_ban(current_user, user_id):
     )
     if result.matched_count == 0:
         return jsonify({"error": "User not found"}), 404
+    invalidate_user_cache(object_id)
 
-    updated = db.users.find_one({"_id": object_id})
-    updated.pop("password", None)
-    return jsonify({"message": "User status updated", "user": serialize_doc(updated)})
+    updated = db.users.find_one({"_id": object_id}, USER_PUBLIC_PROJECTION)
+    return jsonify({"message": "User status updated", "user": updated})
 
 
 @admin_bp.route("/users/<user_id>/role", methods=["PATCH"])
@@ -445,12 +571,12 @@ def update_user_role(current_user, user_id):
     if role not in VALID_ROLES:
         return jsonify({"error": "Invalid role"}), 400
 
-    user = db.users.find_one({"_id": object_id})
+    user = db.users.find_one({"_id": object_id}, USER_PUBLIC_PROJECTION)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
     if user.get("role") == role:
-        return jsonify({"message": "Role unchanged", "user": serialize_doc(user)})
+        return jsonify({"message": "Role unchanged", "user": user})
 
     if user.get("role") == "admin" and role != "admin":
         remaining_admins = db.users.count_documents(
@@ -463,9 +589,9 @@ def update_user_role(current_user, user_id):
         {"_id": object_id},
         {"$set": {"role": role, "updatedAt": datetime.utcnow()}},
     )
-    updated = db.users.find_one({"_id": object_id})
-    updated.pop("password", None)
-    return jsonify({"message": "Role updated", "user": serialize_doc(updated)})
+    invalidate_user_cache(object_id)
+    updated = db.users.find_one({"_id": object_id}, USER_PUBLIC_PROJECTION)
+    return jsonify({"message": "Role updated", "user": updated})
 
 
 @admin_bp.route("/users/<user_id>/reset-password", methods=["POST"])
@@ -485,12 +611,16 @@ def reset_user_password(current_user, user_id):
         return jsonify({"error": "User not found"}), 404
 
     temp_password = "".join(random.choices(string.ascii_letters + string.digits, k=10))
-    hashed = bcrypt.hashpw(temp_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    try:
+        hashed = password_hasher.hash(temp_password)
+    except PasswordHasherBusy:
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503
 
     db.users.update_one(
         {"_id": object_id},
         {"$set": {"password": hashed, "updatedAt": datetime.utcnow()}},
     )
+    invalidate_user_cache(object_id)
 
     return jsonify(
         {
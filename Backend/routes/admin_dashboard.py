@@ -1,7 +1,7 @@
 """Admin dashboard blueprint exposing analytics endpoints."""
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from bson import ObjectId
 from bson.decimal128 import Decimal128
@@ -9,6 +9,8 @@ from bson.errors import InvalidId
 from flask import Blueprint, current_app, jsonify, request
 
 from utils.auth import admin_required, token_required
+from utils.dashboard_metrics import get_metrics, recompute_metrics
+from utils.revenue_rollup import InvalidSeriesRequest, revenue_series
 
 
 def _get_db():
@@ -39,8 +41,6 @@ def _isoformat(value) -> str | None:
         return str(value)
 
 
-STATUSES_FOR_REVENUE = {"confirmed", "delivered"}
-
 dashboard_bp = Blueprint(
     "admin_dashboard", __name__, url_prefix="/api/admin/dashboard"
 )
@@ -50,46 +50,27 @@ dashboard_bp = Blueprint(
 @token_required
 @admin_required
 def get_summary(current_user):  # pylint: disable=unused-argument
-    """Return aggregated metrics for the admin overview."""
-
-    db = _get_db()
+    """Return aggregated metrics for the admin overview.
 
-    total_users = db.users.count_documents({})
-    total_orders = db.orders.count_documents({})
-    active_products = db.products.count_documents(
-        {"$or": [{"is_active": True}, {"stock": {"$gt": 0}}]}
-    )
+    Served from the materialized counters; ``?fresh=1`` recounts everything
+    (scanning the collections) and stores the exact values.
+    """
 
-    revenue_pipeline = [
-        {
-            "$match": {
-                "$expr": {
-                    "$in": [
-                        {"$toLower": {"$ifNull": ["$status", ""]}},
-                        list(STATUSES_FOR_REVENUE),
-                    ]
-                }
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "total_revenue": {"$sum": {"$ifNull": ["$total", 0]}},
-            }
-        },
-    ]
+    db = _get_db()
 
-    revenue_result = list(db.orders.aggregate(revenue_pipeline))
-    total_revenue = (
-        _to_float(revenue_result[0].get("total_revenue")) if revenue_result else 0.0
-    )
+    if request.args.get("fresh", "").lower() in {"1", "true", "yes"}:
+        metrics = recompute_metrics(db)
+        metrics.pop("drift", None)
+        metrics["total_revenue"] = round(metrics["total_revenue"], 2)
+    else:
+        metrics = get_metrics(db)
 
     return jsonify(
         {
-            "total_revenue": total_revenue,
-            "total_orders": total_orders,
-            "total_users": total_users,
-            "active_products": active_products,
+            "total_revenue": metrics["total_revenue"],
+            "total_orders": metrics["total_orders"],
+            "total_users": metrics["total_users"],
+            "active_products": metrics["active_products"],
         }
     )
 
@@ -192,7 +173,12 @@ def get_recent_users(current_user):  # pylint: disable=unused-argument
 @token_required
 @admin_required
 def get_revenue_series(current_user):  # pylint: disable=unused-argument
-    """Return revenue grouped by day for the requested range."""
+    """Return revenue for the requested range from the daily rollup.
+
+    ``range`` is ``<N>d`` (default ``7d``), ``tz`` an IANA timezone for day
+    boundaries (default UTC) and ``bucket`` one of ``day``, ``week`` or
+    ``month``. Days without sales are returned with zero revenue.
+    """
 
     db = _get_db()
 
@@ -205,45 +191,14 @@ def get_revenue_series(current_user):  # pylint: disable=unused-argument
         except ValueError:
             days = 7
 
-    start_date = datetime.utcnow() - timedelta(days=days - 1)
-
-    pipeline = [
-        {
-            "$match": {
-                "$and": [
-                    {
-                        "$expr": {
-                            "$in": [
-                                {"$toLower": {"$ifNull": ["$status", ""]}},
-                                list(STATUSES_FOR_REVENUE),
-                            ]
-                        }
-                    },
-                    {"createdAt": {"$gte": start_date}},
-                ]
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}
-                },
-                "revenue": {"$sum": {"$ifNull": ["$total", 0]}},
-                "orders": {"$sum": 1},
-            }
-        },
-        {"$sort": {"_id": 1}},
-    ]
-
-    buckets = list(db.orders.aggregate(pipeline))
-
-    series = [
-        {
-            "date": bucket.get("_id"),
-            "revenue": _to_float(bucket.get("revenue")),
-            "orders": int(bucket.get("orders", 0)),
-        }
-        for bucket in buckets
-    ]
+    try:
+        series = revenue_series(
+            db,
+            days,
+            tz_name=request.args.get("tz"),
+            bucket=(request.args.get("bucket") or "day").strip().lower(),
+        )
+    except InvalidSeriesRequest as exc:
+        return jsonify({"error": str(exc)}), 400
 
     return jsonify(series)
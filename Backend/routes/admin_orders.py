@@ -8,9 +8,22 @@ from typing import Any, Iterable
 from bson import ObjectId
 from bson.errors import InvalidId
 from flask import Blueprint, current_app, jsonify, request
+from pymongo import ReturnDocument
 
+from utils import dashboard_metrics, revenue_rollup
 from utils.auth import admin_required, token_required
-from utils.helpers import safe_float, serialize_doc
+from utils.customer_stats import record_order_deleted, record_status_change
+from utils.helpers import safe_float
+from utils.instrumentation import db_budget
+from utils.order_status import STATUS_KEY_FIELD, count_by_status, status_fields, status_key
+from utils.pagination import InvalidCursorError, build_cursor_response, fetch_keyset_page
+from utils.search import (
+    CUSTOMER_KEYS_FIELD,
+    build_customer_search_keys,
+    build_order_search_filter,
+    build_order_search_keys,
+    order_search_fields,
+)
 
 
 admin_orders_bp = Blueprint("admin_orders", __name__, url_prefix="/api/admin/orders")
@@ -23,6 +36,25 @@ ALLOWED_TRANSITIONS = {
     "Cancelled": set(),
 }
 
+# Fields read by _serialise_order_summary, plus the sort key added per request.
+ORDER_SUMMARY_PROJECTION = {
+    "order_number": 1,
+    "orderId": 1,
+    "userId": 1,
+    "user_id": 1,
+    "customerName": 1,
+    "shipping.full_name": 1,
+    "shipping.fullName": 1,
+    "shipping.recipient": 1,
+    "shipping.email": 1,
+    "payment.method": 1,
+    "total": 1,
+    "status": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+}
+CUSTOMER_PROJECTION = {"name": 1, "email": 1, "phone": 1}
+
 SORT_FIELD_MAP = {
     "created_at": "createdAt",
     "updated_at": "updatedAt",
@@ -77,8 +109,8 @@ def _collect_user_map(db, orders: Iterable[dict[str, Any]]) -> dict[str, dict[st
     if not user_ids:
         return {}
 
-    users_cursor = db.users.find({"_id": {"$in": list(user_ids)}})
-    return {str(user["_id"]): serialize_doc(user) for user in users_cursor}
+    users_cursor = db.users.find({"_id": {"$in": list(user_ids)}}, CUSTOMER_PROJECTION)
+    return {str(user["_id"]): user for user in users_cursor}
 
 
 def _serialise_shipping(shipping: dict[str, Any] | None) -> dict[str, Any]:
@@ -323,35 +355,18 @@ def list_orders(current_user):  # pylint: disable=unused-argument
         canonical_status = _canonical_status(status_param)
         if canonical_status not in VALID_STATUSES:
             return jsonify({"error": "Invalid status filter"}), 400
-        query["status"] = {"$regex": f"^{canonical_status}$", "$options": "i"}
+        query[STATUS_KEY_FIELD] = status_key(canonical_status)
 
     if q:
+        # Every clause is an index lookup: _id, or the maintained search keys
+        # covering order number, recipient and customer name/email.
         or_conditions: list[dict[str, Any]] = []
         object_id = _parse_object_id(q)
         if object_id:
             or_conditions.append({"_id": object_id})
-        if q.isdigit():
-            or_conditions.append({"order_number": q})
-        or_conditions.extend(
-            [
-                {"orderId": {"$regex": q, "$options": "i"}},
-                {"shipping.fullName": {"$regex": q, "$options": "i"}},
-                {"shipping.full_name": {"$regex": q, "$options": "i"}},
-                {"shipping.email": {"$regex": q, "$options": "i"}},
-            ]
-        )
-        user_matches = db.users.find(
-            {
-                "$or": [
-                    {"name": {"$regex": q, "$options": "i"}},
-                    {"email": {"$regex": q, "$options": "i"}},
-                ]
-            },
-            {"_id": 1},
-        )
-        matched_user_ids = [str(user["_id"]) for user in user_matches]
-        if matched_user_ids:
-            or_conditions.append({"userId": {"$in": matched_user_ids}})
+        search_filter = build_order_search_filter(q)
+        if search_filter:
+            or_conditions.extend(search_filter.get("$or", [search_filter]))
         if or_conditions:
             if "$or" in query:
                 query["$and"] = [{"$or": query.pop("$or")}, {"$or": or_conditions}]
@@ -361,10 +376,29 @@ def list_orders(current_user):  # pylint: disable=unused-argument
     sort_direction = -1 if sort_param.startswith("-") else 1
     sort_key = sort_param.lstrip("+-").lower()
     sort_field = SORT_FIELD_MAP.get(sort_key, "createdAt")
+    projection = {**ORDER_SUMMARY_PROJECTION, sort_field: 1}
+
+    if "cursor" in request.args:
+        try:
+            orders, next_cursor = fetch_keyset_page(
+                db.orders,
+                query,
+                sort_field,
+                sort_direction,
+                limit,
+                request.args.get("cursor") or None,
+                projection,
+            )
+        except InvalidCursorError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        users_map = _collect_user_map(db, orders)
+        items = [_serialise_order_summary(order, users_map.get(order.get("userId"))) for order in orders]
+        return jsonify(build_cursor_response(items, next_cursor, limit))
 
     total = db.orders.count_documents(query)
     cursor = (
-        db.orders.find(query)
+        db.orders.find(query, projection)
         .sort(sort_field, sort_direction)
         .skip((page - 1) * limit)
         .limit(limit)
@@ -377,6 +411,15 @@ def list_orders(current_user):  # pylint: disable=unused-argument
     return jsonify({"items": items, "total": total, "page": page, "limit": limit})
 
 
+@admin_orders_bp.route("/status-counts", methods=["GET"])
+@token_required
+@admin_required
+def get_status_counts(current_user):  # pylint: disable=unused-argument
+    db = _get_db()
+    counts = count_by_status(db)
+    return jsonify({_canonical_status(key): count for key, count in counts.items()})
+
+
 @admin_orders_bp.route("/<order_id>", methods=["GET"])
 @token_required
 @admin_required
@@ -392,6 +435,7 @@ def get_order(current_user, order_id):  # pylint: disable=unused-argument
 
 
 @admin_orders_bp.route("/<order_id>/status", methods=["PATCH"])
+@db_budget(8)
 @token_required
 @admin_required
 def update_order_status(current_user, order_id):
@@ -435,12 +479,22 @@ def update_order_status(current_user, order_id):
     )
 
     update_doc: dict[str, Any] = {
-        "$set": {"status": new_status, "updatedAt": datetime.utcnow()},
+        "$set": {**status_fields(new_status), "updatedAt": datetime.utcnow()},
         "$push": {"activityLog": activity_entry},
     }
 
-    db.orders.update_one({"_id": order["_id"]}, update_doc)
-    updated = db.orders.find_one({"_id": order["_id"]})
+    # Conditional on the status read above so concurrent changes are not
+    # both applied (and counted) on top of each other.
+    updated = db.orders.find_one_and_update(
+        {"_id": order["_id"], "status": order.get("status")},
+        update_doc,
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is None:
+        return jsonify({"error": "Order status changed concurrently, please reload"}), 409
+    record_status_change(db, order, new_status)
+    dashboard_metrics.record_order_status_change(db, order, new_status)
+    revenue_rollup.record_status_change(db, order, new_status)
 
     users_map = _collect_user_map(db, [updated])
     return jsonify(_serialise_order(updated, users_map.get(updated.get("userId"))))
@@ -494,6 +548,16 @@ def update_order(current_user, order_id):
     if len(set_fields) == 1:  # only updatedAt present
         return jsonify({"error": "No valid fields to update"}), 400
 
+    if "shipping" in set_fields:
+        customer_keys = order.get(CUSTOMER_KEYS_FIELD)
+        if customer_keys is None:
+            customer_keys = build_customer_search_keys(
+                _collect_user_map(db, [order]).get(order.get("userId"))
+            )
+        set_fields.update(
+            order_search_fields(build_order_search_keys({**order, **set_fields}), customer_keys)
+        )
+
     actor = {
         "id": str(current_user.get("_id")),
         "name": current_user.get("name") or current_user.get("email"),
@@ -525,6 +589,10 @@ def delete_order(current_user, order_id):  # pylint: disable=unused-argument
     if not order:
         return jsonify({"error": "Order not found"}), 404
 
-    db.orders.delete_one({"_id": order["_id"]})
+    deleted = db.orders.find_one_and_delete({"_id": order["_id"]})
+    if deleted:
+        record_order_deleted(db, deleted)
+        dashboard_metrics.record_order_deleted(db, deleted)
+        revenue_rollup.record_order_deleted(db, deleted)
     return "", 204
 
@@ -0,0 +1,92 @@
+"""Admin endpoints for stored request profiles."""
+from __future__ import annotations
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from utils.auth import admin_required, token_required
+from utils.helpers import safe_int
+from utils.profiling import COLLECTION, SORT_KEYS, load_stats, summarize
+
+admin_profiles_bp = Blueprint("admin_profiles", __name__, url_prefix="/api/admin/profiles")
+
+LIST_PROJECTION = {"raw": 0, "summary": 0}
+
+
+def _get_db():
+    db = getattr(current_app, "mongo_db", None)
+    if db is None:
+        raise RuntimeError("MongoDB connection is not configured on the application")
+    return db
+
+
+def _parse_object_id(value: str) -> ObjectId | None:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+@admin_profiles_bp.route("/", methods=["GET"])
+@token_required
+@admin_required
+def list_profiles(current_user):  # pylint: disable=unused-argument
+    db = _get_db()
+    limit = safe_int(request.args.get("limit", 20), None)
+    if limit is None:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = min(max(limit, 1), 100)
+    query = {}
+    endpoint = (request.args.get("endpoint") or "").strip()
+    if endpoint:
+        query["endpoint"] = endpoint
+    # Capped collections keep insertion order; newest first.
+    profiles = list(db[COLLECTION].find(query, LIST_PROJECTION).sort("$natural", -1).limit(limit))
+    return jsonify({"items": profiles, "limit": limit})
+
+
+@admin_profiles_bp.route("/<profile_id>", methods=["GET"])
+@token_required
+@admin_required
+def get_profile(current_user, profile_id):  # pylint: disable=unused-argument
+    object_id = _parse_object_id(profile_id)
+    if object_id is None:
+        return jsonify({"error": "Invalid profile id"}), 400
+    profile = _get_db()[COLLECTION].find_one({"_id": object_id})
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+
+    raw = profile.pop("raw", None)
+    sort = request.args.get("sort")
+    if sort or "lines" in request.args:
+        if sort and sort not in SORT_KEYS:
+            return jsonify({"error": f"sort must be one of {', '.join(sorted(SORT_KEYS))}"}), 400
+        if raw is None:
+            return jsonify({"error": "Raw profile data was too large to keep"}), 409
+        lines = safe_int(request.args.get("lines", 40), None)
+        if lines is None:
+            return jsonify({"error": "lines must be an integer"}), 400
+        lines = min(max(lines, 1), 500)
+        profile["summary"] = summarize(load_stats(bytes(raw)), sort or "cumulative", lines)
+    return jsonify(profile)
+
+
+@admin_profiles_bp.route("/<profile_id>/download", methods=["GET"])
+@token_required
+@admin_required
+def download_profile(current_user, profile_id):  # pylint: disable=unused-argument
+    object_id = _parse_object_id(profile_id)
+    if object_id is None:
+        return jsonify({"error": "Invalid profile id"}), 400
+    profile = _get_db()[COLLECTION].find_one({"_id": object_id}, {"raw": 1})
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+    if profile.get("raw") is None:
+        return jsonify({"error": "Raw profile data was too large to keep"}), 409
+    # Same format as cProfile's dump_stats, readable by pstats and snakeviz.
+    return Response(
+        bytes(profile["raw"]),
+        mimetype="application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename=profile-{profile_id}.prof"},
+    )
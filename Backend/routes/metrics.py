@@ -0,0 +1,34 @@
+"""Prometheus exposition endpoint."""
+from __future__ import annotations
+
+import hmac
+
+from flask import Blueprint, Response, request
+
+from config import Config
+from utils.auth import admin_required, token_required
+from utils.metrics import render_latest
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+def _exposition() -> Response:
+    body, content_type = render_latest()
+    return Response(body, content_type=content_type)
+
+
+@token_required
+@admin_required
+def _admin_exposition(current_user):  # pylint: disable=unused-argument
+    return _exposition()
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Serve metrics to admins, or to a scraper holding ``METRICS_TOKEN``."""
+
+    if Config.METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "")
+        if hmac.compare_digest(supplied.encode(), f"Bearer {Config.METRICS_TOKEN}".encode()):
+            return _exposition()
+    return _admin_exposition()
@@ -1,10 +1,19 @@
 # MongoDB Seeder for Medicare - Python Version
+import os
+
 import pymongo
 from pymongo import MongoClient
 from datetime import datetime
 import bcrypt
 
 from constants.categories import FIXED_CATEGORIES
+from utils.dashboard_metrics import recompute_metrics
+from utils.indexes import reconcile_indexes
+from utils.search import (
+    build_product_admin_search_keys,
+    build_product_search_fields,
+    build_user_search_keys,
+)
 
 # Connect to MongoDB
 # For Local MongoDB:
@@ -14,13 +23,16 @@ client = MongoClient('mongodb://localhost:27017/')
 # client = MongoClient('mongodb+srv://cluster1.qncm65j.mongodb.net/')
 db = client['medicare']
 
+# Same work factor the API uses when BCRYPT_ROUNDS is pinned
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+
 # Clear existing data
 db.users.delete_many({})
 db.products.delete_many({})
 db.categories.delete_many({})
 
-# Ensure email uniqueness index exists before inserting documents
-db.users.create_index('email', unique=True)
+# Build the registered indexes (email uniqueness, search) before inserting
+reconcile_indexes(db)
 
 print('🗑️  Cleared existing data...')
 
@@ -28,7 +40,7 @@ print('🗑️  Cleared existing data...')
 sample_users = [
     {
         'email': 'user@example.com',
-        'password': bcrypt.hashpw('password123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8'),
+        'password': bcrypt.hashpw('password123'.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8'),
         'name': 'John Doe',
         'phone': '0123456789',
         'address': {
@@ -44,7 +56,7 @@ sample_users = [
     },
     {
         'email': 'admin@medicare.com',
-        'password': bcrypt.hashpw('Admin@123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8'),
+        'password': bcrypt.hashpw('Admin@123'.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8'),
         'name': 'Admin User',
         'phone': '0987654321',
         'address': {
@@ -166,15 +178,23 @@ sample_products = [
 ]
 
 # Insert data
+for user in sample_users:
+    user['search_keys'] = build_user_search_keys(user)
 db.users.insert_many(sample_users)
 print('✅ Inserted users')
 
 db.categories.insert_many(sample_categories)
 print('✅ Inserted categories')
 
+for product in sample_products:
+    product['search'] = build_product_search_fields(product)
+    product['search_keys'] = build_product_admin_search_keys(product)
 db.products.insert_many(sample_products)
 print('✅ Inserted products')
 
+# Users and products were replaced wholesale; recount the dashboard.
+recompute_metrics(db)
+
 print('\n🎉 Database seeding completed successfully!')
 print('Database: medicare')
 print('Collections: users, products, categories')
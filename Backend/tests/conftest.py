@@ -0,0 +1,107 @@
+"""Shared pytest setup for the backend tests.
+
+Run from ``Backend/`` with ``python -m pytest``. Tests that need a real
+MongoDB use ``TEST_MONGODB_URI`` (default: localhost) and the
+``medicare_test`` database, and are skipped when no server answers;
+transaction tests additionally need a replica set. Everything else runs
+against mongomock.
+"""
+import os
+import sys
+
+import jwt
+import pytest
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py refuses to load without these.
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("SMTP_USERNAME", "test@medicare.test")
+os.environ.setdefault("SMTP_PASSWORD", "test-password")
+os.environ.setdefault("ENABLE_RECAPTCHA", "False")
+# Never point the app under test at a development database.
+os.environ["MONGODB_URI"] = os.environ.get(
+    "TEST_MONGODB_URI", "mongodb://localhost:27017/?serverSelectionTimeoutMS=500"
+)
+os.environ["DATABASE_NAME"] = "medicare_test"
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app as app_module
+
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def mock_db(app_module, monkeypatch):
+    """Serve the app from an empty mongomock database."""
+
+    mongomock = pytest.importorskip("mongomock")
+    from utils.cache import product_cache
+
+    db = mongomock.MongoClient()["medicare_test"]
+    monkeypatch.setattr(app_module, "db", db)
+    monkeypatch.setattr(app_module.app, "mongo_db", db)
+    monkeypatch.setattr(app_module.order_numbers, "_counters", db.counters)
+    monkeypatch.setattr(app_module.order_numbers, "_pid", None)
+    monkeypatch.setattr(app_module, "_stock_validator_ready", None)
+    product_cache.clear()
+    return db
+
+
+@pytest.fixture(scope="session")
+def live_mongo(app_module):
+    try:
+        app_module.client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("MongoDB is not available; set TEST_MONGODB_URI")
+    return app_module.db
+
+
+@pytest.fixture
+def mongo_db(live_mongo, app_module):
+    """The app's real test database, emptied but with its indexes in place."""
+
+    from utils.cache import product_cache
+    from utils.indexes import reconcile_indexes
+
+    for name in live_mongo.list_collection_names():
+        if not name.startswith("system."):
+            live_mongo[name].delete_many({})
+    reconcile_indexes(live_mongo)
+    product_cache.clear()
+    app_module.order_numbers._pid = None  # reserve a block from this database
+    app_module._stock_validator_ready = None
+    return live_mongo
+
+
+@pytest.fixture
+def replica_set(mongo_db, app_module):
+    if not app_module.client.admin.command("hello").get("setName"):
+        pytest.skip("MongoDB transactions need a replica set")
+    return mongo_db
+
+
+@pytest.fixture
+def make_user(app_module):
+    """Insert a user into the app's current database; returns (user_id, headers)."""
+
+    def make(role="customer", **fields):
+        document = {"name": "Test User", "email": f"{role}{os.urandom(4).hex()}@medicare.test", "role": role}
+        document.update(fields)
+        user_id = app_module.app.mongo_db.users.insert_one(document).inserted_id
+        token = jwt.encode(
+            {"user_id": str(user_id)},
+            app_module.Config.JWT_SECRET_KEY,
+            algorithm=app_module.Config.JWT_ALGORITHM,
+        )
+        return user_id, {"Authorization": f"Bearer {token}"}
+
+    return make
@@ -0,0 +1,53 @@
+import cProfile
+import marshal
+import pstats
+
+from bson import Binary, ObjectId
+
+from utils import profiling
+
+
+def test_non_numeric_limit_is_rejected(client, mock_db, make_user):
+    _, headers = make_user("admin")
+
+    response = client.get("/api/admin/profiles/?limit=ten", headers=headers)
+
+    assert response.status_code == 400
+    assert client.get("/api/admin/profiles/?limit=5", headers=headers).status_code == 200
+
+
+def test_non_numeric_lines_is_rejected(client, mock_db, make_user):
+    _, headers = make_user("admin")
+    profiler = cProfile.Profile()
+    profiler.runcall(sum, range(10))
+    profile_id = mock_db.request_profiles.insert_one(
+        {"_id": ObjectId(), "raw": Binary(marshal.dumps(pstats.Stats(profiler).stats))}
+    ).inserted_id
+
+    assert client.get(f"/api/admin/profiles/{profile_id}?lines=many", headers=headers).status_code == 400
+    assert client.get(f"/api/admin/profiles/{profile_id}?lines=5", headers=headers).status_code == 200
+
+
+def test_flagged_request_runs_unprofiled_while_another_is_profiled(client, mock_db, make_user):
+    _, headers = make_user("admin")
+    with profiling._profiler_lock:
+        response = client.get("/api/products", headers={**headers, "X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert response.headers[profiling.SKIPPED_HEADER] == "busy"
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_foreign_active_profiler_skips_profiling(client, mock_db, make_user, monkeypatch):
+    class ActiveElsewhere(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", ActiveElsewhere)
+    _, headers = make_user("admin")
+
+    response = client.get("/api/products", headers={**headers, "X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert response.headers[profiling.SKIPPED_HEADER] == "busy"
+    assert not profiling._profiler_lock.locked()
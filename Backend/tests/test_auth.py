@@ -0,0 +1,44 @@
+"""Cached authentication view of the current user."""
+import pytest
+
+from utils.auth import _load_current_user, _user_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_user_cache():
+    _user_cache.clear()
+
+
+def test_ban_takes_effect_on_the_next_request(mock_db, client, make_user):
+    _, admin_headers = make_user(role="admin")
+    customer_id, headers = make_user()
+    assert client.get("/api/cart", headers=headers).status_code == 200  # now cached
+
+    response = client.patch(f"/api/admin/users/{customer_id}/ban", json={"ban": True}, headers=admin_headers)
+    assert response.status_code == 200
+
+    response = client.get("/api/cart", headers=headers)
+    assert response.status_code == 403
+    assert response.get_json()["error"] == "Account is banned"
+
+
+def test_role_change_takes_effect_on_the_next_request(mock_db, client, make_user):
+    _, admin_headers = make_user(role="admin", is_banned=False)
+    user_id, headers = make_user()
+    assert client.get("/api/admin/cache/stats", headers=headers).status_code == 403  # now cached
+
+    response = client.patch(f"/api/admin/users/{user_id}/role", json={"role": "admin"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/api/admin/cache/stats", headers=headers).status_code == 200
+
+    response = client.patch(f"/api/admin/users/{user_id}/role", json={"role": "customer"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/api/admin/cache/stats", headers=headers).status_code == 403
+
+
+def test_cached_user_cannot_be_mutated_through_current_user(mock_db, make_user):
+    user_id, _ = make_user()
+    first = _load_current_user(mock_db, str(user_id))
+    first["role"] = "admin"
+
+    assert _load_current_user(mock_db, str(user_id))["role"] == "customer"
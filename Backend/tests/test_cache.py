@@ -0,0 +1,80 @@
+import time
+
+from utils.cache import TTLCache
+
+
+def test_misses_are_not_cached_by_default():
+    cache = TTLCache(ttl=60)
+    values = iter([None, {"name": "Aspirin"}])
+
+    assert cache.get_or_load("product", lambda: next(values)) is None
+    assert cache.get_or_load("product", lambda: next(values)) == {"name": "Aspirin"}
+    assert cache.stats()["loads"] == 2
+
+
+def test_misses_expire_after_miss_ttl():
+    cache = TTLCache(ttl=60, stale_ttl=60, miss_ttl=0.05)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return None
+
+    cache.get_or_load("product", load)
+    cache.get_or_load("product", load)
+    assert len(loads) == 1
+    time.sleep(0.06)
+    cache.get_or_load("product", load)
+    assert len(loads) == 2
+
+
+def test_product_created_after_a_404_is_served(client, mock_db):
+    product_id = mock_db.products.insert_one({"name": "Hidden", "is_active": False}).inserted_id
+    assert client.get(f"/api/products/{product_id}").status_code == 404
+
+    mock_db.products.update_one({"_id": product_id}, {"$set": {"is_active": True}})
+    assert client.get(f"/api/products/{product_id}").status_code == 200
+
+
+def _load_while(action, value):
+    """A loader that runs ``action`` (an invalidation) before returning ``value``."""
+
+    def load():
+        action()
+        return value
+
+    return load
+
+
+def test_unrelated_invalidation_does_not_discard_a_load():
+    cache = TTLCache(ttl=60)
+
+    cache.get_or_load("a", _load_while(lambda: cache.invalidate("b"), 1), tags=["product:1"])
+    cache.get_or_load("c", _load_while(lambda: cache.invalidate_tags(["product:2"]), 3), tags=["product:1"])
+
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_invalidating_the_loading_key_or_its_tags_discards_the_load():
+    cache = TTLCache(ttl=60)
+
+    cache.get_or_load("a", _load_while(lambda: cache.invalidate("a"), 1))
+    # Tags resolved from the loaded value are checked too.
+    cache.get_or_load(
+        "page", _load_while(lambda: cache.invalidate_tags(["product:7"]), [7, 8]),
+        tags=lambda ids: [f"product:{i}" for i in ids],
+    )
+    cache.get_or_load("b", _load_while(cache.clear, 2))
+
+    assert (cache.get("a"), cache.get("page"), cache.get("b")) == (None, None, None)
+    assert cache.get_or_load("a", lambda: 1) == 1
+    assert cache.get("a") == 1
+
+
+def test_invalidation_records_are_dropped_once_loads_finish():
+    cache = TTLCache(ttl=60)
+
+    cache.get_or_load("a", _load_while(lambda: cache.invalidate_tags(["x"]), 1))
+    cache.invalidate("b")
+
+    assert cache._invalidated_keys == {} and cache._invalidated_tags == {}
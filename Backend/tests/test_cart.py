@@ -0,0 +1,163 @@
+"""Atomic cart mutations."""
+import threading
+
+from pymongo.errors import DuplicateKeyError
+
+
+def _product(db, price=12.5, stock=1000):
+    return db.products.insert_one(
+        {"name": "Paracetamol", "price": price, "stock": stock, "is_active": True, "category": "pain-relief"}
+    ).inserted_id
+
+
+def test_concurrent_adds_lose_no_increments(app_module, mongo_db, make_user):
+    product_id = _product(mongo_db)
+    user_id, headers = make_user()
+    threads, adds = 8, 10
+    statuses = []
+    lock = threading.Lock()
+
+    def add():
+        client = app_module.app.test_client()
+        for _ in range(adds):
+            response = client.post("/api/cart", json={"productId": str(product_id), "quantity": 1}, headers=headers)
+            with lock:
+                statuses.append(response.status_code)
+
+    workers = [threading.Thread(target=add) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    cart = mongo_db.carts.find_one({"userId": str(user_id)})
+    assert statuses == [200] * threads * adds
+    assert mongo_db.carts.count_documents({"userId": str(user_id)}) == 1
+    assert [item["quantity"] for item in cart["items"]] == [threads * adds]
+    assert cart["total"] == 12.5 * threads * adds
+
+
+class RacingCarts:
+    """Carts collection whose first upsert loses the insert race."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.lost_race = False
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def find_one_and_update(self, filter, update, **kwargs):
+        if not self.lost_race:
+            self.lost_race = True
+            self._collection.insert_one({**filter, "items": [], "total": 0})
+            raise DuplicateKeyError("E11000 duplicate key error collection: carts index: userId_1")
+        return self._collection.find_one_and_update(filter, update, **kwargs)
+
+
+class RacingDatabase:
+    def __init__(self, db):
+        self._db = db
+        self.carts = RacingCarts(db.carts)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+
+def test_first_add_retries_after_losing_the_insert_race(app_module, mock_db, client, make_user, monkeypatch):
+    product_id = _product(mock_db)
+    user_id, headers = make_user()
+    racing = RacingDatabase(mock_db)
+    monkeypatch.setattr(app_module, "db", racing)
+
+    response = client.post("/api/cart", json={"productId": str(product_id), "quantity": 2}, headers=headers)
+
+    assert response.status_code == 200
+    assert racing.carts.lost_race
+    # mongomock keeps $literal wrappers, so only the shape is checked here.
+    assert mock_db.carts.count_documents({"userId": str(user_id)}) == 1
+    assert len(mock_db.carts.find_one({"userId": str(user_id)})["items"]) == 1
+
+
+def test_replace_cart_clamps_to_stock_and_drops_unavailable_lines(mock_db, client, make_user):
+    scarce = _product(mock_db, price=4.0, stock=3)
+    plenty = _product(mock_db, price=2.5)
+    sold_out = _product(mock_db, stock=0)
+    hidden = mock_db.products.insert_one({"name": "Hidden", "price": 1, "stock": 5, "is_active": False}).inserted_id
+    user_id, headers = make_user()
+
+    response = client.put("/api/cart", headers=headers, json={"items": [
+        {"productId": str(scarce), "quantity": 5},
+        {"productId": str(plenty), "quantity": 1},
+        {"productId": str(plenty), "quantity": 1},
+        {"productId": str(sold_out), "quantity": 1},
+        {"productId": str(hidden), "quantity": 1},
+    ]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["adjusted"] == [{"productId": str(scarce), "quantity": 3}]
+    assert sorted(body["removed"]) == sorted([str(sold_out), str(hidden)])
+    stored = mock_db.carts.find_one({"userId": str(user_id)})
+    assert [(item["productId"], item["quantity"]) for item in stored["items"]] == [
+        (str(scarce), 3), (str(plenty), 2),
+    ]
+    assert stored["total"] == 17.0
+
+
+def test_replace_cart_rejects_bad_lines_without_writing(mock_db, client, make_user):
+    product_id = _product(mock_db)
+    user_id, headers = make_user()
+
+    for items, error in [
+        ({"productId": str(product_id)}, "Cart items must be a list"),
+        ([{"productId": "not-an-id"}], "Invalid product ID"),
+        ([{"productId": str(product_id), "quantity": 0}], "Quantity must be at least 1"),
+    ]:
+        response = client.put("/api/cart", json={"items": items}, headers=headers)
+        assert response.status_code == 400
+        assert response.get_json()["error"] == error
+    assert mock_db.carts.count_documents({"userId": str(user_id)}) == 0
+
+
+def test_replace_cart_with_no_items_empties_it(mock_db, client, make_user):
+    product_id = _product(mock_db)
+    user_id, headers = make_user()
+    client.put("/api/cart", json={"items": [{"productId": str(product_id), "quantity": 2}]}, headers=headers)
+
+    response = client.put("/api/cart", json={"items": []}, headers=headers)
+
+    assert response.status_code == 200
+    stored = mock_db.carts.find_one({"userId": str(user_id)})
+    assert stored["items"] == []
+    assert stored["total"] == 0
+
+
+def test_delete_removes_only_that_line_and_updates_the_total(mock_db, client, make_user):
+    kept = _product(mock_db, price=2.0)
+    dropped = _product(mock_db, price=5.0)
+    _, headers = make_user()
+    client.put("/api/cart", headers=headers, json={"items": [
+        {"productId": str(kept), "quantity": 2},
+        {"productId": str(dropped), "quantity": 1},
+    ]})
+
+    response = client.delete(f"/api/cart/{dropped}", headers=headers)
+
+    assert response.status_code == 200
+    cart = response.get_json()["cart"]
+    assert [item["productId"] for item in cart["items"]] == [str(kept)]
+    assert cart["total"] == 4.0
+
+
+def test_delete_without_a_cart_returns_an_empty_one(mock_db, client, make_user):
+    user_id, headers = make_user()
+
+    response = client.delete(f"/api/cart/{_product(mock_db)}", headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()["cart"] == {"userId": str(user_id), "items": [], "total": 0}
+    assert mock_db.carts.count_documents({}) == 0
@@ -0,0 +1,48 @@
+"""Incrementally maintained per-customer order stats."""
+from utils.customer_stats import get_customer_stats, reconcile_customer_stats
+
+
+def _place_and_churn_orders(db, client, make_user):
+    """Place three orders, cancel the first and delete the second; returns the customer id."""
+
+    product_id = db.products.insert_one(
+        {"name": "Paracetamol", "price": 10.0, "stock": 100, "is_active": True, "category": "pain-relief"}
+    ).inserted_id
+    user_id, headers = make_user()
+    _, admin_headers = make_user(role="admin")
+
+    order_ids = []
+    for quantity in (1, 2, 3):
+        response = client.post(
+            "/api/orders", json={"items": [{"productId": str(product_id), "quantity": quantity}]}, headers=headers
+        )
+        assert response.status_code == 201
+        order_ids.append(str(db.orders.find_one(sort=[("_id", -1)])["_id"]))
+
+    response = client.patch(f"/api/orders/{order_ids[0]}/status", json={"status": "cancelled"}, headers=headers)
+    assert response.status_code == 200
+    response = client.delete(f"/api/admin/orders/{order_ids[1]}", headers=admin_headers)
+    assert response.status_code == 204
+    return str(user_id)
+
+
+def test_increments_track_create_cancel_and_delete(mock_db, client, make_user):
+    user_id = _place_and_churn_orders(mock_db, client, make_user)
+
+    remaining = list(mock_db.orders.find({"userId": user_id}))
+    kept = [order for order in remaining if order["status_key"] != "cancelled"]
+    assert get_customer_stats(mock_db, user_id) == {
+        "orders_count": 2,
+        "total_spent": round(sum(order["total"] for order in kept), 2),
+        "cancelled_count": 1,
+    }
+
+
+def test_increments_match_a_reconcile(mongo_db, client, make_user):
+    user_id = _place_and_churn_orders(mongo_db, client, make_user)
+    live = get_customer_stats(mongo_db, user_id)
+
+    reconcile_customer_stats(mongo_db)
+
+    assert get_customer_stats(mongo_db, user_id) == live
+    assert live["orders_count"] == 2
@@ -0,0 +1,29 @@
+"""Materialized dashboard counters."""
+import mongomock
+
+from utils.dashboard_metrics import compute_metrics, get_metrics, record_product_change
+
+
+def test_active_products_counts_visibility_only():
+    db = mongomock.MongoClient().db
+    db.products.insert_many(
+        [{"is_active": True, "stock": 0}, {"is_active": False, "stock": 5}, {"is_active": True, "stock": 3}]
+    )
+
+    assert compute_metrics(db)["active_products"] == 2
+
+
+def test_increments_match_the_recount():
+    db = mongomock.MongoClient().db
+    get_metrics(db)
+
+    hidden = {"is_active": False, "stock": 5}
+    db.products.insert_one(dict(hidden))
+    record_product_change(db, None, hidden)
+    # An order drains the hidden product; the counter has nothing to adjust.
+    db.products.update_one({}, {"$set": {"stock": 0}})
+    shown = {"is_active": True, "stock": 0}
+    db.products.update_one({}, {"$set": shown})
+    record_product_change(db, {**hidden, "stock": 0}, shown)
+
+    assert get_metrics(db)["active_products"] == compute_metrics(db)["active_products"] == 1
@@ -0,0 +1,67 @@
+import mongomock
+from pymongo import ASCENDING
+
+from utils.indexes import (
+    ORDERS_ORDER_ID,
+    blocking_indexes,
+    mismatched_indexes,
+    missing_indexes,
+    reconcile_indexes,
+    registered_indexes,
+)
+
+
+def _carts_user_spec():
+    return next(
+        spec
+        for spec in registered_indexes({"carts"})
+        if [field for field, _ in spec.keys] == ["userId"]
+    )
+
+
+def test_non_unique_index_is_mismatched_not_present():
+    db = mongomock.MongoClient().db
+    db.carts.create_index([("userId", ASCENDING)], name="legacy_user")
+    spec = _carts_user_spec()
+
+    existing = db.carts.index_information()
+    assert spec.matching(existing) == "legacy_user"
+    assert not spec.present_in(existing)
+    assert spec not in missing_indexes(db, [spec])
+
+    mismatched = mismatched_indexes(db, [spec])
+    assert [entry["index"] for entry in mismatched] == ["carts.legacy_user"]
+    assert mismatched[0]["differences"]["unique"] == {"expected": True, "actual": None}
+
+
+def test_required_indexes_include_text_and_unique():
+    required = [spec for spec in registered_indexes() if spec.required]
+    assert any(spec.options.get("unique") for spec in required)
+    assert any(direction == "text" for spec in required for _, direction in spec.keys)
+    assert all(spec.options.get("unique") or "text" in dict(spec.keys).values() for spec in required)
+
+
+def test_reconcile_required_only_builds_required():
+    db = mongomock.MongoClient().db
+    result = reconcile_indexes(db, collections={"carts"}, required=True)
+    assert result["created"] == [_carts_user_spec().label]
+    assert result["mismatched"] == []
+    assert all(not spec.required for spec in missing_indexes(db, registered_indexes({"carts"})))
+
+
+def test_failed_unique_build_over_duplicates_is_blocking():
+    db = mongomock.MongoClient().db
+    db.orders.insert_many([{"orderId": "ORD-1"}, {"orderId": "ORD-1"}])
+
+    result = reconcile_indexes(db, collections={"orders"}, required=True)
+
+    assert ORDERS_ORDER_ID.label in result["failed"]
+    assert ORDERS_ORDER_ID.label in result["blocking"]
+    assert [entry["reason"] for entry in blocking_indexes(db, [ORDERS_ORDER_ID])] == ["missing"]
+
+
+def test_non_unique_order_id_index_is_blocking():
+    db = mongomock.MongoClient().db
+    db.orders.create_index([("orderId", ASCENDING)])
+
+    assert [entry["reason"] for entry in blocking_indexes(db, [ORDERS_ORDER_ID])] == ["not unique"]
@@ -0,0 +1,137 @@
+"""Per-request MongoDB command stats and route budgets."""
+from types import SimpleNamespace
+
+import pytest
+
+from utils import instrumentation
+from utils.instrumentation import RequestStats, command_tracker, untracked
+
+
+def _run_command(request_id):
+    command = {"find": "products", "filter": {"_id": 1}}
+    command_tracker.started(SimpleNamespace(command_name="find", command=command, request_id=request_id))
+    command_tracker.succeeded(
+        SimpleNamespace(command_name="find", request_id=request_id, reply={"ok": 1}, duration_micros=100)
+    )
+
+
+def test_untracked_commands_are_left_out_of_request_stats():
+    stats = RequestStats(route="GET /test")
+    token = instrumentation._current.set(stats)
+    try:
+        _run_command(1)
+        with untracked():
+            _run_command(2)
+        _run_command(3)
+    finally:
+        instrumentation._current.reset(token)
+
+    assert stats.commands == 2
+
+
+@pytest.fixture
+def budgeted(app_module, mongo_db, monkeypatch):
+    """Real-MongoDB app with strict budgets and a cold auth cache."""
+
+    from utils.auth import _user_cache
+
+    if not app_module.Config.DB_INSTRUMENTATION:
+        pytest.skip("DB_INSTRUMENTATION is disabled")
+    monkeypatch.setattr(app_module.app, "testing", True)
+    _user_cache.clear()
+    return mongo_db
+
+
+def _assert_within_budget(app_module, method, path, response):
+    endpoint, _ = app_module.app.url_map.bind("localhost").match(path, method=method)
+    budget = app_module.app.view_functions[endpoint].db_budget
+    assert response.status_code < 400, response.get_json()
+    assert int(response.headers["X-DB-Commands"]) <= budget
+
+
+def _place_order(client, db, headers):
+    product_id = db.products.insert_one(
+        {"name": "Paracetamol", "price": 5.0, "stock": 10, "is_active": True, "category": "pain-relief"}
+    ).inserted_id
+    response = client.post(
+        "/api/orders", json={"items": [{"productId": str(product_id), "quantity": 1}]}, headers=headers
+    )
+    assert response.status_code == 201
+    return str(response.get_json()["order"]["_id"]), product_id
+
+
+def _cold_request(client, method, path, **kwargs):
+    from utils.auth import _user_cache
+
+    _user_cache.clear()
+    return client.open(path, method=method, **kwargs)
+
+
+def test_product_list_within_budget(app_module, budgeted, client):
+    budgeted.products.insert_one({"name": "Ibuprofen", "price": 3.0, "stock": 5, "is_active": True})
+
+    response = _cold_request(client, "GET", "/api/products")
+
+    _assert_within_budget(app_module, "GET", "/api/products", response)
+
+
+def test_cart_within_budget(app_module, budgeted, client, make_user):
+    _, headers = make_user()
+    _, product_id = _place_order(client, budgeted, headers)
+    client.post("/api/cart", json={"productId": str(product_id), "quantity": 1}, headers=headers)
+
+    response = _cold_request(client, "GET", "/api/cart", headers=headers)
+
+    _assert_within_budget(app_module, "GET", "/api/cart", response)
+
+
+def test_order_list_within_budget(app_module, budgeted, client, make_user):
+    _, headers = make_user()
+    _place_order(client, budgeted, headers)
+
+    response = _cold_request(client, "GET", "/api/orders", headers=headers)
+
+    _assert_within_budget(app_module, "GET", "/api/orders", response)
+
+
+def test_order_detail_within_budget(app_module, budgeted, client, make_user):
+    _, headers = make_user()
+    order_id, _ = _place_order(client, budgeted, headers)
+    path = f"/api/orders/{order_id}"
+
+    response = _cold_request(client, "GET", path, headers=headers)
+
+    _assert_within_budget(app_module, "GET", path, response)
+
+
+def test_order_cancel_within_budget(app_module, budgeted, client, make_user):
+    _, headers = make_user()
+    order_id, _ = _place_order(client, budgeted, headers)
+    path = f"/api/orders/{order_id}/status"
+
+    response = _cold_request(client, "PATCH", path, json={"status": "cancelled"}, headers=headers)
+
+    _assert_within_budget(app_module, "PATCH", path, response)
+
+
+def test_admin_status_update_within_budget(app_module, budgeted, client, make_user):
+    _, customer_headers = make_user()
+    _, admin_headers = make_user(role="admin")
+    order_id, _ = _place_order(client, budgeted, customer_headers)
+    path = f"/api/admin/orders/{order_id}/status"
+
+    response = _cold_request(client, "PATCH", path, json={"status": "Confirmed"}, headers=admin_headers)
+
+    _assert_within_budget(app_module, "PATCH", path, response)
+
+
+def test_profiled_request_stays_within_budget(app_module, budgeted, client, make_user):
+    if not app_module.Config.PROFILING_ENABLED:
+        pytest.skip("PROFILING_ENABLED is disabled")
+    _, headers = make_user(role="admin")
+    _place_order(client, budgeted, headers)
+
+    response = _cold_request(client, "GET", "/api/orders", headers={**headers, "X-Profile": "1"})
+
+    assert response.headers.get("X-Profile-Id")
+    _assert_within_budget(app_module, "GET", "/api/orders", response)
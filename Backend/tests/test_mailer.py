@@ -0,0 +1,204 @@
+"""MailDispatcher against a stand-in SMTP server."""
+from email import message_from_string
+from email.mime.text import MIMEText
+import base64
+import smtplib
+import socketserver
+import threading
+
+import pytest
+
+from utils.mailer import MailDispatcher
+
+REAL_SMTP = smtplib.SMTP
+
+
+class FakeSMTP:
+    """Records sessions and deliveries; class attributes script failures."""
+
+    sessions: list["FakeSMTP"] = []
+    fail_login = False
+
+    def __init__(self, host, port, timeout=None):
+        self.sent: list[tuple[str, list[str], str]] = []
+        self.closed = False
+        FakeSMTP.sessions.append(self)
+
+    def starttls(self, context=None):
+        pass
+
+    def login(self, username, password):
+        if FakeSMTP.fail_login:
+            raise smtplib.SMTPAuthenticationError(535, b"bad credentials")
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        self.sent.append((from_addr, to_addrs, msg))
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+class UnencodableMessage(MIMEText):
+    def as_string(self, *args, **kwargs):
+        raise UnicodeEncodeError("ascii", "é", 0, 1, "ordinal not in range(128)")
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough ESMTP (EHLO, AUTH PLAIN, MAIL, RCPT, DATA, QUIT) for smtplib."""
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        self._reply("220 stand-in ESMTP")
+        sender, recipients = None, []
+        for raw in self.rfile:
+            command = raw.decode().rstrip("\r\n")
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-stand-in")
+                self._reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                credentials = base64.b64decode(command.split()[-1]).split(b"\0")
+                server.logins.append(credentials[1].decode())
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].strip("<> "), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip("<> "))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                    lines.append(data.decode())
+                server.delivered.append((sender, recipients, message_from_string("".join(lines))))
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+@pytest.fixture
+def stand_in_smtp(monkeypatch):
+    monkeypatch.setattr(smtplib, "SMTP", REAL_SMTP)
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), StandInSMTPHandler)
+    server.daemon_threads = True
+    server.logins, server.delivered = [], []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.sessions = []
+    FakeSMTP.fail_login = False
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    return FakeSMTP
+
+
+def _dispatcher(dead_letters, **overrides):
+    options = {
+        "host": "smtp.test",
+        "port": 587,
+        "username": "user",
+        "password": "secret",
+        "from_email": "noreply@medicare.test",
+        "workers": 1,
+        "max_attempts": 1,
+        "dead_letter": dead_letters.append,
+    }
+    options.update(overrides)
+    return MailDispatcher(**options)
+
+
+def _message(body="code 1234"):
+    message = MIMEText(body)
+    message["Subject"] = "OTP"
+    return message
+
+
+def test_batch_is_delivered_over_one_session():
+    dead_letters = []
+    dispatcher = _dispatcher(dead_letters)
+    for index in range(3):
+        dispatcher.send(f"user{index}@medicare.test", _message())
+    dispatcher._queue.join()
+
+    assert len(FakeSMTP.sessions) == 1
+    assert [to for _, to, _ in FakeSMTP.sessions[0].sent] == [
+        ["user0@medicare.test"], ["user1@medicare.test"], ["user2@medicare.test"],
+    ]
+    assert dispatcher.stats()["sent"] == 3
+    assert dead_letters == []
+
+
+def test_unexpected_error_is_dead_lettered_and_worker_survives():
+    dead_letters = []
+    dispatcher = _dispatcher(dead_letters)
+    dispatcher.send("broken@medicare.test", UnencodableMessage("x"))
+    dispatcher._queue.join()
+    dispatcher.send("ok@medicare.test", _message())
+    dispatcher._queue.join()
+
+    assert [mail.recipient for mail in dead_letters] == ["broken@medicare.test"]
+    assert dead_letters[0].last_error.startswith("UnicodeEncodeError")
+    assert FakeSMTP.sessions[-1].sent[0][1] == ["ok@medicare.test"]
+    assert dispatcher.stats()["sent"] == 1
+
+
+def test_failing_dead_letter_callback_does_not_stop_delivery():
+    def explode(mail):
+        raise RuntimeError("dead letter store down")
+
+    dispatcher = _dispatcher([], dead_letter=explode)
+    dispatcher.send("broken@medicare.test", UnencodableMessage("x"))
+    dispatcher.send("ok@medicare.test", _message())
+    dispatcher._queue.join()
+
+    assert dispatcher.stats()["sent"] == 1
+    assert dispatcher.stats()["dead_lettered"] == 1
+
+
+def test_login_failure_closes_the_partial_session():
+    FakeSMTP.fail_login = True
+    dead_letters = []
+    dispatcher = _dispatcher(dead_letters)
+    dispatcher.send("user@medicare.test", _message())
+    dispatcher._queue.join()
+
+    assert len(FakeSMTP.sessions) == 1
+    assert FakeSMTP.sessions[0].closed
+    assert [mail.recipient for mail in dead_letters] == ["user@medicare.test"]
+
+
+def test_delivery_over_a_real_smtp_session(stand_in_smtp):
+    dead_letters = []
+    dispatcher = _dispatcher(
+        dead_letters, host="127.0.0.1", port=stand_in_smtp.server_address[1], use_tls=False,
+    )
+    dispatcher.send("user0@medicare.test", _message("code 1234"))
+    dispatcher.send("user1@medicare.test", _message("code 5678"))
+    dispatcher._queue.join()
+
+    assert stand_in_smtp.logins == ["user"]
+    assert [(sender, to) for sender, to, _ in stand_in_smtp.delivered] == [
+        ("noreply@medicare.test", ["user0@medicare.test"]),
+        ("noreply@medicare.test", ["user1@medicare.test"]),
+    ]
+    assert stand_in_smtp.delivered[1][2]["Subject"] == "OTP"
+    assert stand_in_smtp.delivered[1][2].get_payload().strip() == "code 5678"
+    assert dispatcher.stats()["sent"] == 2
+    assert dead_letters == []
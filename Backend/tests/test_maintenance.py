@@ -0,0 +1,33 @@
+"""Leased maintenance jobs."""
+from datetime import datetime, timedelta
+
+import mongomock
+
+from utils.maintenance import COLLECTION, acquire_lease, run_jobs
+
+
+def test_lease_is_exclusive_until_it_expires():
+    db = mongomock.MongoClient().db
+
+    assert acquire_lease(db, "job", "worker-1")
+    assert not acquire_lease(db, "job", "worker-2")
+    assert acquire_lease(db, "job", "worker-1")
+
+    db[COLLECTION].update_one({"_id": "job"}, {"$set": {"expiresAt": datetime.utcnow() - timedelta(seconds=1)}})
+    assert acquire_lease(db, "job", "worker-2")
+
+
+def test_run_jobs_skips_jobs_leased_elsewhere_and_releases_its_own():
+    db = mongomock.MongoClient().db
+    acquire_lease(db, "busy", "other-worker")
+    ran = []
+
+    outcomes = run_jobs(
+        db,
+        [("busy", lambda _: ran.append("busy")), ("free", lambda _: ran.append("free"))],
+        owner="this-worker",
+    )
+
+    assert outcomes == {"busy": "skipped", "free": "done"}
+    assert ran == ["free"]
+    assert db[COLLECTION].find_one({"_id": "free"}) is None
@@ -0,0 +1,44 @@
+"""Access to the Prometheus ``/metrics`` endpoint."""
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "scrape-secret")
+    return "scrape-secret"
+
+
+def test_anonymous_requests_are_refused(mock_db, client):
+    assert client.get("/metrics").status_code == 401
+
+
+def test_admin_token_is_served(mock_db, client, make_user):
+    _, headers = make_user(role="admin")
+    client.get("/api/products")
+
+    response = client.get("/metrics", headers=headers)
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert b'medicare_http_requests_total{endpoint="get_products",method="GET",status="200"}' in response.data
+
+
+def test_customer_token_is_forbidden(mock_db, client, make_user):
+    _, headers = make_user()
+
+    assert client.get("/metrics", headers=headers).status_code == 403
+
+
+def test_scraper_token_is_served_without_a_user(mock_db, client, metrics_token):
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {metrics_token}"})
+
+    assert response.status_code == 200
+
+
+def test_wrong_scraper_token_falls_back_to_user_auth(mock_db, client, make_user, metrics_token):
+    assert client.get("/metrics", headers={"Authorization": "Bearer not-the-secret"}).status_code == 401
+
+    _, headers = make_user(role="admin")
+    assert client.get("/metrics", headers=headers).status_code == 200
@@ -0,0 +1,46 @@
+"""Block-reserving order number allocator."""
+from concurrent.futures import ThreadPoolExecutor
+
+import mongomock
+
+from utils import order_numbers
+from utils.order_numbers import OrderNumberAllocator
+
+
+def _sequence(number):
+    return int(number[-8:])
+
+
+def test_allocators_sharing_counters_never_collide():
+    counters = mongomock.MongoClient().db.counters
+    first = OrderNumberAllocator(counters, block_size=5)
+    second = OrderNumberAllocator(counters, block_size=5)
+
+    numbers = [allocator.next() for _ in range(12) for allocator in (first, second)]
+
+    assert len(set(numbers)) == len(numbers)
+    # Each allocator reserved three blocks of five from the shared counter.
+    assert counters.find_one({"_id": "orderId"})["seq"] == 30
+
+
+def test_threads_sharing_an_allocator_get_distinct_numbers():
+    allocator = OrderNumberAllocator(mongomock.MongoClient().db.counters, block_size=7)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        numbers = list(pool.map(lambda _: allocator.next(), range(200)))
+
+    assert sorted(map(_sequence, numbers)) == list(range(1, 201))
+
+
+def test_a_forked_child_reserves_its_own_block(monkeypatch):
+    counters = mongomock.MongoClient().db.counters
+    allocator = OrderNumberAllocator(counters, block_size=10)
+    parent = [allocator.next(), allocator.next()]
+
+    # The child inherits the parent's half-used block but must not use it.
+    monkeypatch.setattr(order_numbers.os, "getpid", lambda: -1)
+    child = allocator.next()
+
+    assert list(map(_sequence, parent)) == [1, 2]
+    assert _sequence(child) == 11
+    assert counters.find_one({"_id": "orderId"})["seq"] == 20
@@ -0,0 +1,63 @@
+"""Canonical status keys and their resumable migration."""
+import mongomock
+import pytest
+
+from utils.order_status import MIGRATION_ID, STATUS_KEY_FIELD, migrate_status_keys, status_fields
+
+
+class InterruptedOrders:
+    """Wraps ``orders`` so the ``fail_on``-th bulk write raises."""
+
+    def __init__(self, orders, fail_on):
+        self._orders = orders
+        self._fail_on = fail_on
+        self.bulk_writes = 0
+
+    def bulk_write(self, operations, **kwargs):
+        self.bulk_writes += 1
+        if self.bulk_writes == self._fail_on:
+            raise RuntimeError("connection lost")
+        return self._orders.bulk_write(operations, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._orders, name)
+
+
+class InterruptedDatabase:
+    def __init__(self, db, fail_on):
+        self.orders = InterruptedOrders(db.orders, fail_on)
+        self.migrations = db.migrations
+
+
+def _legacy_orders(db, statuses):
+    return db.orders.insert_many([{"status": status} for status in statuses]).inserted_ids
+
+
+def test_status_fields_canonicalise_any_spelling():
+    assert status_fields(" SHIPPED ") == {"status": "Shipped", STATUS_KEY_FIELD: "shipped"}
+    assert status_fields(None) == {"status": "Pending", STATUS_KEY_FIELD: "pending"}
+
+
+def test_migration_resumes_from_its_checkpoint():
+    db = mongomock.MongoClient().db
+    ids = _legacy_orders(db, ["pending", "DELIVERED", "Cancelled", "confirmed", None])
+
+    with pytest.raises(RuntimeError):
+        migrate_status_keys(InterruptedDatabase(db, fail_on=2), batch_size=2)
+    progress = db.migrations.find_one({"_id": MIGRATION_ID})
+    assert progress["lastId"] == ids[1]
+    assert not progress.get("done")
+
+    # Orders before the checkpoint are not read again.
+    db.orders.update_one({"_id": ids[0]}, {"$set": {"status": "pending", STATUS_KEY_FIELD: "stale"}})
+    assert migrate_status_keys(db, batch_size=2) == 3
+
+    assert [(order["status"], order[STATUS_KEY_FIELD]) for order in db.orders.find().sort("_id", 1)] == [
+        ("pending", "stale"),
+        ("Delivered", "delivered"),
+        ("Cancelled", "cancelled"),
+        ("Confirmed", "confirmed"),
+        ("Pending", "pending"),
+    ]
+    assert db.migrations.find_one({"_id": MIGRATION_ID})["done"] is True
+    assert migrate_status_keys(db) == 0
@@ -0,0 +1,173 @@
+"""Stock reservation and order placement."""
+from bson import ObjectId
+
+
+def _product(db, name, stock, **fields):
+    document = {"name": name, "price": 10.0, "stock": stock, "is_active": True, "category": "pain-relief"}
+    document.update(fields)
+    return db.products.insert_one(document).inserted_id
+
+
+def _requirement(product_id, quantity, name="product"):
+    return {"product_id": product_id, "quantity": quantity, "name": name}
+
+
+def _stock(db, product_id):
+    return db.products.find_one({"_id": product_id})["stock"]
+
+
+def test_reserve_stock_applies_every_line(app_module, mock_db):
+    first = _product(mock_db, "A", 5)
+    second = _product(mock_db, "B", 2)
+
+    failed = app_module._reserve_stock([_requirement(first, 2), _requirement(second, 2)])
+
+    assert failed is None
+    assert (_stock(mock_db, first), _stock(mock_db, second)) == (3, 0)
+
+
+def test_reserve_stock_releases_applied_lines_on_shortfall(app_module, mock_db):
+    first = _product(mock_db, "A", 5)
+    short = _product(mock_db, "B", 1)
+    third = _product(mock_db, "C", 5)
+
+    failed = app_module._reserve_stock(
+        [_requirement(first, 2), _requirement(short, 2, "B"), _requirement(third, 1)]
+    )
+
+    assert failed["name"] == "B"
+    assert [_stock(mock_db, pid) for pid in (first, short, third)] == [5, 1, 5]
+
+
+def test_reserve_stock_never_creates_deleted_products(app_module, mock_db):
+    kept = _product(mock_db, "A", 5)
+    deleted = ObjectId()
+
+    failed = app_module._reserve_stock([_requirement(kept, 1), _requirement(deleted, 1, "gone")])
+
+    assert failed["name"] == "gone"
+    assert mock_db.products.find_one({"_id": deleted}) is None
+    assert _stock(mock_db, kept) == 5
+
+
+def test_bulk_reservation_stops_at_the_short_line(app_module, mongo_db):
+    first = _product(mongo_db, "A", 5)
+    short = _product(mongo_db, "B", 1)
+    third = _product(mongo_db, "C", 5)
+
+    failed = app_module._reserve_stock(
+        [_requirement(first, 2), _requirement(short, 2, "B"), _requirement(third, 1)]
+    )
+
+    assert app_module._stock_validator_installed()
+    assert failed["name"] == "B"
+    assert [_stock(mongo_db, pid) for pid in (first, short, third)] == [5, 1, 5]
+
+
+def test_bulk_reservation_reports_deleted_products(app_module, mongo_db):
+    kept = _product(mongo_db, "A", 5)
+
+    failed = app_module._reserve_stock(
+        [_requirement(kept, 1), _requirement(ObjectId(), 1, "gone"), _requirement(kept, 1)]
+    )
+
+    assert failed["name"] == "gone"
+    assert _stock(mongo_db, kept) == 5
+    assert mongo_db.products.count_documents({}) == 1
+
+
+def test_create_order_reserves_stock(app_module, mock_db, client, make_user):
+    product_id = _product(mock_db, "A", 3)
+    _, headers = make_user()
+
+    response = client.post(
+        "/api/orders", json={"items": [{"productId": str(product_id), "quantity": 2}]}, headers=headers
+    )
+
+    assert response.status_code == 201
+    assert _stock(mock_db, product_id) == 1
+
+
+def _order(product_id, quantity):
+    return {
+        "orderId": f"ORD-TEST-{ObjectId()}",
+        "userId": "test",
+        "items": [{"productId": str(product_id), "quantity": quantity}],
+        "status": "Pending",
+    }
+
+
+def _transaction_stats(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.Config, "ORDER_TRANSACTIONS", True)
+    stats = {key: 0 for key in app_module.ORDER_TRANSACTION_STATS}
+    monkeypatch.setattr(app_module, "ORDER_TRANSACTION_STATS", stats)
+    return stats
+
+
+def test_transaction_commits_stock_and_order_together(app_module, replica_set, monkeypatch):
+    stats = _transaction_stats(app_module, monkeypatch)
+    product_id = _product(replica_set, "A", 3)
+
+    failed = app_module._place_order(_order(product_id, 2), [_requirement(product_id, 2)])
+
+    assert failed is None
+    assert _stock(replica_set, product_id) == 1
+    assert replica_set.orders.count_documents({}) == 1
+    assert stats == {"attempts": 1, "commits": 1, "out_of_stock": 0}
+
+
+def test_transaction_aborts_when_out_of_stock(app_module, replica_set, monkeypatch):
+    stats = _transaction_stats(app_module, monkeypatch)
+    plenty = _product(replica_set, "A", 5)
+    short = _product(replica_set, "B", 1)
+
+    failed = app_module._place_order(
+        _order(plenty, 2), [_requirement(plenty, 2), _requirement(short, 2, "B")]
+    )
+
+    assert failed["name"] == "B"
+    assert (_stock(replica_set, plenty), _stock(replica_set, short)) == (5, 1)
+    assert replica_set.orders.count_documents({}) == 0
+    assert stats == {"attempts": 1, "commits": 0, "out_of_stock": 1}
+
+
+def test_transaction_retries_after_a_write_conflict(app_module, replica_set, monkeypatch):
+    stats = _transaction_stats(app_module, monkeypatch)
+    product_id = _product(replica_set, "A", 3)
+    reserve = app_module._reserve_stock
+    conflicts = []
+
+    def conflicting_reserve(requirements, session=None):
+        if conflicts:
+            return reserve(requirements, session=session)
+        # Another checkout holds an uncommitted write on the same product.
+        other = app_module.client.start_session()
+        other.start_transaction()
+        replica_set.products.update_one({"_id": product_id}, {"$set": {"touched": True}}, session=other)
+        conflicts.append(other)
+        try:
+            return reserve(requirements, session=session)
+        finally:
+            other.abort_transaction()
+            other.end_session()
+
+    monkeypatch.setattr(app_module, "_reserve_stock", conflicting_reserve)
+
+    failed = app_module._place_order(_order(product_id, 1), [_requirement(product_id, 1)])
+
+    assert failed is None
+    assert _stock(replica_set, product_id) == 2
+    assert replica_set.orders.count_documents({}) == 1
+    assert stats == {"attempts": 2, "commits": 1, "out_of_stock": 0}
+
+
+def test_hidden_products_can_still_be_ordered(app_module, mock_db, client, make_user):
+    product_id = _product(mock_db, "Hidden", 2, is_active=False)
+    _, headers = make_user()
+
+    response = client.post(
+        "/api/orders", json={"items": [{"productId": str(product_id), "quantity": 2}]}, headers=headers
+    )
+
+    assert response.status_code == 201
+    assert _stock(mock_db, product_id) == 0
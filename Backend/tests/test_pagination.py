@@ -0,0 +1,43 @@
+import mongomock
+import pytest
+from pymongo import ASCENDING, DESCENDING
+
+from utils.pagination import fetch_keyset_page
+
+
+def _walk(collection, direction, limit=2):
+    seen, cursor = [], None
+    while True:
+        documents, cursor = fetch_keyset_page(collection, {}, "rank", direction, limit, cursor)
+        seen.extend(document["_id"] for document in documents)
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+def test_keyset_pages_keep_null_and_missing_sort_values(direction):
+    collection = mongomock.MongoClient().db.items
+    collection.insert_many(
+        [{"_id": 1, "rank": 3}, {"_id": 2, "rank": None}, {"_id": 3}, {"_id": 4, "rank": 1},
+         {"_id": 5, "rank": 3}, {"_id": 6}, {"_id": 7, "rank": 2}]
+    )
+    expected = [
+        document["_id"]
+        for document in collection.find().sort([("rank", direction), ("_id", direction)])
+    ]
+
+    assert _walk(collection, direction) == expected
+    assert sorted(expected) == list(range(1, 8))
+
+
+def test_cursor_responses_share_one_shape(client, mock_db):
+    mock_db.products.insert_many(
+        [{"name": f"Product {index}", "category": "c", "is_active": True} for index in range(3)]
+    )
+
+    body = client.get("/api/products?cursor=&limit=2&sort=name").get_json()
+
+    assert set(body) == {"items", "next_cursor", "per_page"}
+    assert len(body["items"]) == 2 and body["per_page"] == 2
+    following = client.get(f"/api/products?cursor={body['next_cursor']}&limit=2&sort=name").get_json()
+    assert len(following["items"]) == 1 and following["next_cursor"] is None
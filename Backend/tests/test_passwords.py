@@ -0,0 +1,55 @@
+"""PasswordHasher pool behaviour."""
+import mongomock
+import pytest
+
+import utils.passwords
+from utils.passwords import PasswordHasher, PasswordHasherBusy, hash_cost
+
+
+def test_pool_hashes_and_verifies():
+    hasher = PasswordHasher(workers=1, max_pending=4, rounds=4)
+    hashed = hasher.hash("s3cret")
+
+    assert hash_cost(hashed) == 4
+    assert hasher.verify("s3cret", hashed)
+    assert not hasher.verify("wrong", hashed)
+
+
+def test_needs_rehash_below_configured_cost():
+    weak = PasswordHasher(workers=0, max_pending=1, rounds=4).hash("s3cret")
+
+    assert PasswordHasher(workers=0, max_pending=1, rounds=5).needs_rehash(weak)
+    assert not PasswordHasher(workers=0, max_pending=1, rounds=4).needs_rehash(weak)
+
+
+def test_full_backlog_raises_busy():
+    hasher = PasswordHasher(workers=0, max_pending=1, rounds=4)
+    hasher._slots.acquire()
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash("s3cret")
+
+
+def test_calibration_never_drops_below_bcrypt_default_cost():
+    assert PasswordHasher(workers=0, max_pending=1).min_rounds == 12
+
+
+def test_workers_share_one_calibrated_cost(monkeypatch):
+    db = mongomock.MongoClient().db
+    calibrations = iter([13, 14])
+    monkeypatch.setattr(utils.passwords, "calibrate_rounds", lambda *_: next(calibrations))
+
+    first = PasswordHasher(workers=0, max_pending=1)
+    second = PasswordHasher(workers=0, max_pending=1)
+
+    assert first.resolve_rounds(db) == 13
+    assert second.resolve_rounds(db) == 13
+    assert PasswordHasher(workers=0, max_pending=1, rounds=15).resolve_rounds(db) == 15
+
+
+def test_start_forks_every_pool_child_up_front():
+    hasher = PasswordHasher(workers=2, max_pending=4, rounds=4)
+
+    hasher.start()
+
+    assert len(hasher._executor._processes) == 2
@@ -0,0 +1,16 @@
+"""The current user's profile endpoints."""
+from datetime import datetime
+
+
+def test_read_and_update_encode_the_profile_alike(mock_db, client, make_user):
+    created_at = datetime(2026, 10, 18, 12, 32, 14)
+    user_id, headers = make_user(createdAt=created_at, password="hash", search_keys=["test"])
+
+    read = client.get("/api/users/profile", headers=headers).get_json()["user"]
+    unchanged = client.put("/api/users/profile", json={}, headers=headers).get_json()["user"]
+    updated = client.put("/api/users/profile", json={"phone": "0123"}, headers=headers).get_json()["user"]
+
+    assert read["_id"] == unchanged["_id"] == updated["_id"] == str(user_id)
+    assert read["createdAt"] == unchanged["createdAt"] == updated["createdAt"] == "2026-10-18T12:32:14"
+    assert datetime.fromisoformat(updated["updatedAt"])
+    assert not {"password", "search_keys"} & (set(read) | set(updated))
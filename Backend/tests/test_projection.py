@@ -0,0 +1,61 @@
+"""``fields=`` selection on read endpoints."""
+import pytest
+
+from utils.projection import (
+    PRODUCT_FIELDS,
+    PRODUCT_LIST_PROJECTION,
+    InvalidFieldsError,
+    build_projection,
+)
+
+
+def _product(db, **fields):
+    document = {
+        "name": "Paracetamol", "price": 12.5, "stock": 10, "is_active": True,
+        "category": "pain-relief", "description": "500mg", "search_keys": ["para"],
+    }
+    document.update(fields)
+    return db.products.insert_one(document).inserted_id
+
+
+def test_build_projection_defaults_and_required_fields():
+    assert build_projection(None, PRODUCT_FIELDS, PRODUCT_LIST_PROJECTION) == PRODUCT_LIST_PROJECTION
+    assert build_projection(" name, price,name ,", PRODUCT_FIELDS, PRODUCT_LIST_PROJECTION, required=("createdAt",)) == {
+        "name": 1, "price": 1, "createdAt": 1,
+    }
+
+
+def test_build_projection_rejects_unknown_fields():
+    with pytest.raises(InvalidFieldsError, match="Unknown fields: password, search_keys"):
+        build_projection("name,search_keys,password", PRODUCT_FIELDS, PRODUCT_LIST_PROJECTION)
+
+
+@pytest.mark.parametrize("path", ["/api/products", "/api/products/{product_id}", "/api/orders"])
+def test_unknown_fields_are_a_bad_request(mock_db, client, make_user, path):
+    _, headers = make_user()
+
+    response = client.get(
+        path.format(product_id=_product(mock_db)), query_string={"fields": "createdAt,search_keys"}, headers=headers
+    )
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Unknown fields: search_keys"}
+
+
+def test_admin_user_list_rejects_unknown_fields(mock_db, client, make_user):
+    _, headers = make_user(role="admin")
+
+    response = client.get("/api/admin/users", query_string={"fields": "email,password"}, headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Unknown fields: password"}
+
+
+def test_product_list_returns_only_the_requested_fields(mock_db, client):
+    _product(mock_db)
+
+    response = client.get("/api/products", query_string={"fields": "name,price"})
+
+    assert response.status_code == 200
+    [product] = response.get_json()["products"]
+    assert set(product) == {"_id", "name", "price"}
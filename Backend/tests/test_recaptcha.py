@@ -0,0 +1,92 @@
+"""RecaptchaVerifier token reuse and circuit breaker behaviour."""
+import pytest
+
+from utils.recaptcha import RecaptchaVerifier
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    def __init__(self, payload=None, error=None):
+        self.payload = payload if payload is not None else {"success": True}
+        self.error = error
+        self.calls = []
+
+    def post(self, url, data=None, timeout=None):
+        self.calls.append(data)
+        if self.error is not None:
+            raise self.error
+        return FakeResponse(self.payload)
+
+
+def _verifier(session, **overrides):
+    options = {"secret": "secret", "verify_url": "https://verify.test", "token_max_reuse": 1}
+    options.update(overrides)
+    verifier = RecaptchaVerifier(**options)
+    verifier._session = session
+    return verifier
+
+
+def test_verified_token_covers_one_resubmission_of_the_same_form():
+    session = FakeSession()
+    verifier = _verifier(session)
+
+    for _ in range(3):
+        assert verifier.verify("tok", action="login", identity="a@x.io", remote_ip="1.2.3.4")
+
+    # First check and the call after the single allowed reuse reach the verifier.
+    assert len(session.calls) == 2
+    assert session.calls[0]["remoteip"] == "1.2.3.4"
+    assert verifier.stats()["cache_hits"] == 1
+
+
+@pytest.mark.parametrize(
+    "context",
+    [
+        {"action": "register", "identity": "a@x.io", "remote_ip": "1.2.3.4"},
+        {"action": "login", "identity": "b@x.io", "remote_ip": "1.2.3.4"},
+        {"action": "login", "identity": "a@x.io", "remote_ip": "5.6.7.8"},
+    ],
+)
+def test_verified_token_is_not_reused_in_another_context(context):
+    session = FakeSession()
+    verifier = _verifier(session)
+    verifier.verify("tok", action="login", identity="a@x.io", remote_ip="1.2.3.4")
+
+    verifier.verify("tok", **context)
+
+    assert len(session.calls) == 2
+
+
+def test_token_issued_for_another_action_is_rejected():
+    verifier = _verifier(FakeSession({"success": True, "action": "register"}))
+
+    assert not verifier.verify("tok", action="login", identity="a@x.io")
+
+
+@pytest.mark.parametrize("fail_open", [False, True])
+def test_unexpected_error_counts_as_a_failure(fail_open):
+    verifier = _verifier(FakeSession(error=RuntimeError("boom")), failure_threshold=1, fail_open=fail_open)
+
+    assert verifier.verify("tok", action="login") is fail_open
+    assert verifier.stats()["errors"] == 1
+    assert verifier.breaker.state == "open"
+
+
+def test_unexpected_error_releases_the_half_open_trial():
+    verifier = _verifier(FakeSession(error=KeyError("success")), failure_threshold=1, reset_timeout=0)
+    verifier.breaker.record_failure()
+    assert verifier.breaker.state == "half_open"
+
+    assert not verifier.verify("tok", action="login")
+
+    assert verifier.breaker.allow()
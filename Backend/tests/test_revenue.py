@@ -0,0 +1,100 @@
+"""Daily revenue rollup and the dashboard series built from it."""
+from datetime import datetime, timezone
+
+import mongomock
+import pytest
+
+from utils.order_status import status_fields
+from utils.revenue_rollup import (
+    COLLECTION,
+    InvalidSeriesRequest,
+    rebuild_revenue_daily,
+    record_status_change,
+    revenue_series,
+)
+
+NOW = datetime(2026, 3, 10, 12, tzinfo=timezone.utc)  # a Tuesday
+
+
+def _order(db, created_at, total, status="Delivered"):
+    document = {"createdAt": created_at, "total": total, **status_fields(status)}
+    document["_id"] = db.orders.insert_one(document).inserted_id
+    return document
+
+
+def _record(db, created_at, total):
+    record_status_change(db, {"createdAt": created_at, "total": total, "status": "Pending"}, "Delivered")
+
+
+def _point(day, revenue=0.0, orders=0):
+    return {"date": day, "revenue": revenue, "orders": orders}
+
+
+def test_rebuild_is_idempotent_and_drops_emptied_days():
+    db = mongomock.MongoClient().db
+    _order(db, datetime(2026, 3, 1, 9), 10.0)
+    cancelled = _order(db, datetime(2026, 3, 2, 9), 5.0)
+
+    assert rebuild_revenue_daily(db) == 2
+    db.orders.update_one({"_id": cancelled["_id"]}, {"$set": status_fields("Cancelled")})
+    assert rebuild_revenue_daily(db) == 1
+    assert rebuild_revenue_daily(db) == 1
+
+    assert [day["_id"] for day in db[COLLECTION].find()] == ["2026-03-01"]
+    day = db[COLLECTION].find_one({"_id": "2026-03-01"})
+    assert (day["revenue"], day["orders"], day["hours"]["09"]["orders"]) == (10.0, 1, 1)
+
+
+def test_rebuild_matches_live_increments():
+    db = mongomock.MongoClient().db
+    order = _order(db, datetime(2026, 3, 1, 9), 10.0, status="Pending")
+    _order(db, datetime(2026, 3, 1, 9), 4.0)
+    rebuild_revenue_daily(db)
+
+    record_status_change(db, order, "Confirmed")
+    db.orders.update_one({"_id": order["_id"]}, {"$set": status_fields("Confirmed")})
+    live = db[COLLECTION].find_one({"_id": "2026-03-01"})
+    rebuild_revenue_daily(db)
+
+    rebuilt = db[COLLECTION].find_one({"_id": "2026-03-01"})
+    assert (live["revenue"], live["orders"]) == (rebuilt["revenue"], rebuilt["orders"]) == (14.0, 2)
+
+
+def test_series_days_follow_the_requested_timezone():
+    db = mongomock.MongoClient().db
+    _record(db, datetime(2026, 3, 9, 20), 10.0)  # 05:00 on the 10th in Tokyo
+    _record(db, datetime(2026, 3, 8, 14), 3.0)  # before the range in both zones
+
+    assert revenue_series(db, 2, now=NOW) == [_point("2026-03-09", 10.0, 1), _point("2026-03-10")]
+    assert revenue_series(db, 2, tz_name="Asia/Tokyo", now=NOW) == [
+        _point("2026-03-09"), _point("2026-03-10", 10.0, 1),
+    ]
+
+
+def test_series_buckets_start_on_monday_and_the_first_clamped_to_the_range():
+    db = mongomock.MongoClient().db
+    _record(db, datetime(2026, 2, 25, 9), 2.0)
+    _record(db, datetime(2026, 3, 1, 10), 5.0)
+    _record(db, datetime(2026, 3, 4, 10), 7.0)
+    _record(db, datetime(2026, 3, 5, 10), 1.0)
+
+    assert revenue_series(db, 10, bucket="week", now=NOW) == [
+        _point("2026-03-01", 5.0, 1), _point("2026-03-02", 8.0, 2), _point("2026-03-09"),
+    ]
+    assert revenue_series(db, 15, bucket="month", now=NOW) == [
+        _point("2026-02-24", 2.0, 1), _point("2026-03-01", 13.0, 3),
+    ]
+
+
+def test_series_zero_fills_an_empty_range():
+    db = mongomock.MongoClient().db
+
+    assert revenue_series(db, 3, now=NOW) == [
+        _point("2026-03-08"), _point("2026-03-09"), _point("2026-03-10"),
+    ]
+
+
+@pytest.mark.parametrize("options", [{"bucket": "year"}, {"tz_name": "Mars/Olympus"}])
+def test_series_rejects_unknown_bucket_or_timezone(options):
+    with pytest.raises(InvalidSeriesRequest):
+        revenue_series(mongomock.MongoClient().db, 7, now=NOW, **options)
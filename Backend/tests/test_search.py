@@ -0,0 +1,58 @@
+"""Admin search keys."""
+from utils.search import (
+    CUSTOMER_KEYS_FIELD,
+    ORDER_KEYS_FIELD,
+    SEARCH_KEYS_FIELD,
+    build_customer_search_keys,
+    build_order_search_keys,
+    migrate_order_number_keys,
+    order_search_fields,
+    refresh_customer_order_keys,
+)
+
+ORDER_NUMBER = "ORD2026101800001234"
+
+
+def _insert_order(db, user_id, order_number=ORDER_NUMBER, keys=None):
+    order = {"orderId": order_number, "userId": str(user_id), "status": "Pending", "status_key": "pending",
+             "shipping": {"fullName": "Lan Nguyen"}}
+    customer_keys = build_customer_search_keys({"name": "Lan Nguyen", "email": "lan@medicare.test"})
+    order.update(order_search_fields(keys if keys is not None else build_order_search_keys(order), customer_keys))
+    return db.orders.insert_one(order).inserted_id
+
+
+def test_order_number_tail_is_searchable(app_module, mock_db, client, make_user):
+    _, headers = make_user(role="admin")
+    _insert_order(mock_db, "customer")
+    _insert_order(mock_db, "customer", order_number="ORD2026101800005678")
+
+    def search(query):
+        response = client.get("/api/admin/orders/", query_string={"q": query}, headers=headers)
+        assert response.status_code == 200, query
+        return [order["order_number"] for order in response.get_json()["items"]]
+
+    assert ORDER_NUMBER in search(ORDER_NUMBER)
+    for query in ("00001234", "1234", "01234"):
+        assert search(query) == [ORDER_NUMBER], query
+
+
+def test_refresh_customer_order_keys_dedupes_and_sorts(mock_db):
+    _insert_order(mock_db, "customer-1")
+
+    refresh_customer_order_keys(mock_db, "customer-1", {"name": "Lan Tran", "email": "lan@medicare.test"})
+
+    order = mock_db.orders.find_one({"userId": "customer-1"})
+    expected = sorted(set(order[ORDER_KEYS_FIELD]) | set(order[CUSTOMER_KEYS_FIELD]))
+    assert order[SEARCH_KEYS_FIELD] == expected
+    assert "p:tran" in order[SEARCH_KEYS_FIELD]
+
+
+def test_migration_adds_suffix_keys_to_existing_orders(mock_db):
+    legacy_keys = [key for key in build_order_search_keys({"orderId": ORDER_NUMBER}) if not key.startswith("s:")]
+    order_id = _insert_order(mock_db, "customer", keys=legacy_keys)
+
+    assert migrate_order_number_keys(mock_db) == 1
+    assert migrate_order_number_keys(mock_db) == 0
+    order = mock_db.orders.find_one({"_id": order_id})
+    assert "s:1234" in order[SEARCH_KEYS_FIELD]
+    assert "p:lan" in order[SEARCH_KEYS_FIELD]
@@ -7,6 +7,13 @@ from bson import ObjectId
 from flask import current_app, jsonify, request
 
 from config import Config
+from utils.cache import TTLCache
+
+# Only the fields the decorators and route handlers read from ``current_user``.
+# Routes needing the full profile load it themselves.
+AUTH_USER_PROJECTION = {"name": 1, "email": 1, "role": 1, "is_banned": 1}
+
+_user_cache = TTLCache(max_entries=Config.AUTH_CACHE_MAX_ENTRIES, ttl=Config.AUTH_CACHE_TTL)
 
 
 def _extract_bearer_token() -> str | None:
@@ -18,6 +25,42 @@ def _extract_bearer_token() -> str | None:
     return None
 
 
+def _load_current_user(mongo_db, user_id: str) -> dict | None:
+    """Return the cached authentication view of a user."""
+
+    def load():
+        return mongo_db.users.find_one({"_id": ObjectId(user_id)}, AUTH_USER_PROJECTION)
+
+    user = _user_cache.get_or_load(user_id, load)
+    # Hand out a copy so a route mutating ``current_user`` cannot poison the cache.
+    return dict(user) if user else None
+
+
+def invalidate_user_cache(user_id: Any) -> None:
+    """Drop a user's cached authentication view after their account changes."""
+    _user_cache.invalidate(str(user_id))
+
+
+def request_admin() -> dict | None:
+    """Return the admin making the current request, or ``None``.
+
+    For hooks outside the decorated views; any missing, invalid or
+    non-admin credential simply yields ``None``.
+    """
+    token = _extract_bearer_token()
+    mongo_db = getattr(current_app, "mongo_db", None)
+    if not token or mongo_db is None:
+        return None
+    try:
+        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+    user = _load_current_user(mongo_db, str(payload.get("user_id")))
+    if not user or user.get("role") != "admin" or user.get("is_banned"):
+        return None
+    return user
+
+
 def token_required(fn: Callable) -> Callable:
     """Decorator to ensure the request is authenticated with a valid JWT."""
 
@@ -42,7 +85,7 @@ def token_required(fn: Callable) -> Callable:
         if mongo_db is None:
             return jsonify({"error": "Database connection not configured"}), 500
 
-        current_user = mongo_db.users.find_one({"_id": ObjectId(payload["user_id"])})
+        current_user = _load_current_user(mongo_db, str(payload["user_id"]))
         if not current_user:
             return jsonify({"error": "User not found"}), 401
 
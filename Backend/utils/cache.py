@@ -0,0 +1,300 @@
+"""Bounded in-process caching for read-mostly data.
+
+The product catalogue only changes when an admin edits it or an order
+decrements stock, so serialised products and list pages are kept in a small
+LRU/TTL cache. Entries carry tags (``product:<id>``, ``products:list``) so
+write paths can invalidate exactly what they touched.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Any, Callable, Hashable, Iterable
+
+from config import Config
+
+PRODUCT_LIST_TAG = "products:list"
+
+
+def product_tag(product_id: Any) -> str:
+    """Return the invalidation tag for a single product."""
+    return f"product:{product_id}"
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fresh_until: float
+    stale_until: float
+    tags: frozenset[str] = field(default_factory=frozenset)
+
+
+class TTLCache:
+    """Thread-safe LRU cache with TTL, stale-while-revalidate and tags.
+
+    ``get_or_load`` collapses concurrent misses for the same key onto a single
+    loader call. Once an entry is older than ``ttl`` but younger than
+    ``ttl + stale_ttl`` it is still served while one background thread
+    refreshes it, so a burst of traffic reaches the loader at most once per
+    key.
+
+    ``None`` (a lookup that found nothing) is kept for ``miss_ttl`` seconds
+    only, and not at all by default, so a missing document does not hide one
+    created moments later for a full TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 30.0,
+        stale_ttl: float = 0.0,
+        load_timeout: float = 10.0,
+        miss_ttl: float = 0.0,
+    ) -> None:
+        self.max_entries = max(int(max_entries), 1)
+        self.ttl = float(ttl)
+        self.stale_ttl = max(float(stale_ttl), 0.0)
+        self.load_timeout = load_timeout
+        self.miss_ttl = max(float(miss_ttl), 0.0)
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._tags: dict[str, set[Hashable]] = {}
+        self._inflight: dict[Hashable, threading.Event] = {}
+        # Invalidation clock. While loads are running, each invalidated key
+        # and tag records the tick it was invalidated at, so a load only
+        # discards its result if its own key or tags changed meanwhile.
+        self._clock = 0
+        self._cleared_at = 0
+        self._loading = 0
+        self._invalidated_keys: dict[Hashable, int] = {}
+        self._invalidated_tags: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "refreshes": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    # ------------------------------------------------------------------ reads
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the fresh value for ``key`` without loading on a miss."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry.fresh_until:
+                self._counters["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry.value
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        tags: Iterable[str] | Callable[[Any], Iterable[str]] = (),
+    ) -> Any:
+        """Return the cached value for ``key``, loading it on a miss.
+
+        ``tags`` may be an iterable or a callable receiving the loaded value,
+        which lets list pages tag themselves with the products they contain.
+        ``loader`` must not depend on request-local state because stale
+        entries are refreshed from a background thread.
+        """
+
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    if now < entry.fresh_until:
+                        self._entries.move_to_end(key)
+                        self._counters["hits"] += 1
+                        return entry.value
+                    if now < entry.stale_until:
+                        self._entries.move_to_end(key)
+                        self._counters["stale_hits"] += 1
+                        if key not in self._inflight:
+                            self._inflight[key] = threading.Event()
+                            self._counters["refreshes"] += 1
+                            threading.Thread(
+                                target=self._refresh,
+                                args=(key, loader, tags),
+                                daemon=True,
+                            ).start()
+                        return entry.value
+                    self._remove(key)
+
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._counters["misses"] += 1
+                    self._inflight[key] = threading.Event()
+                    break
+
+            # Another thread is already loading this key; wait for it and
+            # re-check instead of issuing a duplicate query.
+            if not waiter.wait(self.load_timeout):
+                return self._load_and_store(key, loader, tags, register=False)
+
+        return self._load_and_store(key, loader, tags, register=True)
+
+    def _refresh(self, key, loader, tags) -> None:
+        try:
+            self._load_and_store(key, loader, tags, register=True)
+        except Exception:  # pragma: no cover - stale value keeps being served
+            pass
+
+    def _load_and_store(self, key, loader, tags, register: bool) -> Any:
+        with self._lock:
+            started = self._clock
+            self._loading += 1
+        try:
+            value = loader()
+            resolved_tags = frozenset(tags(value) if callable(tags) else tags)
+        except Exception:
+            with self._lock:
+                self._counters["load_errors"] += 1
+                self._finish_load()
+                if register:
+                    self._release(key)
+            raise
+
+        now = time.monotonic()
+        with self._lock:
+            self._counters["loads"] += 1
+            # Skip the store if this key or one of its tags was invalidated
+            # while loading; the value may already be outdated.
+            if not self._invalidated_since(started, key, resolved_tags):
+                self._store(key, value, resolved_tags, now)
+            self._finish_load()
+            if register:
+                self._release(key)
+        return value
+
+    def _invalidated_since(self, tick: int, key, tags: frozenset[str]) -> bool:
+        if self._cleared_at > tick or self._invalidated_keys.get(key, 0) > tick:
+            return True
+        return any(self._invalidated_tags.get(tag, 0) > tick for tag in tags)
+
+    def _finish_load(self) -> None:
+        self._loading -= 1
+        if not self._loading:
+            # No load can be outdated by what was recorded so far.
+            self._invalidated_keys.clear()
+            self._invalidated_tags.clear()
+
+    def _release(self, key) -> None:
+        event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    # ----------------------------------------------------------------- writes
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = ()) -> None:
+        with self._lock:
+            self._store(key, value, frozenset(tags), time.monotonic())
+
+    def _store(self, key, value, tags: frozenset[str], now: float) -> None:
+        self._remove(key)
+        if value is None:
+            if self.miss_ttl <= 0:
+                return
+            fresh_until = stale_until = now + min(self.miss_ttl, self.ttl)
+        else:
+            fresh_until = now + self.ttl
+            stale_until = fresh_until + self.stale_ttl
+        self._entries[key] = _Entry(
+            value=value,
+            fresh_until=fresh_until,
+            stale_until=stale_until,
+            tags=tags,
+        )
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._counters["evictions"] += 1
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._clock += 1
+            if self._loading:
+                self._invalidated_keys[key] = self._clock
+            if key in self._entries:
+                self._remove(key)
+                self._counters["invalidations"] += 1
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of ``tags``; returns the count removed."""
+
+        removed = 0
+        with self._lock:
+            self._clock += 1
+            for tag in tags:
+                if self._loading:
+                    self._invalidated_tags[tag] = self._clock
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self._counters["invalidations"] += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clock += 1
+            self._cleared_at = self._clock
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["stale_hits"] + self._counters["misses"]
+            served = self._counters["hits"] + self._counters["stale_hits"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            }
+
+
+product_cache = TTLCache(
+    max_entries=Config.PRODUCT_CACHE_MAX_ENTRIES,
+    ttl=Config.PRODUCT_CACHE_TTL,
+    stale_ttl=Config.PRODUCT_CACHE_STALE_TTL,
+    miss_ttl=Config.PRODUCT_CACHE_MISS_TTL,
+)
+
+
+def invalidate_products(*product_ids: Any, listings: bool = False) -> None:
+    """Invalidate cached product documents and the list pages containing them.
+
+    Pass ``listings=True`` when the write can change which products a list
+    page contains or how it is ordered (create, delete, visibility, category,
+    price, name or searchable text edits).
+    """
+
+    tags = [product_tag(product_id) for product_id in product_ids]
+    if listings:
+        tags.append(PRODUCT_LIST_TAG)
+    if tags:
+        product_cache.invalidate_tags(tags)
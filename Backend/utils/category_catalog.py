@@ -0,0 +1,93 @@
+"""Pre-encoded categories payload served by ``GET /api/categories``.
+
+``FIXED_CATEGORIES`` is the authoritative list, so the response only needs
+to be rebuilt when product counts or stored category descriptions change.
+The JSON body is encoded once and stamped with a strong ETag derived from
+its bytes.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any
+
+from config import Config
+from constants.categories import FIXED_CATEGORIES
+from utils.helpers import serialize_doc
+
+
+class CategoryCatalog:
+    """Holds the encoded categories response and rebuilds it on demand.
+
+    Writers call :meth:`mark_dirty`; the next read rebuilds. ``max_age``
+    bounds how long a snapshot may be served, which also picks up changes
+    made by other worker processes.
+    """
+
+    def __init__(self, max_age: float = 300.0) -> None:
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._body: bytes | None = None
+        self._etag: str | None = None
+        self._built_at = 0.0
+        self._dirty = True
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+
+    def get(self, db) -> tuple[bytes, str]:
+        """Return ``(body, etag)``, rebuilding the snapshot when required."""
+
+        if not self._needs_rebuild():
+            return self._body, self._etag
+        with self._lock:
+            if self._needs_rebuild():
+                self._dirty = False
+                try:
+                    self._body, self._etag = self._build(db)
+                except Exception:
+                    self._dirty = True
+                    if self._body is None:
+                        raise
+                self._built_at = time.monotonic()
+        return self._body, self._etag
+
+    def _needs_rebuild(self) -> bool:
+        return (
+            self._dirty
+            or self._body is None
+            or time.monotonic() - self._built_at > self.max_age
+        )
+
+    @staticmethod
+    def _build(db) -> tuple[bytes, str]:
+        stored = {
+            category.get("slug"): serialize_doc(category)
+            for category in db.categories.find({})
+        }
+        counts = {
+            row["_id"]: row["count"]
+            for row in db.products.aggregate(
+                [
+                    {"$match": {"is_active": True}},
+                    {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                ]
+            )
+        }
+
+        categories: list[dict[str, Any]] = []
+        for category in FIXED_CATEGORIES:
+            slug = category["slug"]
+            entry = {**stored.get(slug, {}), **category}
+            entry.setdefault("description", "")
+            entry["product_count"] = counts.get(slug, 0)
+            categories.append(entry)
+
+        body = json.dumps({"categories": categories}, separators=(",", ":")).encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        return body, etag
+
+
+category_catalog = CategoryCatalog(max_age=Config.CATEGORY_CACHE_MAX_AGE)
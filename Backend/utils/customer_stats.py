@@ -0,0 +1,183 @@
+"""Per-customer order aggregates.
+
+``customer_stats`` holds one document per customer (``_id`` is the user id
+string used on orders) with ``orders_count``, ``total_spent`` and
+``cancelled_count``. Order writes adjust it with ``$inc`` so the admin user
+page and the top-customers list never scan a customer's orders; cancelled
+orders count towards ``orders_count`` but not ``total_spent``.
+
+Run ``python -m utils.customer_stats`` periodically (e.g. nightly from cron)
+to rebuild the collection from the orders and correct any drift.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import DESCENDING
+
+from utils.order_status import STATUS_KEY_FIELD, status_key
+
+COLLECTION = "customer_stats"
+TOP_CUSTOMER_FIELDS = {"total_spent", "orders_count"}
+EMPTY_STATS = {"orders_count": 0, "total_spent": 0.0, "cancelled_count": 0}
+
+
+def _is_cancelled(status: Any) -> bool:
+    return status_key(status) == "cancelled"
+
+
+def _contribution(total: Any, status: Any) -> tuple[float, int]:
+    try:
+        amount = float(total or 0)
+    except (TypeError, ValueError):
+        amount = 0.0
+    if _is_cancelled(status):
+        return 0.0, 1
+    return amount, 0
+
+
+def _apply(db, user_id: Any, orders: int, spent: float, cancelled: int, order_at=None) -> None:
+    if not user_id or (orders == 0 and spent == 0 and cancelled == 0):
+        return
+    update: dict[str, Any] = {
+        "$inc": {"orders_count": orders, "total_spent": spent, "cancelled_count": cancelled},
+        "$set": {"updatedAt": datetime.utcnow()},
+    }
+    if order_at is not None:
+        update["$max"] = {"lastOrderAt": order_at}
+    try:
+        db[COLLECTION].update_one({"_id": str(user_id)}, update, upsert=True)
+    except Exception as exc:  # pragma: no cover - reconciliation repairs the miss
+        print(f"Warning: failed to update customer stats for {user_id}: {exc}")
+
+
+def record_order_created(db, order: dict[str, Any]) -> None:
+    spent, cancelled = _contribution(order.get("total"), order.get("status"))
+    _apply(db, order.get("userId"), 1, spent, cancelled, order.get("createdAt"))
+
+
+def record_order_deleted(db, order: dict[str, Any]) -> None:
+    spent, cancelled = _contribution(order.get("total"), order.get("status"))
+    _apply(db, order.get("userId"), -1, -spent, -cancelled)
+
+
+def record_status_change(db, order: dict[str, Any], new_status: str) -> None:
+    """Adjust the aggregates after ``order`` moved from its stored status to ``new_status``."""
+
+    old_spent, old_cancelled = _contribution(order.get("total"), order.get("status"))
+    new_spent, new_cancelled = _contribution(order.get("total"), new_status)
+    _apply(db, order.get("userId"), 0, new_spent - old_spent, new_cancelled - old_cancelled)
+
+
+def get_customer_stats(db, user_id: Any) -> dict[str, Any]:
+    stats = db[COLLECTION].find_one({"_id": str(user_id)}) or {}
+    result = {key: stats.get(key, default) for key, default in EMPTY_STATS.items()}
+    result["total_spent"] = round(result["total_spent"], 2)
+    return result
+
+
+def top_customers(db, limit: int = 10, by: str = "total_spent") -> list[dict[str, Any]]:
+    """Return the best customers by ``by`` with their name and email."""
+
+    if by not in TOP_CUSTOMER_FIELDS:
+        raise ValueError(f"Cannot rank customers by {by}")
+    ranked = list(
+        db[COLLECTION]
+        .find({by: {"$gt": 0}})
+        .sort([(by, DESCENDING), ("_id", DESCENDING)])
+        .limit(limit)
+    )
+
+    object_ids = []
+    for stats in ranked:
+        try:
+            object_ids.append(ObjectId(stats["_id"]))
+        except (InvalidId, TypeError):
+            continue
+    users = {
+        str(user["_id"]): user
+        for user in db.users.find({"_id": {"$in": object_ids}}, {"name": 1, "email": 1})
+    }
+
+    customers = []
+    for stats in ranked:
+        user = users.get(stats["_id"]) or {}
+        customers.append(
+            {
+                "user_id": stats["_id"],
+                "name": user.get("name"),
+                "email": user.get("email"),
+                "orders_count": stats.get("orders_count", 0),
+                "total_spent": round(stats.get("total_spent", 0.0), 2),
+                "cancelled_count": stats.get("cancelled_count", 0),
+                "last_order_at": stats.get("lastOrderAt"),
+            }
+        )
+    return customers
+
+
+def reconcile_customer_stats(db) -> dict[str, int]:
+    """Rebuild every customer's aggregates from the orders collection.
+
+    The aggregation merges fresh totals into ``customer_stats`` server-side;
+    documents it did not touch belong to customers without orders and are
+    removed. Concurrent order writes can still race with the rebuild; the
+    next run corrects them.
+    """
+
+    started = datetime.utcnow()
+    cancelled = {"$eq": [f"${STATUS_KEY_FIELD}", "cancelled"]}
+    db.orders.aggregate(
+        [
+            {"$match": {"userId": {"$nin": [None, ""]}}},
+            {
+                "$group": {
+                    "_id": "$userId",
+                    "orders_count": {"$sum": 1},
+                    "total_spent": {
+                        "$sum": {"$cond": [cancelled, 0, {"$ifNull": ["$total", 0]}]}
+                    },
+                    "cancelled_count": {"$sum": {"$cond": [cancelled, 1, 0]}},
+                    "lastOrderAt": {"$max": "$createdAt"},
+                }
+            },
+            {"$set": {"updatedAt": started, "reconciledAt": started}},
+            {
+                "$merge": {
+                    "into": COLLECTION,
+                    "on": "_id",
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+    )
+    # Entries bumped by an order write while this ran carry a newer updatedAt.
+    removed = db[COLLECTION].delete_many(
+        {
+            "updatedAt": {"$lt": started},
+            "$or": [{"reconciledAt": {"$lt": started}}, {"reconciledAt": {"$exists": False}}],
+        }
+    ).deleted_count
+    customers = db[COLLECTION].count_documents({})
+    return {"customers": customers, "removed": removed}
+
+
+def build_customer_stats_if_empty(db) -> None:
+    """First start after ``customer_stats`` was introduced: build it once."""
+
+    if db[COLLECTION].estimated_document_count() == 0 and db.orders.estimated_document_count():
+        reconcile_customer_stats(db)
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+
+    from config import Config
+
+    client = MongoClient(Config.MONGODB_URI)
+    result = reconcile_customer_stats(client[Config.DATABASE_NAME])
+    print(f"Reconciled stats for {result['customers']} customers, removed {result['removed']} stale entries")
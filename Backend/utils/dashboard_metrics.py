@@ -0,0 +1,147 @@
+"""Materialized admin dashboard counters.
+
+The dashboard summary is a single document in ``metrics`` (``_id``
+``"dashboard"``) holding ``total_users``, ``total_orders``,
+``active_products`` and ``total_revenue``. Order, user and product writes
+keep it current with ``$inc``, so the summary is one primary-key read no
+matter how many orders exist.
+
+Run ``python -m utils.dashboard_metrics`` nightly to recount everything,
+store the exact values and report any drift the increments accumulated.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from utils.order_status import REVENUE_STATUS_KEYS, STATUS_KEY_FIELD, is_revenue_status
+
+COLLECTION = "metrics"
+DASHBOARD_ID = "dashboard"
+COUNTERS = ("total_users", "total_orders", "active_products", "total_revenue")
+
+
+def is_active_product(product: dict[str, Any] | None) -> bool:
+    """Mirror of the dashboard's active product filter.
+
+    Visibility alone decides: stock changes with every order, and counting
+    hidden products that still have stock would need every reservation and
+    release to adjust the counter.
+    """
+
+    return bool(product) and product.get("is_active") is True
+
+
+def _amount(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def bump(db, **deltas: float) -> None:
+    """Atomically add ``deltas`` to the dashboard counters.
+
+    Best effort: a failed increment is logged and repaired by the next
+    recount instead of failing the write that triggered it.
+    """
+
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    try:
+        db[COLLECTION].update_one(
+            {"_id": DASHBOARD_ID},
+            {"$inc": deltas, "$set": {"updatedAt": datetime.utcnow()}},
+            upsert=True,
+        )
+    except Exception as exc:  # pragma: no cover - the recount repairs the miss
+        print(f"Warning: failed to update dashboard metrics: {exc}")
+
+
+def record_order_created(db, order: dict[str, Any]) -> None:
+    revenue = _amount(order.get("total")) if is_revenue_status(order.get("status")) else 0.0
+    bump(db, total_orders=1, total_revenue=revenue)
+
+
+def record_order_deleted(db, order: dict[str, Any]) -> None:
+    revenue = _amount(order.get("total")) if is_revenue_status(order.get("status")) else 0.0
+    bump(db, total_orders=-1, total_revenue=-revenue)
+
+
+def record_order_status_change(db, order: dict[str, Any], new_status: str) -> None:
+    before = is_revenue_status(order.get("status"))
+    after = is_revenue_status(new_status)
+    if before != after:
+        amount = _amount(order.get("total"))
+        bump(db, total_revenue=amount if after else -amount)
+
+
+def record_product_change(db, before: dict[str, Any] | None, after: dict[str, Any] | None) -> None:
+    """Count a product create (``before`` None), update or delete (``after`` None)."""
+
+    bump(db, active_products=int(is_active_product(after)) - int(is_active_product(before)))
+
+
+def compute_metrics(db) -> dict[str, Any]:
+    """Count every metric from scratch (revenue reads the ``status_key`` index)."""
+
+    revenue = list(
+        db.orders.aggregate(
+            [
+                {"$match": {STATUS_KEY_FIELD: {"$in": list(REVENUE_STATUS_KEYS)}}},
+                {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total", 0]}}}},
+            ]
+        )
+    )
+    return {
+        "total_users": db.users.count_documents({}),
+        "total_orders": db.orders.count_documents({}),
+        "active_products": db.products.count_documents({"is_active": True}),
+        "total_revenue": _amount(revenue[0]["total"]) if revenue else 0.0,
+    }
+
+
+def recompute_metrics(db) -> dict[str, Any]:
+    """Store exact counts and return them with the drift found in the old values."""
+
+    exact = compute_metrics(db)
+    stored = db[COLLECTION].find_one({"_id": DASHBOARD_ID}) or {}
+    drift = {
+        name: round(exact[name] - _amount(stored.get(name)), 2)
+        for name in COUNTERS
+        if round(exact[name] - _amount(stored.get(name)), 2)
+    }
+    now = datetime.utcnow()
+    db[COLLECTION].update_one(
+        {"_id": DASHBOARD_ID},
+        {"$set": {**exact, "updatedAt": now, "recomputedAt": now}},
+        upsert=True,
+    )
+    return {**exact, "drift": drift}
+
+
+def get_metrics(db) -> dict[str, Any]:
+    """Return the materialized counters, building them on first use."""
+
+    stored = db[COLLECTION].find_one({"_id": DASHBOARD_ID})
+    if stored is None:
+        stored = recompute_metrics(db)
+    return {
+        "total_revenue": round(_amount(stored.get("total_revenue")), 2),
+        "total_orders": int(stored.get("total_orders") or 0),
+        "total_users": int(stored.get("total_users") or 0),
+        "active_products": int(stored.get("active_products") or 0),
+    }
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+
+    from config import Config
+
+    client = MongoClient(Config.MONGODB_URI)
+    result = recompute_metrics(client[Config.DATABASE_NAME])
+    drift = result.pop("drift")
+    print(f"Dashboard metrics: {result}")
+    print(f"Drift corrected: {drift}" if drift else "No drift")
@@ -10,25 +10,19 @@ from bson import ObjectId
 
 
 def serialize_doc(document: Any):
-    """Convert MongoDB ObjectId fields to strings for JSON serialization."""
+    """Convert MongoDB ObjectId fields to strings for JSON serialization.
+
+    Responses passed to ``jsonify`` do not need this: the app's JSON provider
+    encodes these types directly. It remains for callers that build JSON
+    themselves.
+    """
     if document is None:
         return None
 
     if isinstance(document, list):
-        return [serialize_doc(item) for item in document]
-
-    serialized = {}
-    for key, value in document.items():
-        if isinstance(value, ObjectId):
-            serialized[key] = str(value)
-        elif isinstance(value, datetime):
-            serialized[key] = value.isoformat()
-        elif isinstance(value, list):
-            serialized[key] = [serialize_doc(item) for item in value]
-        elif isinstance(value, dict):
-            serialized[key] = serialize_doc(value)
-        else:
-            serialized[key] = value
+        return [_serialize_value(item) for item in document]
+
+    serialized = {key: _serialize_value(value) for key, value in document.items()}
 
     if "_id" in document:
         serialized["_id"] = str(document["_id"])
@@ -36,6 +30,16 @@ def serialize_doc(document: Any):
     return serialized
 
 
+def _serialize_value(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return serialize_doc(value)
+    return value
+
+
 def slugify(value: str) -> str:
     """Generate a URL-friendly slug from the given value."""
 
@@ -0,0 +1,392 @@
+"""Declarative registry of the MongoDB indexes the API relies on.
+
+``INDEXES`` lists every index once per route (or job) that needs it, so
+the reason for each index sits next to its definition. At startup the
+indexes the API cannot be correct without (text indexes, which ``$text``
+queries require, and unique indexes, which must exist before duplicates
+are written) are built before serving; :func:`start_background_reconcile`
+then builds the rest on a daemon thread, keeping those builds out of the
+request path; requests served before they finish simply use a slower plan.
+
+An index that exists under the registered key pattern but with a
+different ``unique`` or TTL setting is reported as mismatched rather than
+present; it has to be dropped before the registered one can be built.
+
+Report blocking, missing, mismatched, unused and oversized indexes (exits
+non-zero while a unique index is not enforced) with::
+
+    python -m utils.indexes
+    python -m utils.indexes --apply   # also build the missing ones
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+from utils.order_status import STATUS_KEY_FIELD
+from utils.search import (
+    PRODUCT_SEARCH_INDEX_KEYS,
+    PRODUCT_SEARCH_INDEX_NAME,
+    PRODUCT_SEARCH_INDEX_WEIGHTS,
+    SEARCH_KEYS_FIELD,
+)
+
+# Indexes smaller than this are never reported as oversized.
+MIN_REPORTED_SIZE = 1024 * 1024
+# Options a live index must share with its registered spec to count as present.
+COMPARED_OPTIONS = ("unique", "expireAfterSeconds")
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: tuple[tuple[str, Any], ...]
+    name: str | None = None
+    options: dict[str, Any] = field(default_factory=dict, compare=False, hash=False)
+
+    @property
+    def label(self) -> str:
+        return f"{self.collection}.{self.name or _default_name(self.keys)}"
+
+    @property
+    def required(self) -> bool:
+        """Whether the API is incorrect (not just slower) without this index."""
+
+        return bool(self.options.get("unique")) or any(direction == TEXT for _, direction in self.keys)
+
+    def matching(self, existing: dict[str, dict[str, Any]]) -> str | None:
+        """Name of the index in ``existing`` (``index_information()``) for this spec.
+
+        Matched on the key pattern so indexes created earlier under another
+        name still count; text indexes are matched by name.
+        """
+
+        if self.name and self.name in existing:
+            return self.name
+        keys = _normalise_keys(self.keys)
+        for name, info in existing.items():
+            if _normalise_keys(info.get("key", ())) == keys:
+                return name
+        return None
+
+    def differences(self, info: dict[str, Any]) -> dict[str, dict[str, Any]]:
+        """Compared options on which the live index ``info`` differs from this spec."""
+
+        return {
+            option: {"expected": self.options.get(option), "actual": info.get(option)}
+            for option in COMPARED_OPTIONS
+            if _option_value(option, self.options.get(option)) != _option_value(option, info.get(option))
+        }
+
+    def present_in(self, existing: dict[str, dict[str, Any]]) -> bool:
+        """Whether ``existing`` has this index with the registered options."""
+
+        name = self.matching(existing)
+        return name is not None and not self.differences(existing[name])
+
+
+def _index(collection: str, *keys: tuple[str, Any], name: str | None = None, **options: Any) -> IndexSpec:
+    return IndexSpec(collection, tuple(keys), name, options)
+
+
+def _default_name(keys: Iterable[tuple[str, Any]]) -> str:
+    return "_".join(f"{field_name}_{direction}" for field_name, direction in keys)
+
+
+def _option_value(option: str, value: Any) -> Any:
+    if option == "unique":
+        return bool(value)
+    return int(value) if value is not None else None
+
+
+def _normalise_keys(keys: Iterable[tuple[str, Any]]) -> tuple[tuple[str, Any], ...]:
+    return tuple(
+        (field_name, int(direction) if isinstance(direction, float) else direction)
+        for field_name, direction in keys
+    )
+
+
+USERS_EMAIL = _index("users", ("email", ASCENDING), unique=True)
+USERS_CREATED = _index("users", ("createdAt", DESCENDING))
+USERS_SEARCH = _index("users", (SEARCH_KEYS_FIELD, ASCENDING), name="user_search_keys")
+PRODUCTS_SEARCH = _index("products", (SEARCH_KEYS_FIELD, ASCENDING), name="product_search_keys")
+ORDERS_SEARCH = _index("orders", (SEARCH_KEYS_FIELD, ASCENDING), name="order_search_keys")
+ORDERS_ORDER_ID = _index("orders", ("orderId", ASCENDING), unique=True)
+ORDERS_CREATED = _index("orders", ("createdAt", DESCENDING), ("_id", DESCENDING))
+
+
+def _catalogue_sort_indexes(*prefix: tuple[str, Any]) -> tuple[IndexSpec, ...]:
+    # Keyset pages sort on (field, _id) in either direction; one index per
+    # field serves both because MongoDB can walk it backwards.
+    return tuple(
+        _index("products", *prefix, (sort_field, ASCENDING), ("_id", ASCENDING))
+        for sort_field in ("createdAt", "price", "name")
+    )
+
+
+INDEXES: dict[str, tuple[IndexSpec, ...]] = {
+    "POST /api/auth/register, /api/auth/login": (USERS_EMAIL,),
+    "POST /api/auth/verify-otp, /api/auth/resend-otp": (
+        _index("email_verification", ("expiresAt", ASCENDING), expireAfterSeconds=0),
+        _index("email_verification", ("email", ASCENDING), unique=True),
+    ),
+    "GET /api/products": (
+        _index(
+            "products",
+            *PRODUCT_SEARCH_INDEX_KEYS,
+            name=PRODUCT_SEARCH_INDEX_NAME,
+            weights=PRODUCT_SEARCH_INDEX_WEIGHTS,
+            default_language="none",
+        ),
+        *_catalogue_sort_indexes(("is_active", ASCENDING)),
+        *_catalogue_sort_indexes(("is_active", ASCENDING), ("category", ASCENDING)),
+    ),
+    # Uniqueness is checked by the route before writing; the index only
+    # keeps that lookup cheap.
+    "POST/PATCH /api/admin/products (slug availability check)": (
+        _index("products", ("slug", ASCENDING)),
+    ),
+    "GET/POST/PUT/DELETE /api/cart": (
+        _index("carts", ("userId", ASCENDING), unique=True),
+    ),
+    "POST /api/orders, GET /api/admin/orders/<order_id>": (ORDERS_ORDER_ID,),
+    "GET /api/orders": (
+        _index("orders", ("userId", ASCENDING), ("createdAt", DESCENDING)),
+    ),
+    "GET /api/admin/products": (
+        PRODUCTS_SEARCH,
+        _index("products", ("updatedAt", DESCENDING), ("_id", DESCENDING)),
+        _index("products", ("category", ASCENDING), ("updatedAt", DESCENDING), ("_id", DESCENDING)),
+    ),
+    "GET /api/admin/users": (USERS_SEARCH, USERS_CREATED),
+    "GET /api/admin/orders": (
+        ORDERS_SEARCH,
+        ORDERS_CREATED,
+        _index("orders", (STATUS_KEY_FIELD, ASCENDING), ("createdAt", DESCENDING)),
+    ),
+    "GET /api/admin/dashboard/recent-orders, /recent-users": (ORDERS_CREATED, USERS_CREATED),
+    "GET /api/admin/customers/top": (
+        _index("customer_stats", ("total_spent", DESCENDING), ("_id", DESCENDING)),
+        _index("customer_stats", ("orders_count", DESCENDING), ("_id", DESCENDING)),
+    ),
+}
+
+
+def registered_indexes(collections: Iterable[str] | None = None) -> list[IndexSpec]:
+    """Every registered index once, optionally limited to ``collections``."""
+
+    wanted = set(collections) if collections is not None else None
+    specs: list[IndexSpec] = []
+    for group in INDEXES.values():
+        for spec in group:
+            if spec not in specs and (wanted is None or spec.collection in wanted):
+                specs.append(spec)
+    return specs
+
+
+def routes_for(spec: IndexSpec) -> list[str]:
+    return [route for route, group in INDEXES.items() if spec in group]
+
+
+def _live_indexes(db, specs: Iterable[IndexSpec]) -> dict[str, dict[str, dict[str, Any]]]:
+    return {
+        collection: db[collection].index_information()
+        for collection in sorted({spec.collection for spec in specs})
+    }
+
+
+def missing_indexes(db, specs: Iterable[IndexSpec] | None = None) -> list[IndexSpec]:
+    """Registered indexes with no live index of the same name or key pattern."""
+
+    specs = list(specs) if specs is not None else registered_indexes()
+    existing = _live_indexes(db, specs)
+    return [spec for spec in specs if spec.matching(existing[spec.collection]) is None]
+
+
+def mismatched_indexes(db, specs: Iterable[IndexSpec] | None = None) -> list[dict[str, Any]]:
+    """Live indexes matching a registered key pattern but not its options."""
+
+    specs = list(specs) if specs is not None else registered_indexes()
+    existing = _live_indexes(db, specs)
+    mismatched = []
+    for spec in specs:
+        name = spec.matching(existing[spec.collection])
+        if name is None:
+            continue
+        differences = spec.differences(existing[spec.collection][name])
+        if differences:
+            mismatched.append(
+                {"index": f"{spec.collection}.{name}", "spec": spec, "differences": differences}
+            )
+    return mismatched
+
+
+def blocking_indexes(db, specs: Iterable[IndexSpec] | None = None) -> list[dict[str, Any]]:
+    """Unique indexes that are missing or not unique, so duplicates can be written.
+
+    Typically a build that failed over legacy duplicates (for example two
+    orders sharing an ``orderId``); the duplicates have to be resolved and
+    the index built before the guarantee holds.
+    """
+
+    specs = [spec for spec in (specs if specs is not None else registered_indexes()) if spec.options.get("unique")]
+    existing = _live_indexes(db, specs)
+    blocking = []
+    for spec in specs:
+        name = spec.matching(existing[spec.collection])
+        if name is None:
+            blocking.append({"index": spec.label, "reason": "missing", "routes": routes_for(spec)})
+        elif spec.differences(existing[spec.collection][name]):
+            blocking.append(
+                {"index": f"{spec.collection}.{name}", "reason": "not unique", "routes": routes_for(spec)}
+            )
+    return blocking
+
+
+def reconcile_indexes(
+    db, collections: Iterable[str] | None = None, required: bool | None = None
+) -> dict[str, list[str]]:
+    """Build the registered indexes that do not exist yet.
+
+    ``required`` limits the run to indexes whose :attr:`IndexSpec.required`
+    equals it. A failing build (for example a unique index over duplicate
+    data) is reported and does not stop the others. Mismatched indexes are
+    reported but left alone; they need to be dropped by hand. Returns the
+    labels of the indexes created, of those that failed, of the mismatched
+    ones and of the unique indexes still not enforced (see
+    :func:`blocking_indexes`).
+    """
+
+    specs = [
+        spec
+        for spec in registered_indexes(collections)
+        if required is None or spec.required == required
+    ]
+    created: list[str] = []
+    failed: list[str] = []
+    for spec in missing_indexes(db, specs):
+        options = dict(spec.options)
+        if spec.name:
+            options["name"] = spec.name
+        try:
+            db[spec.collection].create_index(list(spec.keys), **options)
+            created.append(spec.label)
+        except Exception as exc:  # pragma: no cover - reported, others still built
+            print(f"Warning: failed to create index {spec.label}: {exc}")
+            failed.append(spec.label)
+
+    mismatched: list[str] = []
+    for entry in mismatched_indexes(db, specs):
+        details = ", ".join(
+            f"{option}={values['actual']!r} (expected {values['expected']!r})"
+            for option, values in entry["differences"].items()
+        )
+        print(f"Warning: index {entry['index']} does not match {entry['spec'].label}: {details}")
+        mismatched.append(entry["index"])
+
+    blocking = [entry["index"] for entry in blocking_indexes(db, specs)]
+    if blocking:
+        print(f"Error: uniqueness is not enforced until these indexes are fixed: {', '.join(blocking)}")
+    return {"created": created, "failed": failed, "mismatched": mismatched, "blocking": blocking}
+
+
+def start_background_reconcile(db, required: bool | None = None) -> threading.Thread:
+    """Run :func:`reconcile_indexes` on a daemon thread."""
+
+    def run() -> None:
+        try:
+            result = reconcile_indexes(db, required=required)
+        except Exception as exc:  # pragma: no cover - log and give up
+            print(f"Warning: index reconciliation failed: {exc}")
+            return
+        if result["created"]:
+            print(f"Created indexes: {', '.join(result['created'])}")
+
+    thread = threading.Thread(target=run, name="index-reconcile", daemon=True)
+    thread.start()
+    return thread
+
+
+def index_report(db, oversized_ratio: float = 0.5) -> dict[str, list[dict[str, Any]]]:
+    """Compare the live indexes with the registry.
+
+    ``blocking`` lists unique indexes that are missing or not unique (see
+    :func:`blocking_indexes`); they are also reported under ``missing`` or
+    ``mismatched``. ``unused`` lists indexes with no recorded access since the server last
+    started (``$indexStats`` resets on restart); ``oversized`` lists indexes
+    larger than ``oversized_ratio`` of their collection's data.
+    """
+
+    registered = registered_indexes()
+    report: dict[str, list[dict[str, Any]]] = {
+        "blocking": blocking_indexes(db, registered),
+        "missing": [
+            {"index": spec.label, "routes": routes_for(spec)} for spec in missing_indexes(db, registered)
+        ],
+        "mismatched": [
+            {"index": entry["index"], "expected": entry["spec"].label, "differences": entry["differences"]}
+            for entry in mismatched_indexes(db, registered)
+        ],
+        "unused": [],
+        "unregistered": [],
+        "oversized": [],
+    }
+
+    for collection in sorted({spec.collection for spec in registered}):
+        existing = db[collection].index_information()
+        specs = [spec for spec in registered if spec.collection == collection]
+        for name, info in existing.items():
+            if name != "_id_" and not any(spec.matching({name: info}) for spec in specs):
+                report["unregistered"].append({"index": f"{collection}.{name}"})
+
+        for stats in db[collection].aggregate([{"$indexStats": {}}]):
+            accesses = stats.get("accesses") or {}
+            if stats["name"] != "_id_" and not accesses.get("ops"):
+                report["unused"].append(
+                    {"index": f"{collection}.{stats['name']}", "since": accesses.get("since")}
+                )
+
+        storage = next(db[collection].aggregate([{"$collStats": {"storageStats": {}}}]), {})
+        storage_stats = storage.get("storageStats") or {}
+        data_size = storage_stats.get("size") or 0
+        for name, size in (storage_stats.get("indexSizes") or {}).items():
+            if size >= MIN_REPORTED_SIZE and size > data_size * oversized_ratio:
+                report["oversized"].append(
+                    {"index": f"{collection}.{name}", "size": size, "data_size": data_size}
+                )
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from pymongo import MongoClient
+
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Report blocking, missing, mismatched, unused and oversized indexes")
+    parser.add_argument("--apply", action="store_true", help="build missing indexes")
+    parser.add_argument(
+        "--oversized-ratio",
+        type=float,
+        default=0.5,
+        help="flag indexes larger than this fraction of the collection data",
+    )
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGODB_URI)
+    database = client[Config.DATABASE_NAME]
+    if args.apply:
+        result = reconcile_indexes(database)
+        print(f"Created {len(result['created'])} indexes, {len(result['failed'])} failed")
+
+    report = index_report(database, args.oversized_ratio)
+    for section, entries in report.items():
+        print(f"{section}: {len(entries)}")
+        for entry in entries:
+            details = ", ".join(f"{key}={value}" for key, value in entry.items() if key != "index")
+            print(f"  {entry['index']}" + (f" ({details})" if details else ""))
+    raise SystemExit(1 if report["blocking"] else 0)
@@ -0,0 +1,230 @@
+"""Per-request MongoDB command instrumentation.
+
+A pymongo ``CommandListener`` attributes every command (count, server
+time, reply size) to the Flask request running on the same thread through
+a context variable. After each request the totals are returned in
+``X-DB-*`` response headers, queries repeated with the same shape are
+reported as likely N+1 patterns, and routes decorated with
+:func:`db_budget` are checked against their round-trip budget.
+
+Commands issued from background threads (mail workers, cache refreshes,
+index builds) run outside any request and are not counted, nor are those a
+request hook runs inside :func:`untracked` (e.g. storing a profile).
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Iterator
+
+import bson
+from flask import current_app, g, request
+from pymongo import monitoring
+
+# Commands that belong to an operation already counted or to the driver.
+UNSHAPED_COMMANDS = {"getMore", "killCursors", "endSessions", "hello", "isMaster", "ismaster", "ping"}
+# Where each command keeps its filter.
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+class DbBudgetExceeded(AssertionError):
+    """Raised when a route exceeds its budget and budgets are strict."""
+
+
+@dataclass
+class RequestStats:
+    route: str
+    commands: int = 0
+    failed: int = 0
+    duration_ms: float = 0.0
+    reply_bytes: int = 0
+    by_command: Counter = field(default_factory=Counter)
+    shapes: Counter = field(default_factory=Counter)
+    # request_id -> shape of commands that have started but not finished
+    pending: dict[int, str | None] = field(default_factory=dict)
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+_current: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "db_request_stats", default=None
+)
+
+
+def _shape_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _shape_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], dict):
+        return [_shape_value(value[0])]
+    return "?"
+
+
+def query_shape(command_name: str, command: dict[str, Any]) -> str | None:
+    """Describe a command by collection and filter structure, without values.
+
+    Two ``find`` calls for different ids share a shape; that is what makes a
+    loop of single-document lookups stand out.
+    """
+
+    if command_name in UNSHAPED_COMMANDS:
+        return None
+    collection = command.get(command_name)
+    if command_name in _FILTER_FIELDS:
+        detail = _shape_value(command.get(_FILTER_FIELDS[command_name]) or {})
+    elif command_name == "update":
+        detail = [_shape_value(update.get("q") or {}) for update in command.get("updates", [])[:1]]
+    elif command_name == "delete":
+        detail = [_shape_value(delete.get("q") or {}) for delete in command.get("deletes", [])[:1]]
+    elif command_name == "aggregate":
+        detail = [
+            {name: _shape_value(spec) if name == "$match" else "?" for name, spec in stage.items()}
+            for stage in command.get("pipeline", [])
+        ]
+    else:
+        detail = None
+    return f"{command_name} {collection} {json.dumps(detail, sort_keys=True)}"
+
+
+class CommandTracker(monitoring.CommandListener):
+    """Command listener feeding the stats of the request on the current thread."""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        stats = _current.get()
+        if stats is None:
+            return
+        try:
+            shape = query_shape(event.command_name, event.command)
+        except Exception:  # pragma: no cover - never break the command
+            shape = None
+        stats.pending[event.request_id] = shape
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        stats = _current.get()
+        if stats is None or event.request_id not in stats.pending:
+            return
+        try:
+            size = len(bson.encode(event.reply))
+        except Exception:  # pragma: no cover - size is best effort
+            size = 0
+        self._finish(stats, event, reply_bytes=size)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        stats = _current.get()
+        if stats is None or event.request_id not in stats.pending:
+            return
+        stats.failed += 1
+        self._finish(stats, event, reply_bytes=0)
+
+    @staticmethod
+    def _finish(stats: RequestStats, event: Any, reply_bytes: int) -> None:
+        shape = stats.pending.pop(event.request_id)
+        stats.commands += 1
+        stats.duration_ms += event.duration_micros / 1000
+        stats.reply_bytes += reply_bytes
+        stats.by_command[event.command_name] += 1
+        if shape is not None:
+            stats.shapes[shape] += 1
+
+
+command_tracker = CommandTracker()
+
+
+def current_stats() -> RequestStats | None:
+    return _current.get()
+
+
+@contextmanager
+def untracked() -> Iterator[None]:
+    """Leave commands run in this block out of the current request's stats."""
+
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def db_budget(max_commands: int) -> Callable:
+    """Declare the most MongoDB round trips a route may make per request.
+
+    Place it between ``@app.route`` and the auth decorators so the budget
+    lands on the registered view function.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any):
+            return fn(*args, **kwargs)
+
+        wrapper.db_budget = max_commands
+        return wrapper
+
+    return decorator
+
+
+def init_app(
+    app,
+    n_plus_one_threshold: int = 3,
+    log_requests: bool = False,
+    strict_budgets: bool = False,
+) -> None:
+    """Collect per-request stats for ``app``.
+
+    ``strict_budgets`` (always on when ``app.testing``) turns an exceeded
+    :func:`db_budget` into :class:`DbBudgetExceeded` so test suites fail.
+    """
+
+    @app.before_request
+    def start_db_stats():
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        g.db_stats_token = _current.set(RequestStats(route=f"{request.method} {route}"))
+        g.db_stats_started = time.perf_counter()
+
+    @app.after_request
+    def report_db_stats(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+
+        repeated = stats.repeated(n_plus_one_threshold)
+        response.headers["X-DB-Commands"] = str(stats.commands)
+        response.headers["X-DB-Time-Ms"] = f"{stats.duration_ms:.1f}"
+        response.headers["X-DB-Bytes"] = str(stats.reply_bytes)
+        response.headers["X-DB-Repeated"] = str(sum(repeated.values()))
+
+        if log_requests:
+            elapsed_ms = (time.perf_counter() - g.db_stats_started) * 1000
+            commands = ", ".join(f"{name}={count}" for name, count in sorted(stats.by_command.items()))
+            print(
+                f"db: {stats.route} {response.status_code} commands={stats.commands} "
+                f"db_ms={stats.duration_ms:.1f} bytes={stats.reply_bytes} "
+                f"request_ms={elapsed_ms:.1f} [{commands}]"
+            )
+        for shape, count in repeated.items():
+            print(f"Warning: possible N+1 in {stats.route}: {count} x {shape}")
+
+        view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+        budget = getattr(view, "db_budget", None)
+        if budget is not None and stats.commands > budget:
+            message = f"{stats.route} made {stats.commands} MongoDB round trips (budget {budget})"
+            if strict_budgets or current_app.testing:
+                raise DbBudgetExceeded(message)
+            print(f"Warning: {message}")
+        return response
+
+    @app.teardown_request
+    def clear_db_stats(exc=None):  # pylint: disable=unused-argument
+        token = g.pop("db_stats_token", None)
+        if token is not None:
+            _current.reset(token)
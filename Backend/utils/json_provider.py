@@ -0,0 +1,36 @@
+"""JSON provider that understands MongoDB documents.
+
+Routes can hand raw documents to ``jsonify``: ObjectId, datetime and decimal
+values are converted while the response is encoded, so documents are not
+copied and walked once more beforehand. The output matches what
+``serialize_doc`` produces (ObjectIds as strings, ISO 8601 datetimes).
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import DefaultJSONProvider
+
+
+def encode_mongo_value(value: Any) -> Any:
+    """Return a JSON-compatible value for BSON types ``json`` cannot encode."""
+
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, Decimal):
+        return float(value)
+    return DefaultJSONProvider.default(value)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding BSON values in the same pass as the rest."""
+
+    default = staticmethod(encode_mongo_value)
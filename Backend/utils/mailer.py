@@ -0,0 +1,233 @@
+"""Asynchronous outbound mail dispatch.
+
+Request handlers enqueue messages and return immediately. A small pool of
+worker threads drains the queue in batches over long-lived, authenticated
+SMTP sessions, retries transient failures with exponential backoff and hands
+messages that keep failing to a dead-letter callback.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from email.message import Message
+import os
+import queue
+import smtplib
+import ssl
+import threading
+from typing import Any, Callable
+
+
+class MailQueueFull(RuntimeError):
+    """Raised when the outbound queue is at capacity."""
+
+
+@dataclass
+class OutboundMail:
+    recipient: str
+    message: Message
+    attempts: int = 0
+    last_error: str | None = None
+
+
+class MailDispatcher:
+    """Bounded in-process mail queue served by SMTP worker threads."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str | None,
+        password: str | None,
+        from_email: str | None,
+        use_tls: bool = True,
+        workers: int = 2,
+        queue_size: int = 1000,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        idle_timeout: float = 30.0,
+        timeout: float = 10.0,
+        dead_letter: Callable[[OutboundMail], None] | None = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.from_email = from_email
+        self.use_tls = use_tls
+        self.workers = max(int(workers), 1)
+        self.batch_size = max(int(batch_size), 1)
+        self.max_attempts = max(int(max_attempts), 1)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.dead_letter = dead_letter
+        self._queue: queue.Queue[OutboundMail] = queue.Queue(maxsize=max(int(queue_size), 1))
+        self._lock = threading.Lock()
+        self._started_pid: int | None = None
+        self._counters = {"enqueued": 0, "sent": 0, "retried": 0, "dead_lettered": 0, "rejected": 0}
+
+    @classmethod
+    def from_config(cls, config, **overrides: Any) -> "MailDispatcher":
+        options = {
+            "host": config.SMTP_HOST,
+            "port": config.SMTP_PORT,
+            "username": config.SMTP_USERNAME,
+            "password": config.SMTP_PASSWORD,
+            "from_email": config.SMTP_FROM_EMAIL,
+            "use_tls": config.SMTP_USE_TLS,
+            "workers": config.MAIL_WORKERS,
+            "queue_size": config.MAIL_QUEUE_SIZE,
+            "batch_size": config.MAIL_BATCH_SIZE,
+            "max_attempts": config.MAIL_MAX_ATTEMPTS,
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    # ------------------------------------------------------------- producers
+    def send(self, recipient: str, message: Message) -> None:
+        """Queue ``message`` for delivery; raises :class:`MailQueueFull` when saturated."""
+
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(OutboundMail(recipient=recipient, message=message))
+        except queue.Full as exc:
+            self._count("rejected")
+            raise MailQueueFull("Outbound mail queue is full") from exc
+        self._count("enqueued")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._counters, "queue_depth": self._queue.qsize()}
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def _ensure_workers(self) -> None:
+        # Threads do not survive a fork, so each worker process starts its own.
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            for index in range(self.workers):
+                threading.Thread(
+                    target=self._run_worker, name=f"mail-worker-{index}", daemon=True
+                ).start()
+            self._started_pid = os.getpid()
+
+    # --------------------------------------------------------------- workers
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls(context=ssl.create_default_context())
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except BaseException:
+            # Do not leak the socket of a session that never became usable.
+            server.close()
+            raise
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP | None) -> None:
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _run_worker(self) -> None:
+        server: smtplib.SMTP | None = None
+        while True:
+            try:
+                first = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                # Release idle sessions rather than let the server drop them.
+                self._close(server)
+                server = None
+                continue
+
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for mail in batch:
+                try:
+                    server = self._deliver(server, mail)
+                except Exception as exc:  # pragma: no cover - never kill the worker
+                    print(f"Warning: mail worker failed on message for {mail.recipient}: {exc}")
+                    self._close(server)
+                    server = None
+                finally:
+                    self._queue.task_done()
+
+    def _deliver(self, server: smtplib.SMTP | None, mail: OutboundMail) -> smtplib.SMTP | None:
+        mail.attempts += 1
+        try:
+            for reconnect in (False, True):
+                if server is None:
+                    server = self._connect()
+                try:
+                    server.sendmail(self.from_email, [mail.recipient], mail.message.as_string())
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    # A pooled session went stale; reconnect once for free.
+                    server = None
+                    if reconnect:
+                        raise
+        except smtplib.SMTPRecipientsRefused as exc:
+            mail.last_error = str(exc)
+            self._dead_letter(mail)
+            return server
+        except (smtplib.SMTPException, OSError) as exc:
+            mail.last_error = str(exc)
+            self._close(server)
+            self._schedule_retry(mail)
+            return None
+        except Exception as exc:
+            # Not a transport problem (e.g. a message that cannot be encoded),
+            # so retrying will not help. The session may be mid-command.
+            mail.last_error = f"{type(exc).__name__}: {exc}"
+            self._close(server)
+            self._dead_letter(mail)
+            return None
+
+        self._count("sent")
+        return server
+
+    def _schedule_retry(self, mail: OutboundMail) -> None:
+        if mail.attempts >= self.max_attempts:
+            self._dead_letter(mail)
+            return
+
+        delay = min(self.backoff_base * 2 ** (mail.attempts - 1), self.backoff_max)
+        self._count("retried")
+
+        def requeue() -> None:
+            try:
+                self._queue.put_nowait(mail)
+            except queue.Full:
+                mail.last_error = "Outbound mail queue is full"
+                self._dead_letter(mail)
+
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        timer.start()
+
+    def _dead_letter(self, mail: OutboundMail) -> None:
+        self._count("dead_lettered")
+        if self.dead_letter is None:
+            return
+        try:
+            self.dead_letter(mail)
+        except Exception as exc:  # pragma: no cover - never kill the worker
+            print(f"Warning: failed to record dead-lettered mail for {mail.recipient}: {exc}")
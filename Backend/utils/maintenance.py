@@ -0,0 +1,118 @@
+"""One-off maintenance jobs run off the request path.
+
+Backfills, migrations and first-time rollup builds must not run at import
+in every worker: a pre-forking server starts several at once, and none of
+them can serve until the work finishes. :func:`start_maintenance` runs the
+jobs one after another on a daemon thread instead, and a lease document in
+``maintenance_leases`` lets a single process run a given job at a time;
+the others skip it. Jobs must be idempotent, since a lease that outlives
+``LEASE_SECONDS`` (a crashed worker) is taken over.
+
+Run every startup job in the foreground with::
+
+    python -m utils.maintenance
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Iterable
+
+from pymongo.errors import DuplicateKeyError
+
+from utils.customer_stats import build_customer_stats_if_empty
+from utils.order_status import migrate_status_keys
+from utils.revenue_rollup import build_revenue_daily_if_empty
+from utils.search import (
+    backfill_admin_search_keys,
+    backfill_product_search_fields,
+    migrate_order_number_keys,
+)
+
+COLLECTION = "maintenance_leases"
+LEASE_SECONDS = 15 * 60
+
+Job = tuple[str, Callable[[object], object]]
+
+# Run in this order at startup. The rollups match on status_key, so the
+# status key migration comes before them.
+STARTUP_JOBS: list[Job] = [
+    ("product_search_fields", backfill_product_search_fields),
+    ("admin_search_keys", backfill_admin_search_keys),
+    ("order_number_keys", migrate_order_number_keys),
+    ("status_keys", migrate_status_keys),
+    ("customer_stats", build_customer_stats_if_empty),
+    ("revenue_daily", build_revenue_daily_if_empty),
+]
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lease(db, name: str, owner: str, seconds: float = LEASE_SECONDS) -> bool:
+    """Take the lease for job ``name`` unless another owner holds a live one."""
+
+    now = datetime.utcnow()
+    try:
+        db[COLLECTION].find_one_and_update(
+            {"_id": name, "$or": [{"expiresAt": {"$lte": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expiresAt": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False  # held by someone else: the upsert tried to insert a second lease
+    return True
+
+
+def release_lease(db, name: str, owner: str) -> None:
+    db[COLLECTION].delete_one({"_id": name, "owner": owner})
+
+
+def run_jobs(db, jobs: Iterable[Job], owner: str | None = None) -> dict[str, str]:
+    """Run each ``(name, job)`` whose lease can be taken; returns every job's outcome."""
+
+    owner = owner or _owner()
+    outcomes: dict[str, str] = {}
+    jobs = list(jobs)
+    for name, job in jobs:
+        try:
+            if not acquire_lease(db, name, owner):
+                outcomes[name] = "skipped"
+                continue
+        except Exception as exc:  # pragma: no cover - database unavailable
+            print(f"Warning: maintenance jobs not started: {exc}")
+            outcomes.update({pending: "failed" for pending, _ in jobs if pending not in outcomes})
+            break
+        try:
+            job(db)
+            outcomes[name] = "done"
+        except Exception as exc:  # pragma: no cover - reported, later jobs still run
+            print(f"Warning: maintenance job {name} failed: {exc}")
+            outcomes[name] = "failed"
+        finally:
+            try:
+                release_lease(db, name, owner)
+            except Exception:  # pragma: no cover - the lease expires on its own
+                pass
+    return outcomes
+
+
+def start_maintenance(db, jobs: Iterable[Job]) -> threading.Thread:
+    """Run :func:`run_jobs` on a daemon thread."""
+
+    thread = threading.Thread(target=run_jobs, args=(db, list(jobs)), name="maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+
+    from config import Config
+
+    client = MongoClient(Config.MONGODB_URI)
+    for job_name, outcome in run_jobs(client[Config.DATABASE_NAME], STARTUP_JOBS).items():
+        print(f"{job_name}: {outcome}")
@@ -0,0 +1,263 @@
+"""Prometheus metrics for the API.
+
+Every request is counted by endpoint, method and status, timed in a
+latency histogram and tracked in an in-flight gauge. A pymongo pool
+listener follows the MongoDB connection pool, and a sampler thread in each
+process copies the mail queue, bcrypt pool, reCAPTCHA and product cache
+counters into metrics every ``METRICS_SAMPLE_INTERVAL`` seconds so the
+request path never reads them.
+
+Under a pre-forking server (gunicorn) set ``PROMETHEUS_MULTIPROC_DIR`` to an
+empty directory before the workers start: each process then writes its
+samples to memory-mapped files there and ``/metrics`` aggregates all of
+them. Call :func:`mark_process_dead` from the server's ``child_exit`` hook
+so live gauges drop the exited worker.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any
+
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter(
+    "medicare_http_requests_total",
+    "HTTP requests by endpoint, method and status code.",
+    ["endpoint", "method", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "medicare_http_request_duration_seconds",
+    "HTTP request latency by endpoint and method.",
+    ["endpoint", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "medicare_http_requests_in_flight",
+    "HTTP requests currently being served.",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+
+MONGO_CONNECTIONS = Gauge(
+    "medicare_mongo_pool_connections",
+    "Open MongoDB connections.",
+    multiprocess_mode="livesum",
+)
+MONGO_CHECKED_OUT = Gauge(
+    "medicare_mongo_pool_checked_out",
+    "MongoDB connections currently checked out of the pool.",
+    multiprocess_mode="livesum",
+)
+MONGO_CHECKOUT_FAILURES = Counter(
+    "medicare_mongo_pool_checkout_failures_total",
+    "Failed MongoDB connection checkouts by reason.",
+    ["reason"],
+)
+
+MAIL_QUEUE_DEPTH = Gauge(
+    "medicare_mail_queue_depth",
+    "Outbound mails waiting for a worker.",
+    multiprocess_mode="livesum",
+)
+MAIL_EVENTS = Counter(
+    "medicare_mail_events_total",
+    "Outbound mail events (enqueued, sent, retried, dead_lettered, rejected).",
+    ["event"],
+)
+BCRYPT_PENDING = Gauge(
+    "medicare_bcrypt_pending",
+    "Password hashes queued or running in the bcrypt pool.",
+    multiprocess_mode="livesum",
+)
+RECAPTCHA_EVENTS = Counter(
+    "medicare_recaptcha_events_total",
+    "reCAPTCHA verification outcomes.",
+    ["event"],
+)
+RECAPTCHA_BREAKER_OPEN = Gauge(
+    "medicare_recaptcha_breaker_open",
+    "1 while the reCAPTCHA circuit breaker is open or half open.",
+    multiprocess_mode="max",
+)
+PRODUCT_CACHE_EVENTS = Counter(
+    "medicare_product_cache_events_total",
+    "Product cache lookups and maintenance events.",
+    ["event"],
+)
+PRODUCT_CACHE_SIZE = Gauge(
+    "medicare_product_cache_entries",
+    "Entries held by the product cache.",
+    multiprocess_mode="livesum",
+)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener keeping the pool gauges current."""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        MONGO_CONNECTIONS.inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_CONNECTIONS.dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        MONGO_CHECKOUT_FAILURES.labels(str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        MONGO_CHECKED_OUT.inc()
+
+    def connection_checked_in(self, event):
+        MONGO_CHECKED_OUT.dec()
+
+
+pool_metrics = MongoPoolMetrics()
+
+
+class ComponentSampler:
+    """Copy in-process component counters into metrics on a timer.
+
+    Counters are advanced by the difference since the previous sample, so
+    they stay monotonic and sum correctly across processes.
+    """
+
+    def __init__(self, interval: float, *, mail=None, hasher=None, recaptcha=None, cache=None) -> None:
+        self.interval = interval
+        self.mail = mail
+        self.hasher = hasher
+        self.recaptcha = recaptcha
+        self.cache = cache
+        self._previous: dict[tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._started_pid: int | None = None
+
+    def ensure_started(self) -> None:
+        # Threads do not survive a fork, so each worker process starts its own.
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._previous = {}
+            threading.Thread(target=self._run, name="metrics-sampler", daemon=True).start()
+            self._started_pid = os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.sample()
+            except Exception as exc:  # pragma: no cover - keep sampling
+                print(f"Warning: failed to sample component metrics: {exc}")
+            time.sleep(self.interval)
+
+    def _advance(self, counter: Counter, source: str, values: dict[str, Any]) -> None:
+        # Only integer entries are event counts; timings and ratios are skipped.
+        for event, value in values.items():
+            if not isinstance(value, int) or isinstance(value, bool):
+                continue
+            previous = self._previous.get((source, event), 0)
+            if value > previous:
+                counter.labels(event).inc(value - previous)
+            self._previous[(source, event)] = value
+
+    def sample(self) -> None:
+        if self.mail is not None:
+            stats = self.mail.stats()
+            MAIL_QUEUE_DEPTH.set(stats.pop("queue_depth", 0))
+            self._advance(MAIL_EVENTS, "mail", stats)
+        if self.hasher is not None:
+            BCRYPT_PENDING.set(self.hasher.pending)
+        if self.recaptcha is not None:
+            stats = self.recaptcha.stats()
+            RECAPTCHA_BREAKER_OPEN.set(0 if stats.get("breaker_state") == "closed" else 1)
+            self._advance(RECAPTCHA_EVENTS, "recaptcha", stats)
+        if self.cache is not None:
+            stats = self.cache.stats()
+            PRODUCT_CACHE_SIZE.set(stats.get("size", 0))
+            self._advance(
+                PRODUCT_CACHE_EVENTS,
+                "cache",
+                {key: value for key, value in stats.items() if key not in {"size", "max_entries"}},
+            )
+
+
+def init_app(app, sampler: ComponentSampler | None = None) -> None:
+    """Record request metrics for ``app`` and run ``sampler`` in each process."""
+
+    @app.before_request
+    def start_request_metrics():
+        if sampler is not None:
+            sampler.ensure_started()
+        endpoint = request.endpoint or "unmatched"
+        g.metrics_endpoint = endpoint
+        g.metrics_started = time.perf_counter()
+        HTTP_IN_FLIGHT.labels(endpoint).inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        endpoint = g.get("metrics_endpoint")
+        if endpoint is not None:
+            HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+            HTTP_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - g.metrics_started)
+            g.metrics_recorded = True
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc=None):
+        endpoint = g.pop("metrics_endpoint", None)
+        if endpoint is None:
+            return
+        HTTP_IN_FLIGHT.labels(endpoint).dec()
+        # Unhandled exceptions skip after_request; count them as 500s.
+        if not g.pop("metrics_recorded", False):
+            HTTP_REQUESTS.labels(endpoint, request.method, "500").inc()
+            HTTP_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - g.metrics_started)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Exposition of every metric, merged across processes in multiprocess mode."""
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop an exited worker's live gauges (gunicorn ``child_exit`` hook)."""
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,49 @@
+"""Collision-free order number allocation.
+
+Order numbers look like ``ORD2026101800012345``: the UTC date followed by a
+global sequence. Each process reserves a block of sequence values from the
+``counters`` collection with one atomic ``$inc`` and then hands them out from
+memory, so the common case costs no database round trip and numbers remain
+unique across worker processes.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+import os
+import threading
+
+from pymongo import ReturnDocument
+
+
+class OrderNumberAllocator:
+    """Hand out unique, roughly time-ordered order numbers."""
+
+    def __init__(self, counters, block_size: int = 100, counter_id: str = "orderId", prefix: str = "ORD") -> None:
+        self._counters = counters
+        self.block_size = max(int(block_size), 1)
+        self.counter_id = counter_id
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._next = 1
+        self._end = 0
+        self._pid: int | None = None
+
+    def next(self) -> str:
+        with self._lock:
+            # A block reserved before a fork would be shared by every child.
+            if self._pid != os.getpid() or self._next > self._end:
+                self._reserve_block()
+            sequence = self._next
+            self._next += 1
+        return f"{self.prefix}{datetime.utcnow():%Y%m%d}{sequence:08d}"
+
+    def _reserve_block(self) -> None:
+        counter = self._counters.find_one_and_update(
+            {"_id": self.counter_id},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._end = int(counter["seq"])
+        self._next = self._end - self.block_size + 1
+        self._pid = os.getpid()
@@ -0,0 +1,116 @@
+"""Canonical order statuses.
+
+Orders store the display status (``"Pending"``, ``"Cancelled"``...) and an
+indexed lowercase ``status_key``. Every status write goes through
+:func:`status_fields` so the two never disagree, and every status filter
+matches ``status_key`` exactly instead of a case-insensitive regex or a
+``$toLower`` expression.
+
+Orders written before ``status_key`` existed are migrated in resumable
+batches (``python -m utils.order_status``); progress is kept in the
+``migrations`` collection so an interrupted run continues where it stopped.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from pymongo import ASCENDING, UpdateOne
+
+STATUS_KEY_FIELD = "status_key"
+STATUS_KEYS = ("pending", "confirmed", "delivered", "cancelled")
+REVENUE_STATUS_KEYS = ("confirmed", "delivered")
+MIGRATION_ID = "order_status_key"
+
+
+def status_key(status: Any) -> str:
+    """Lowercase key for ``status``; orders without a status are pending."""
+
+    return str(status or "").strip().lower() or "pending"
+
+
+def canonical_status(status: Any) -> str:
+    key = status_key(status)
+    return key[0].upper() + key[1:]
+
+
+def status_fields(status: Any) -> dict[str, str]:
+    """The ``status`` and ``status_key`` values to ``$set`` together."""
+
+    return {"status": canonical_status(status), STATUS_KEY_FIELD: status_key(status)}
+
+
+def is_revenue_status(status: Any) -> bool:
+    return status_key(status) in REVENUE_STATUS_KEYS
+
+
+def migrate_status_keys(db, batch_size: int = 1000) -> int:
+    """Backfill canonical ``status``/``status_key`` on existing orders.
+
+    Walks orders in ``_id`` order and records the last processed id after
+    each batch. Each update is conditional on the status it read, so a
+    concurrent status change is never overwritten. Returns the number of
+    orders updated by this run.
+    """
+
+    progress = db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    if progress.get("done"):
+        return 0
+
+    query: dict[str, Any] = {}
+    if progress.get("lastId") is not None:
+        query["_id"] = {"$gt": progress["lastId"]}
+
+    updated = 0
+    while True:
+        batch = list(
+            db.orders.find(query, {"status": 1, STATUS_KEY_FIELD: 1})
+            .sort("_id", ASCENDING)
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+
+        operations = []
+        for order in batch:
+            fields = status_fields(order.get("status"))
+            if order.get("status") == fields["status"] and order.get(STATUS_KEY_FIELD) == fields[STATUS_KEY_FIELD]:
+                continue
+            operations.append(
+                UpdateOne({"_id": order["_id"], "status": order.get("status")}, {"$set": fields})
+            )
+        modified = 0
+        if operations:
+            modified = db.orders.bulk_write(operations, ordered=False).modified_count
+        updated += modified
+
+        last_id = batch[-1]["_id"]
+        query["_id"] = {"$gt": last_id}
+        db.migrations.update_one(
+            {"_id": MIGRATION_ID},
+            {"$set": {"lastId": last_id, "updatedAt": datetime.utcnow()}, "$inc": {"migrated": modified}},
+            upsert=True,
+        )
+
+    db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"done": True, "completedAt": datetime.utcnow()}},
+        upsert=True,
+    )
+    return updated
+
+
+def count_by_status(db) -> dict[str, int]:
+    """Order count per status key, one index count each."""
+
+    return {key: db.orders.count_documents({STATUS_KEY_FIELD: key}) for key in STATUS_KEYS}
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+
+    from config import Config
+
+    client = MongoClient(Config.MONGODB_URI)
+    count = migrate_status_keys(client[Config.DATABASE_NAME])
+    print(f"Migrated status keys on {count} orders")
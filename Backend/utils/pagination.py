@@ -0,0 +1,120 @@
+"""Keyset (cursor) pagination helpers for list endpoints.
+
+Offset pagination (``skip``) makes MongoDB walk and discard every row before
+the requested page. Keyset pagination instead remembers the sort key and
+``_id`` of the last row returned and asks for rows strictly after it, so every
+page is a bounded index range scan regardless of depth.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from typing import Any
+
+from bson import json_util
+from pymongo import ASCENDING
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client supplies a malformed or mismatched cursor."""
+
+
+def encode_cursor(sort_field: str, sort_direction: int, document: dict[str, Any]) -> str:
+    """Encode the position just after ``document`` as an opaque cursor."""
+
+    payload = {
+        "f": sort_field,
+        "d": sort_direction,
+        "v": document.get(sort_field),
+        "i": document["_id"],
+    }
+    raw = json_util.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort_field: str, sort_direction: int) -> tuple[Any, Any]:
+    """Decode a cursor, returning the ``(sort value, _id)`` it points after."""
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError, json.JSONDecodeError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+
+    if not isinstance(payload, dict) or "i" not in payload:
+        raise InvalidCursorError("Invalid cursor")
+    if payload.get("f") != sort_field or payload.get("d") != sort_direction:
+        raise InvalidCursorError("Cursor does not match the requested sort order")
+    return payload.get("v"), payload["i"]
+
+
+def keyset_filter(sort_field: str, sort_direction: int, value: Any, last_id: Any) -> dict[str, Any]:
+    """Build the range filter selecting rows after ``(value, last_id)``.
+
+    MongoDB sorts null and missing values before every other value, but
+    ``$gt``/``$lt`` never match them, so those rows are selected explicitly:
+    they follow every valued row when descending and precede them when
+    ascending.
+    """
+
+    operator = "$gt" if sort_direction == ASCENDING else "$lt"
+    if sort_field == "_id":
+        return {"_id": {operator: last_id}}
+    if value is None:
+        clauses = [{sort_field: None, "_id": {operator: last_id}}]
+        if sort_direction == ASCENDING:
+            clauses.append({sort_field: {"$ne": None}})
+        return {"$or": clauses}
+    clauses = [
+        {sort_field: {operator: value}},
+        {sort_field: value, "_id": {operator: last_id}},
+    ]
+    if sort_direction != ASCENDING:
+        clauses.append({sort_field: None})
+    return {"$or": clauses}
+
+
+def fetch_keyset_page(
+    collection,
+    query: dict[str, Any],
+    sort_field: str,
+    sort_direction: int,
+    limit: int,
+    cursor: str | None,
+    projection: dict[str, Any] | None = None,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """Fetch one page using keyset pagination.
+
+    Returns the raw documents and the cursor for the following page, or
+    ``None`` when the last page has been reached. Raises
+    :class:`InvalidCursorError` for malformed cursors.
+    """
+
+    effective_query = query
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_field, sort_direction)
+        after = keyset_filter(sort_field, sort_direction, value, last_id)
+        effective_query = {"$and": [query, after]} if query else after
+
+    sort_spec = [(sort_field, sort_direction)]
+    if sort_field != "_id":
+        sort_spec.append(("_id", sort_direction))
+
+    documents = list(
+        collection.find(effective_query, projection).sort(sort_spec).limit(limit + 1)
+    )
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(sort_field, sort_direction, documents[-1])
+    return documents, next_cursor
+
+
+def build_cursor_response(items, next_cursor: str | None, per_page: int):
+    """Build the pagination payload returned in cursor mode."""
+    return {
+        "items": list(items),
+        "next_cursor": next_cursor,
+        "per_page": max(per_page, 1),
+    }
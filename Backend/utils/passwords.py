@@ -0,0 +1,218 @@
+"""Password hashing off the request threads.
+
+bcrypt is deliberately CPU-bound. Running it inline lets a login burst starve
+every other request, so hashes and checks run on a bounded process pool and
+callers get :class:`PasswordHasherBusy` instead of queueing without limit.
+The work factor is either configured explicitly or calibrated once to a
+target hash time and shared through the ``app_settings`` collection, so
+every worker hashes with the same cost. Stored hashes with a lower cost are
+upgraded on the next successful login.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing
+import os
+import threading
+import time
+
+import bcrypt
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+
+SETTINGS_COLLECTION = "app_settings"
+ROUNDS_SETTING = "bcrypt_rounds"
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many hashing jobs are already queued."""
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_cost(hashed: str) -> int | None:
+    """Return the cost factor encoded in a ``$2b$12$...`` hash."""
+
+    parts = (hashed or "").split("$")
+    if len(parts) < 4:
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int, max_rounds: int) -> int:
+    """Pick the lowest cost whose hash time reaches ``target_ms`` on this host.
+
+    Each extra round doubles the work, so one measurement at ``min_rounds`` is
+    enough to extrapolate. Never returns less than ``min_rounds``.
+    """
+
+    started = time.perf_counter()
+    _hash(b"calibration", min_rounds)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed_ms < target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+def _noop() -> None:
+    return None
+
+
+def _pool_context():
+    """Start method for pool children, or ``None`` when only spawn is available.
+
+    Pool children are forked: under spawn or forkserver each child re-imports
+    ``__main__`` (``app.py``) and would rerun its startup work.
+    """
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+class PasswordHasher:
+    """Run bcrypt on a per-process pool with a bounded backlog.
+
+    ``workers=0`` hashes inline on the calling thread, which is what scripts
+    use and what platforms without ``fork`` fall back to.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        rounds: int | None = None,
+        target_ms: float = 250.0,
+        min_rounds: int = 12,
+        max_rounds: int = 15,
+        timeout: float = 30.0,
+    ) -> None:
+        self.workers = max(int(workers), 0) if _pool_context() is not None else 0
+        self.max_pending = max(int(max_pending), 1)
+        self.target_ms = target_ms
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        self.timeout = timeout
+        self._rounds = rounds
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_pid: int | None = None
+
+    @classmethod
+    def from_config(cls, config) -> "PasswordHasher":
+        return cls(
+            workers=config.BCRYPT_WORKERS,
+            max_pending=config.BCRYPT_MAX_PENDING,
+            rounds=config.BCRYPT_ROUNDS,
+            target_ms=config.BCRYPT_TARGET_MS,
+            min_rounds=config.BCRYPT_MIN_ROUNDS,
+            max_rounds=config.BCRYPT_MAX_ROUNDS,
+        )
+
+    def resolve_rounds(self, db=None) -> int:
+        """Fix this process's work factor and return it.
+
+        A configured cost wins. Otherwise, given ``db``, the cost stored in
+        ``app_settings`` is used, and the first process to find none
+        calibrates and stores it for every other worker and later start.
+        Without ``db`` this process calibrates on its own.
+        """
+
+        if self._rounds is None:
+            with self._lock:
+                if self._rounds is None:
+                    self._rounds = self._shared_rounds(db) if db is not None else self._calibrate()
+        return self._rounds
+
+    def _calibrate(self) -> int:
+        return calibrate_rounds(self.target_ms, self.min_rounds, self.max_rounds)
+
+    def _shared_rounds(self, db) -> int:
+        settings = db[SETTINGS_COLLECTION]
+        stored = settings.find_one({"_id": ROUNDS_SETTING})
+        if stored is None:
+            rounds = self._calibrate()
+            try:
+                settings.insert_one({"_id": ROUNDS_SETTING, "value": rounds, "calibratedAt": datetime.utcnow()})
+                return rounds
+            except DuplicateKeyError:
+                stored = settings.find_one({"_id": ROUNDS_SETTING})  # another worker won
+        return max(int(stored["value"]), self.min_rounds)
+
+    @property
+    def rounds(self) -> int:
+        return self.resolve_rounds()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        """Fork this process's pool children now.
+
+        Call it before the process starts any thread (the MongoDB client's
+        monitors, mail workers, samplers): forking a multi-threaded process
+        can leave children holding copies of locks another thread held. Under
+        a pre-forking server that imports the app before forking (gunicorn
+        ``--preload``), call it again from the ``post_fork`` hook. Otherwise
+        the pool is forked on first use.
+        """
+
+        if self.workers:
+            # With the fork start method the first submit launches every child.
+            self._get_executor().submit(_noop).result(timeout=self.timeout)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Pools do not survive a fork; each worker process builds its own.
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=_pool_context()
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Password hashing queue is full")
+        with self._lock:
+            self._pending += 1
+        try:
+            if self.workers == 0:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password.encode("utf-8"), self.rounds).decode("utf-8")
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run(_check, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        cost = hash_cost(hashed)
+        return cost is not None and cost < self.rounds
+
+
+password_hasher = PasswordHasher.from_config(Config)
+
@@ -0,0 +1,153 @@
+"""On-demand CPU profiling of single requests.
+
+An admin adds ``X-Profile: 1`` (or ``?_profile=1``) to a request and that
+request alone runs under ``cProfile``. The result is stored in the capped
+``request_profiles`` collection, which MongoDB keeps bounded in size and
+count and which every worker process shares. Each stored profile holds a
+text summary and the raw pstats data, which can be loaded with
+``pstats``/snakeviz. The response carries ``X-Profile-Id`` to fetch it from
+``/api/admin/profiles``.
+
+Requests without the flag only pay for the header lookup. Only one profiler
+can be active per process (Python 3.12 enforces it), so a flagged request
+arriving while another is being profiled runs unprofiled and answers with
+``X-Profile-Skipped``.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+from bson import Binary, ObjectId
+from flask import current_app, g, request
+from pymongo.errors import CollectionInvalid
+
+from utils.auth import request_admin
+from utils.instrumentation import untracked
+
+COLLECTION = "request_profiles"
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "_profile"
+SORT_KEYS = {"cumulative", "tottime", "ncalls", "pcalls"}
+SKIPPED_HEADER = "X-Profile-Skipped"
+
+_profiler_lock = threading.Lock()
+
+
+def wants_profile() -> bool:
+    flag = request.headers.get(PROFILE_HEADER)
+    if flag is None and PROFILE_QUERY_PARAM in request.args:
+        flag = request.args.get(PROFILE_QUERY_PARAM)
+    return flag is not None and flag.strip().lower() in {"1", "true", "yes"}
+
+
+def summarize(stats: pstats.Stats, sort: str = "cumulative", limit: int = 40) -> str:
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def load_stats(raw: bytes) -> pstats.Stats:
+    """Rebuild ``pstats.Stats`` from a stored profile's raw data."""
+
+    stats = pstats.Stats()
+    stats.stats = marshal.loads(raw)
+    stats.get_top_level_stats()
+    return stats
+
+
+def ensure_profile_collection(db, max_bytes: int, max_entries: int) -> None:
+    if COLLECTION in db.list_collection_names(filter={"name": COLLECTION}):
+        return
+    try:
+        db.create_collection(COLLECTION, capped=True, size=max_bytes, max=max_entries)
+    except CollectionInvalid:
+        pass  # another worker created it first
+
+
+def init_app(app, max_entries: int = 50, max_bytes: int = 16 * 1024 * 1024,
+             max_profile_bytes: int = 512 * 1024, summary_lines: int = 40) -> None:
+    """Profile flagged admin requests to ``app`` and store them in ``app.mongo_db``.
+
+    Raw pstats data larger than ``max_profile_bytes`` is dropped and only
+    the summary is kept.
+    """
+
+    prepared = False
+
+    @app.before_request
+    def start_profile():
+        if not wants_profile():
+            return
+        admin = request_admin()
+        if admin is None:
+            return
+        if not _profiler_lock.acquire(blocking=False):
+            g.profile_skipped = "busy"
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler (not ours) is active in this process
+            _profiler_lock.release()
+            g.profile_skipped = "busy"
+            return
+        g.profile = (profiler, time.perf_counter(), str(admin["_id"]))
+
+    @app.after_request
+    def store_profile(response):
+        nonlocal prepared
+        skipped = g.pop("profile_skipped", None)
+        if skipped is not None:
+            response.headers[SKIPPED_HEADER] = skipped
+        state = g.pop("profile", None)
+        if state is None:
+            return response
+        profiler, started, admin_id = state
+        profiler.disable()
+        _profiler_lock.release()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        stats = pstats.Stats(profiler)
+        raw = marshal.dumps(stats.stats)
+        document: dict[str, Any] = {
+            "_id": ObjectId(),
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "durationMs": round(duration_ms, 2),
+            "totalCalls": stats.total_calls,
+            "adminId": admin_id,
+            "summary": summarize(stats, limit=summary_lines),
+            "rawTruncated": len(raw) > max_profile_bytes,
+            "createdAt": datetime.utcnow(),
+        }
+        if not document["rawTruncated"]:
+            document["raw"] = Binary(raw)
+        try:
+            db = current_app.mongo_db
+            # Keep the profiler's own writes out of the request's X-DB-* stats.
+            with untracked():
+                if not prepared:
+                    ensure_profile_collection(db, max_bytes, max_entries)
+                    prepared = True
+                db[COLLECTION].insert_one(document)
+            response.headers["X-Profile-Id"] = str(document["_id"])
+        except Exception as exc:  # pragma: no cover - profiling never fails the request
+            print(f"Warning: failed to store request profile: {exc}")
+        return response
+
+    @app.teardown_request
+    def stop_profile(exc=None):  # pylint: disable=unused-argument
+        state = g.pop("profile", None)
+        if state is not None:
+            state[0].disable()
+            _profiler_lock.release()
@@ -0,0 +1,109 @@
+"""Projection helpers for read endpoints.
+
+List views ask MongoDB for the fields they render instead of whole
+documents, and clients may narrow a response further with
+``?fields=name,price``. The requested names are checked against a per-route
+allowlist so internal fields (password hashes, search keys) can never be
+selected.
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable, Mapping
+
+# Fields a client may request with ``fields=``.
+PRODUCT_FIELDS = frozenset({
+    "name", "slug", "category", "price", "discount", "stock", "images", "image",
+    "description", "specifications", "is_active", "createdAt", "updatedAt",
+})
+ORDER_FIELDS = frozenset({
+    "orderId", "userId", "items", "shipping", "payment", "subtotal", "shippingFee",
+    "tax", "total", "status", "createdAt", "updatedAt",
+})
+USER_FIELDS = frozenset({
+    "name", "email", "phone", "address", "role", "is_banned", "createdAt", "updatedAt",
+})
+
+# Product cards show the description but never the specification table.
+PRODUCT_LIST_PROJECTION = {"search": 0, "search_keys": 0, "specifications": 0}
+USER_PUBLIC_PROJECTION = {"password": 0, "search_keys": 0}
+ORDER_PUBLIC_PROJECTION = {
+    "search_keys": 0, "search_order_keys": 0, "search_customer_keys": 0, "status_key": 0,
+}
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when ``fields`` names a field the endpoint does not expose."""
+
+
+def parse_fields(raw: str | None, allowed: Iterable[str]) -> list[str] | None:
+    """Parse a comma separated ``fields`` value; ``None`` when absent or empty."""
+
+    if not raw:
+        return None
+    fields = []
+    for name in raw.split(","):
+        name = name.strip()
+        if name and name not in fields:
+            fields.append(name)
+    if not fields:
+        return None
+
+    unknown = sorted(set(fields) - set(allowed))
+    if unknown:
+        raise InvalidFieldsError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def build_projection(
+    raw: str | None,
+    allowed: Iterable[str],
+    default: Mapping[str, Any] | None,
+    required: Iterable[str] = (),
+) -> dict[str, Any] | None:
+    """Return the Mongo projection for a request.
+
+    Without ``fields`` the route's ``default`` projection is used. Otherwise
+    an inclusion projection of the requested fields is built; ``required``
+    fields (such as a keyset sort field) are always included.
+    """
+
+    fields = parse_fields(raw, allowed)
+    if fields is None:
+        return dict(default) if default is not None else None
+
+    projection: dict[str, Any] = {field: 1 for field in fields}
+    for field in required:
+        if field != "_id":
+            projection[field] = 1
+    return projection
+
+
+def select_fields(document: Mapping[str, Any] | None, fields: Iterable[str] | None) -> Any:
+    """Apply a parsed ``fields`` list to an already loaded document."""
+
+    if document is None or fields is None:
+        return document
+    selected = {"_id": document.get("_id")}
+    for field in fields:
+        if field in document:
+            selected[field] = document[field]
+    return selected
+
+
+def includes_field(projection: Mapping[str, Any] | None, field: str) -> bool:
+    """Whether documents fetched with ``projection`` carry ``field``."""
+
+    if projection is None:
+        return True
+    inclusive = any(value for key, value in projection.items() if key != "_id")
+    if inclusive:
+        return bool(projection.get(field))
+    return field not in projection
+
+
+def projection_key(projection: Mapping[str, Any] | None) -> tuple | None:
+    """Hashable form of a projection for use in cache keys."""
+
+    if projection is None:
+        return None
+    return tuple(sorted(projection.items()))
@@ -0,0 +1,224 @@
+"""reCAPTCHA verification client.
+
+A shared ``requests.Session`` keeps connections to the verifier alive, a
+circuit breaker stops a slow or failing verifier from tying up request
+workers, and recently verified tokens are remembered so a double-submitted
+form is not verified twice. A remembered token only covers the same action,
+identity and client, and only a limited number of times.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.cache import TTLCache
+
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500)
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    rejects calls for ``reset_timeout`` seconds, then lets a single trial call
+    through; its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+        self._trial_thread: int | None = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            self._trial_thread = threading.get_ident()
+            return True
+
+    def release(self) -> None:
+        """Free a trial this thread was granted but recorded no outcome for."""
+
+        with self._lock:
+            if self._trial_in_flight and self._trial_thread == threading.get_ident():
+                self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class RecaptchaVerifier:
+    """Verify reCAPTCHA tokens against the siteverify endpoint."""
+
+    def __init__(
+        self,
+        secret: str,
+        verify_url: str,
+        connect_timeout: float = 0.5,
+        read_timeout: float = 1.5,
+        fail_open: bool = False,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        token_cache_ttl: float = 120.0,
+        token_max_reuse: int = 1,
+        pool_size: int = 10,
+    ) -> None:
+        self.secret = secret
+        self.verify_url = verify_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.fail_open = fail_open
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.token_max_reuse = max(int(token_max_reuse), 0)
+        # (token, action, identity, remote_ip) -> [remaining reuses]
+        self._verified = TTLCache(max_entries=10000, ttl=token_cache_ttl)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "accepted": 0,
+            "rejected": 0,
+            "errors": 0,
+            "short_circuited": 0,
+            "cache_hits": 0,
+        }
+        self._latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._latency_sum_ms = 0.0
+
+    @classmethod
+    def from_config(cls, config) -> "RecaptchaVerifier":
+        return cls(
+            secret=config.RECAPTCHA_SECRET_KEY,
+            verify_url=config.RECAPTCHA_VERIFY_URL,
+            connect_timeout=config.RECAPTCHA_CONNECT_TIMEOUT,
+            read_timeout=config.RECAPTCHA_READ_TIMEOUT,
+            fail_open=config.RECAPTCHA_FAIL_OPEN,
+            failure_threshold=config.RECAPTCHA_BREAKER_THRESHOLD,
+            reset_timeout=config.RECAPTCHA_BREAKER_RESET,
+            token_cache_ttl=config.RECAPTCHA_TOKEN_CACHE_TTL,
+            token_max_reuse=config.RECAPTCHA_TOKEN_MAX_REUSE,
+        )
+
+    def verify(
+        self,
+        token: str | None,
+        action: str | None = None,
+        identity: str | None = None,
+        remote_ip: str | None = None,
+    ) -> bool:
+        """Check ``token`` for ``action`` submitted by ``identity`` from ``remote_ip``.
+
+        A verified token is remembered for that exact combination and may be
+        presented again at most ``token_max_reuse`` times.
+        """
+
+        if not token:
+            return False
+
+        key = (token, action, (identity or "").strip().lower(), remote_ip)
+        if self._consume_verified(key):
+            self._count("cache_hits")
+            return True
+
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            return self.fail_open
+
+        payload = {"secret": self.secret, "response": token}
+        if remote_ip:
+            payload["remoteip"] = remote_ip
+        started = time.perf_counter()
+        try:
+            try:
+                response = self._session.post(self.verify_url, data=payload, timeout=self.timeout)
+                response.raise_for_status()
+                result = response.json()
+            except Exception as exc:  # network errors, bad JSON, anything unexpected
+                self._observe((time.perf_counter() - started) * 1000)
+                self.breaker.record_failure()
+                self._count("errors")
+                print(f"reCAPTCHA verification error: {exc}")
+                return self.fail_open
+
+            self._observe((time.perf_counter() - started) * 1000)
+            self.breaker.record_success()
+        finally:
+            # An unexpected error must not leave a half-open trial claimed forever.
+            self.breaker.release()
+
+        success = bool(result.get("success", False)) if isinstance(result, dict) else False
+        # v3 responses name the action the token was issued for.
+        if success and action and result.get("action") not in (None, action):
+            success = False
+        self._count("accepted" if success else "rejected")
+        if success and self.token_max_reuse:
+            self._verified.set(key, [self.token_max_reuse])
+        return success
+
+    def _consume_verified(self, key: tuple) -> bool:
+        with self._lock:
+            remaining = self._verified.get(key)
+            if not remaining:
+                return False
+            remaining[0] -= 1
+            if remaining[0] <= 0:
+                self._verified.invalidate(key)
+            return True
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _observe(self, elapsed_ms: float) -> None:
+        index = len(LATENCY_BUCKETS_MS)
+        for position, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = position
+                break
+        with self._lock:
+            self._counters["requests"] += 1
+            self._latency_buckets[index] += 1
+            self._latency_sum_ms += elapsed_ms
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            buckets = {f"le_{bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self._latency_buckets)}
+            buckets["le_inf"] = self._latency_buckets[-1]
+            return {
+                **self._counters,
+                "breaker_state": self.breaker.state,
+                "latency_sum_ms": round(self._latency_sum_ms, 3),
+                "latency_buckets": buckets,
+            }
@@ -0,0 +1,259 @@
+"""Daily revenue rollup for the dashboard chart.
+
+``revenue_daily`` holds one small document per UTC day (``_id``
+``"YYYY-MM-DD"``) with the revenue and order count of orders placed that day
+whose status is Confirmed or Delivered, split further into ``hours.HH`` so
+a series can be cut at local midnight for any whole-hour timezone. Status
+transitions into or out of those statuses, and deletions, adjust the
+affected day with ``$inc``.
+
+Rebuild a range (or everything) from the orders with::
+
+    python -m utils.revenue_rollup --days 90
+    python -m utils.revenue_rollup --all
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pymongo import UpdateOne
+
+from utils.order_status import REVENUE_STATUS_KEYS, STATUS_KEY_FIELD, is_revenue_status
+
+COLLECTION = "revenue_daily"
+BUCKETS = {"day", "week", "month"}
+MAX_RANGE_DAYS = 1830
+
+
+class InvalidSeriesRequest(ValueError):
+    """Raised for an unknown timezone or bucket."""
+
+
+def _amount(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _day_id(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d")
+
+
+def _adjust(db, order: dict[str, Any], sign: int) -> None:
+    created_at = order.get("createdAt")
+    if not isinstance(created_at, datetime):
+        return
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    revenue = sign * _amount(order.get("total"))
+    hour = f"hours.{created_at.hour:02d}"
+    try:
+        db[COLLECTION].update_one(
+            {"_id": _day_id(created_at)},
+            {
+                "$inc": {
+                    "revenue": revenue,
+                    "orders": sign,
+                    f"{hour}.revenue": revenue,
+                    f"{hour}.orders": sign,
+                },
+                "$setOnInsert": {"date": datetime.combine(created_at.date(), time())},
+            },
+            upsert=True,
+        )
+    except Exception as exc:  # pragma: no cover - a rebuild repairs the day
+        print(f"Warning: failed to update revenue rollup: {exc}")
+
+
+def record_status_change(db, order: dict[str, Any], new_status: str) -> None:
+    before = is_revenue_status(order.get("status"))
+    after = is_revenue_status(new_status)
+    if before != after:
+        _adjust(db, order, 1 if after else -1)
+
+
+def record_order_deleted(db, order: dict[str, Any]) -> None:
+    if is_revenue_status(order.get("status")):
+        _adjust(db, order, -1)
+
+
+def rebuild_revenue_daily(db, start: date | None = None, end: date | None = None) -> int:
+    """Recompute rollup days in ``[start, end]`` (all days when omitted) from orders.
+
+    Safe to run while orders change and from several processes at once: an
+    increment landing between the aggregation and the write can be lost,
+    and the next rebuild restores it. Returns the number of day documents
+    written.
+    """
+
+    match: dict[str, Any] = {
+        STATUS_KEY_FIELD: {"$in": list(REVENUE_STATUS_KEYS)},
+        "createdAt": {"$type": "date"},
+    }
+    day_filter: dict[str, Any] = {}
+    if start is not None:
+        match["createdAt"]["$gte"] = datetime.combine(start, time())
+        day_filter.setdefault("_id", {})["$gte"] = start.isoformat()
+    if end is not None:
+        match["createdAt"]["$lt"] = datetime.combine(end + timedelta(days=1), time())
+        day_filter.setdefault("_id", {})["$lte"] = end.isoformat()
+
+    rows = db.orders.aggregate(
+        [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": {
+                        "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}},
+                        "hour": {"$hour": "$createdAt"},
+                    },
+                    "revenue": {"$sum": {"$ifNull": ["$total", 0]}},
+                    "orders": {"$sum": 1},
+                }
+            },
+        ]
+    )
+
+    days: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        day_id = row["_id"]["day"]
+        document = days.setdefault(
+            day_id,
+            {
+                "_id": day_id,
+                "date": datetime.strptime(day_id, "%Y-%m-%d"),
+                "revenue": 0.0,
+                "orders": 0,
+                "hours": {},
+            },
+        )
+        revenue = _amount(row["revenue"])
+        document["revenue"] += revenue
+        document["orders"] += row["orders"]
+        document["hours"][f"{row['_id']['hour']:02d}"] = {"revenue": revenue, "orders": row["orders"]}
+
+    # Upsert each day instead of delete-then-insert so a concurrent rebuild
+    # or a live ``$inc`` from a status change never hits a missing or
+    # duplicate day; days in range with no revenue left are removed after.
+    if days:
+        db[COLLECTION].bulk_write(
+            [
+                UpdateOne(
+                    {"_id": day_id},
+                    {"$set": {key: value for key, value in document.items() if key != "_id"}},
+                    upsert=True,
+                )
+                for day_id, document in days.items()
+            ],
+            ordered=False,
+        )
+    stale_filter = {"_id": {**day_filter.get("_id", {}), "$nin": list(days)}}
+    db[COLLECTION].delete_many(stale_filter)
+    return len(days)
+
+
+def build_revenue_daily_if_empty(db) -> None:
+    """Build the rollup once; afterwards status changes maintain it."""
+
+    if db[COLLECTION].estimated_document_count() == 0 and db.orders.estimated_document_count():
+        rebuild_revenue_daily(db)
+
+
+def _resolve_timezone(name: str | None):
+    if not name or name.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError) as exc:
+        raise InvalidSeriesRequest(f"Unknown timezone: {name}") from exc
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def revenue_series(
+    db,
+    days: int,
+    tz_name: str | None = None,
+    bucket: str = "day",
+    now: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """Return zero-filled revenue for the last ``days`` local days.
+
+    Day boundaries follow ``tz_name``; hours are attributed by their start,
+    so zones with a half-hour offset are approximated to the hour.
+    Week buckets start on Monday and month buckets on the 1st, each labelled
+    with its first day inside the range.
+    """
+
+    if bucket not in BUCKETS:
+        raise InvalidSeriesRequest(f"Unknown bucket: {bucket}")
+    tz = _resolve_timezone(tz_name)
+    days = min(max(int(days), 1), MAX_RANGE_DAYS)
+
+    now = now or datetime.now(timezone.utc)
+    today = now.astimezone(tz).date()
+    first_day = today - timedelta(days=days - 1)
+    range_start = datetime.combine(first_day, time(), tz).astimezone(timezone.utc)
+    range_end = datetime.combine(today + timedelta(days=1), time(), tz).astimezone(timezone.utc)
+
+    local_days: dict[date, dict[str, Any]] = {
+        first_day + timedelta(days=offset): {"revenue": 0.0, "orders": 0} for offset in range(days)
+    }
+    cursor = db[COLLECTION].find(
+        {"_id": {"$gte": _day_id(range_start), "$lte": _day_id(range_end)}},
+        {"hours": 1},
+    )
+    for document in cursor:
+        day_start = datetime.strptime(document["_id"], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        for hour, values in (document.get("hours") or {}).items():
+            moment = day_start + timedelta(hours=int(hour))
+            if not range_start <= moment < range_end:
+                continue
+            totals = local_days.get(moment.astimezone(tz).date())
+            if totals is not None:
+                totals["revenue"] += _amount(values.get("revenue"))
+                totals["orders"] += int(values.get("orders") or 0)
+
+    series: dict[date, dict[str, Any]] = {}
+    for day, totals in local_days.items():
+        label = max(_bucket_start(day, bucket), first_day)
+        entry = series.setdefault(label, {"revenue": 0.0, "orders": 0})
+        entry["revenue"] += totals["revenue"]
+        entry["orders"] += totals["orders"]
+
+    return [
+        {"date": label.isoformat(), "revenue": round(totals["revenue"], 2), "orders": totals["orders"]}
+        for label, totals in sorted(series.items())
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from pymongo import MongoClient
+
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Rebuild the revenue_daily rollup from orders")
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument("--days", type=int, default=90, help="rebuild the last N UTC days")
+    scope.add_argument("--all", action="store_true", help="rebuild every day")
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGODB_URI)
+    database = client[Config.DATABASE_NAME]
+    if args.all:
+        written = rebuild_revenue_daily(database)
+    else:
+        end_day = datetime.utcnow().date()
+        written = rebuild_revenue_daily(database, end_day - timedelta(days=args.days - 1), end_day)
+    print(f"Rebuilt {written} revenue days")
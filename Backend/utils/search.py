@@ -0,0 +1,468 @@
+"""Accent-folded search support.
+
+Products carry a ``search`` sub-document holding folded copies of the fields
+shoppers search on. A weighted text index over those fields gives ranked,
+index-backed lookups, and because both the stored text and the query are
+folded the same way, ``thuoc ho`` matches ``Thuốc ho``.
+
+The admin screens search users and products as the admin types, which needs
+prefix matches rather than whole words. Those documents carry a
+``search_keys`` array of word prefixes (``p:``) and trigrams (``t:``) behind
+a multikey index: every typed word must match a prefix key, and when nothing
+does, documents sharing enough trigrams with the query are returned instead
+so a typo still finds its target.
+
+Orders use the same keys so admin order search needs no user pre-scan: the
+order's own keys (order number, recipient, contact) live in
+``search_order_keys``, the customer's name and email in
+``search_customer_keys``, and ``search_keys`` is their union. A profile edit
+only rewrites the customer part. Order numbers also get an exact key
+(``o:``) and suffix keys (``s:``) for their trailing digits, so the
+sequence an admin reads out (``00001234`` or ``1234``) finds the order.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+import re
+import unicodedata
+from typing import Any
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, UpdateOne
+
+PRODUCT_SEARCH_INDEX_NAME = "product_search"
+PRODUCT_SEARCH_INDEX_KEYS = [
+    ("search.name", "text"),
+    ("search.category", "text"),
+    ("search.specifications", "text"),
+    ("search.description", "text"),
+]
+PRODUCT_SEARCH_INDEX_WEIGHTS = {
+    "search.name": 10,
+    "search.category": 5,
+    "search.specifications": 3,
+    "search.description": 1,
+}
+
+# Letters that do not decompose into base letter + combining mark.
+_EXTRA_FOLDS = str.maketrans({"đ": "d", "Đ": "d", "ø": "o", "Ø": "o", "ł": "l", "Ł": "l"})
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_NON_DIGIT = re.compile(r"[^0-9]+")
+_PHONE_QUERY = re.compile(r"^[0-9+()\-.\s]+$")
+_TRAILING_DIGITS = re.compile(r"[0-9]+$")
+
+SEARCH_KEYS_FIELD = "search_keys"
+# Longer words are indexed by their first MAX_PREFIX_LENGTH characters only.
+MAX_PREFIX_LENGTH = 12
+# Share of the query's trigrams a document needs for a typo-tolerant match.
+FUZZY_MIN_SHARE = 0.5
+# Upper bound on documents scored by a typo-tolerant query.
+FUZZY_CANDIDATE_LIMIT = 5000
+NATIONAL_CALLING_CODE = "84"
+ORDER_KEYS_FIELD = "search_order_keys"
+# Shortest order number tail that is searchable on its own.
+MIN_ORDER_SUFFIX_LENGTH = 3
+ORDER_NUMBER_KEYS_MIGRATION_ID = "order_number_suffix_keys"
+CUSTOMER_KEYS_FIELD = "search_customer_keys"
+
+
+def fold_text(value: Any) -> str:
+    """Lowercase ``value``, strip diacritics and collapse punctuation to spaces."""
+
+    if value is None:
+        return ""
+    text = str(value).translate(_EXTRA_FOLDS)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def build_product_search_fields(product: dict[str, Any]) -> dict[str, str]:
+    """Return the folded ``search`` sub-document for a product."""
+
+    specifications = product.get("specifications") or []
+    spec_values = [
+        f"{item.get('key', '')} {item.get('value', '')}"
+        for item in specifications
+        if isinstance(item, dict)
+    ]
+    category = product.get("category") or ""
+    return {
+        "name": fold_text(product.get("name")),
+        "category": fold_text(category.replace("-", " ")),
+        "specifications": fold_text(" ".join(spec_values)),
+        "description": fold_text(product.get("description")),
+    }
+
+
+def build_text_query(search: str) -> str | None:
+    """Fold a user supplied search string into a ``$text`` search expression.
+
+    Terms are passed as plain words, so regex or ``$text`` operators typed by
+    the user have no special meaning.
+    """
+
+    folded = fold_text(search)
+    return folded or None
+
+
+def _prefix_keys(word: str) -> list[str]:
+    return [f"p:{word[:length]}" for length in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1)]
+
+
+def _trigram_keys(word: str) -> list[str]:
+    return [f"t:{word[index:index + 3]}" for index in range(len(word) - 2)]
+
+
+def build_search_keys(
+    values: list[Any],
+    fuzzy_values: list[Any] = (),
+    phones: list[Any] = (),
+) -> list[str]:
+    """Return the ``search_keys`` array for a document.
+
+    Every word of ``values`` gets prefix keys; ``fuzzy_values`` (the fields
+    worth typo tolerance, such as names) also get trigram keys. Phones are
+    reduced to their digits so ``0912 345 678`` is found by ``0912345``.
+    """
+
+    keys: set[str] = set()
+    for value in list(values) + list(fuzzy_values):
+        for word in fold_text(value).split():
+            keys.update(_prefix_keys(word))
+    for value in fuzzy_values:
+        for word in fold_text(value).split():
+            keys.update(_trigram_keys(word))
+    for phone in phones:
+        digits = _NON_DIGIT.sub("", str(phone or ""))
+        if digits:
+            keys.update(_prefix_keys(digits))
+        # +84 912 ... is usually typed in its national form, 0912 ...
+        if digits.startswith(NATIONAL_CALLING_CODE) and len(digits) > 9:
+            keys.update(_prefix_keys("0" + digits[len(NATIONAL_CALLING_CODE):]))
+    return sorted(keys)
+
+
+def build_user_search_keys(user: dict[str, Any]) -> list[str]:
+    email = str(user.get("email") or "")
+    local_part = email.split("@", 1)[0]
+    return build_search_keys([email], fuzzy_values=[user.get("name"), local_part], phones=[user.get("phone")])
+
+
+def build_product_admin_search_keys(product: dict[str, Any]) -> list[str]:
+    return build_search_keys([product.get("slug")], fuzzy_values=[product.get("name")])
+
+
+def _query_words(search: str) -> list[str]:
+    if _PHONE_QUERY.match(search) and sum(char.isdigit() for char in search) >= 3:
+        return [_NON_DIGIT.sub("", search)]
+    return fold_text(search).split()
+
+
+def _shipping_value(shipping: dict[str, Any], *names: str) -> Any:
+    for name in names:
+        if shipping.get(name):
+            return shipping[name]
+    return None
+
+
+def build_order_search_keys(order: dict[str, Any]) -> list[str]:
+    """Keys derived from the order itself, plus exact and suffix order number keys."""
+
+    shipping = order.get("shipping") or {}
+    order_number = order.get("orderId") or order.get("order_number")
+    keys = build_search_keys(
+        [order_number, _shipping_value(shipping, "email")],
+        fuzzy_values=[_shipping_value(shipping, "fullName", "full_name", "recipient")],
+        phones=[_shipping_value(shipping, "phone")],
+    )
+    exact = _order_number_key(order_number)
+    if exact:
+        keys.append(exact)
+    keys.extend(_order_suffix_keys(order_number))
+    return sorted(set(keys))
+
+
+def build_customer_search_keys(user: dict[str, Any] | None) -> list[str]:
+    """Keys an order inherits from its customer (name and email)."""
+
+    if not user:
+        return []
+    email = str(user.get("email") or "")
+    return build_search_keys([email], fuzzy_values=[user.get("name"), email.split("@", 1)[0]])
+
+
+def order_search_fields(order_keys: list[str], customer_keys: list[str]) -> dict[str, list[str]]:
+    """The three search fields stored on an order."""
+
+    return {
+        ORDER_KEYS_FIELD: order_keys,
+        CUSTOMER_KEYS_FIELD: customer_keys,
+        SEARCH_KEYS_FIELD: sorted(set(order_keys) | set(customer_keys)),
+    }
+
+
+def _order_number_key(order_number: Any) -> str | None:
+    compact = "".join(fold_text(order_number).split())
+    return f"o:{compact}" if compact else None
+
+
+def _order_suffix_keys(order_number: Any) -> list[str]:
+    """``s:`` keys for every tail of the order number's trailing digits."""
+
+    match = _TRAILING_DIGITS.search("".join(fold_text(order_number).split()))
+    if not match:
+        return []
+    digits = match.group()
+    return [f"s:{digits[-length:]}" for length in range(MIN_ORDER_SUFFIX_LENGTH, len(digits) + 1)]
+
+
+def build_order_search_filter(search: str) -> dict[str, Any] | None:
+    """Indexed filter for admin order search.
+
+    Matches the exact order number, the tail of its digits or word prefixes.
+    """
+
+    clauses = []
+    exact = _order_number_key(search)
+    if exact:
+        clauses.append({SEARCH_KEYS_FIELD: exact})
+    digits = "".join(search.split())
+    if digits.isdigit() and len(digits) >= MIN_ORDER_SUFFIX_LENGTH:
+        clauses.append({SEARCH_KEYS_FIELD: f"s:{digits}"})
+    prefix_filter = build_search_keys_filter(search)
+    if prefix_filter:
+        clauses.append(prefix_filter)
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def refresh_customer_order_keys(db, user_id: Any, user: dict[str, Any], batch_size: int = 500) -> int:
+    """Rewrite the customer part of the search keys on every order of a user."""
+
+    customer_keys = build_customer_search_keys(user)
+    updated = 0
+    pending: list[UpdateOne] = []
+    cursor = db.orders.find({"userId": str(user_id)}, {ORDER_KEYS_FIELD: 1}).batch_size(batch_size)
+    for order in cursor:
+        pending.append(
+            UpdateOne(
+                {"_id": order["_id"]},
+                {"$set": order_search_fields(order.get(ORDER_KEYS_FIELD) or [], customer_keys)},
+            )
+        )
+        if len(pending) >= batch_size:
+            updated += db.orders.bulk_write(pending, ordered=False).modified_count
+            pending = []
+    if pending:
+        updated += db.orders.bulk_write(pending, ordered=False).modified_count
+    return updated
+
+
+def build_search_keys_filter(search: str) -> dict[str, Any] | None:
+    """Index-backed filter matching documents where every word is a prefix."""
+
+    words = _query_words(search)
+    if not words:
+        return None
+    keys = sorted({f"p:{word[:MAX_PREFIX_LENGTH]}" for word in words})
+    return {SEARCH_KEYS_FIELD: {"$all": keys}}
+
+
+def build_fuzzy_search_stages(search: str) -> list[dict[str, Any]] | None:
+    """Aggregation stages ranking documents by trigram overlap with ``search``.
+
+    Returns ``None`` when the query is too short to have trigrams. The stages
+    add a temporary ``_search_score`` field and sort by it.
+    """
+
+    trigrams = sorted({key for word in _query_words(search) for key in _trigram_keys(word)})
+    if not trigrams:
+        return None
+    threshold = max(1, round(len(trigrams) * FUZZY_MIN_SHARE))
+    return [
+        {"$match": {SEARCH_KEYS_FIELD: {"$in": trigrams}}},
+        {"$limit": FUZZY_CANDIDATE_LIMIT},
+        {
+            "$addFields": {
+                "_search_score": {
+                    "$size": {
+                        "$filter": {
+                            "input": f"${SEARCH_KEYS_FIELD}",
+                            "as": "key",
+                            "cond": {"$in": ["$$key", trigrams]},
+                        }
+                    }
+                }
+            }
+        },
+        {"$match": {"_search_score": {"$gte": threshold}}},
+        {"$sort": {"_search_score": -1, "_id": 1}},
+    ]
+
+
+def fuzzy_search_page(
+    collection,
+    query: dict[str, Any],
+    search: str,
+    skip: int,
+    limit: int,
+    projection: dict[str, Any] | None = None,
+) -> tuple[list[dict[str, Any]], int]:
+    """Run a typo-tolerant search; returns ``(documents, total)``."""
+
+    stages = build_fuzzy_search_stages(search)
+    if stages is None:
+        return [], 0
+    if query:
+        stages.insert(1, {"$match": query})
+    page_stages: list[dict[str, Any]] = [{"$skip": skip}, {"$limit": limit}]
+    exclude = {"_search_score": 0}
+    if projection and any(value for key, value in projection.items() if key != "_id"):
+        page_stages.append({"$project": dict(projection)})
+    else:
+        page_stages.append({"$project": {**(projection or {}), **exclude}})
+    stages.append({"$facet": {"items": page_stages, "total": [{"$count": "count"}]}})
+
+    result = next(collection.aggregate(stages), {"items": [], "total": []})
+    total = result["total"][0]["count"] if result["total"] else 0
+    return result["items"], total
+
+
+def backfill_admin_search_keys(db, batch_size: int = 500) -> int:
+    """Populate ``search_keys`` on users, products and orders written before it existed."""
+
+    updated = 0
+    sources = (
+        (db.users, {"name": 1, "email": 1, "phone": 1}, build_user_search_keys),
+        (db.products, {"name": 1, "slug": 1}, build_product_admin_search_keys),
+    )
+    for collection, projection, build_keys in sources:
+        pending: list[UpdateOne] = []
+        cursor = collection.find({SEARCH_KEYS_FIELD: {"$exists": False}}, projection).batch_size(batch_size)
+        for document in cursor:
+            pending.append(
+                UpdateOne({"_id": document["_id"]}, {"$set": {SEARCH_KEYS_FIELD: build_keys(document)}})
+            )
+            if len(pending) >= batch_size:
+                updated += collection.bulk_write(pending, ordered=False).modified_count
+                pending = []
+        if pending:
+            updated += collection.bulk_write(pending, ordered=False).modified_count
+    return updated + _backfill_order_search_keys(db, batch_size)
+
+
+def _backfill_order_search_keys(db, batch_size: int) -> int:
+    updated = 0
+    projection = {"orderId": 1, "order_number": 1, "shipping": 1, "userId": 1}
+    cursor = db.orders.find({SEARCH_KEYS_FIELD: {"$exists": False}}, projection).batch_size(batch_size)
+    batch: list[dict[str, Any]] = []
+
+    def flush() -> int:
+        user_ids = []
+        for order in batch:
+            try:
+                user_ids.append(ObjectId(order.get("userId")))
+            except (InvalidId, TypeError):
+                continue
+        users = {
+            str(user["_id"]): user
+            for user in db.users.find({"_id": {"$in": user_ids}}, {"name": 1, "email": 1})
+        }
+        operations = [
+            UpdateOne(
+                {"_id": order["_id"]},
+                {
+                    "$set": order_search_fields(
+                        build_order_search_keys(order),
+                        build_customer_search_keys(users.get(order.get("userId"))),
+                    )
+                },
+            )
+            for order in batch
+        ]
+        return db.orders.bulk_write(operations, ordered=False).modified_count
+
+    for order in cursor:
+        batch.append(order)
+        if len(batch) >= batch_size:
+            updated += flush()
+            batch = []
+    if batch:
+        updated += flush()
+    return updated
+
+
+def backfill_product_search_fields(db, batch_size: int = 500) -> int:
+    """Populate ``search`` on products written before it existed."""
+
+    updated = 0
+    pending: list[UpdateOne] = []
+    projection = {"name": 1, "category": 1, "description": 1, "specifications": 1}
+    cursor = db.products.find({"search": {"$exists": False}}, projection).batch_size(batch_size)
+    for product in cursor:
+        pending.append(
+            UpdateOne(
+                {"_id": product["_id"]},
+                {"$set": {"search": build_product_search_fields(product)}},
+            )
+        )
+        if len(pending) >= batch_size:
+            updated += db.products.bulk_write(pending, ordered=False).modified_count
+            pending = []
+    if pending:
+        updated += db.products.bulk_write(pending, ordered=False).modified_count
+    return updated
+
+
+def migrate_order_number_keys(db, batch_size: int = 500) -> int:
+    """Add order number suffix keys to orders indexed before they existed.
+
+    Resumable like the status key migration: progress is recorded in
+    ``migrations`` after each batch. Returns the number of orders updated.
+    """
+
+    progress = db.migrations.find_one({"_id": ORDER_NUMBER_KEYS_MIGRATION_ID}) or {}
+    if progress.get("done"):
+        return 0
+
+    query: dict[str, Any] = {SEARCH_KEYS_FIELD: {"$exists": True}}
+    if progress.get("lastId") is not None:
+        query["_id"] = {"$gt": progress["lastId"]}
+    projection = {"orderId": 1, "order_number": 1, "shipping": 1, CUSTOMER_KEYS_FIELD: 1}
+
+    updated = 0
+    while True:
+        batch = list(db.orders.find(query, projection).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+        operations = [
+            UpdateOne(
+                {"_id": order["_id"]},
+                {
+                    "$set": order_search_fields(
+                        build_order_search_keys(order), order.get(CUSTOMER_KEYS_FIELD) or []
+                    )
+                },
+            )
+            for order in batch
+        ]
+        modified = db.orders.bulk_write(operations, ordered=False).modified_count
+        updated += modified
+
+        last_id = batch[-1]["_id"]
+        query["_id"] = {"$gt": last_id}
+        db.migrations.update_one(
+            {"_id": ORDER_NUMBER_KEYS_MIGRATION_ID},
+            {"$set": {"lastId": last_id, "updatedAt": datetime.utcnow()}, "$inc": {"migrated": modified}},
+            upsert=True,
+        )
+
+    db.migrations.update_one(
+        {"_id": ORDER_NUMBER_KEYS_MIGRATION_ID},
+        {"$set": {"done": True, "completedAt": datetime.utcnow()}},
+        upsert=True,
+    )
+    return updated